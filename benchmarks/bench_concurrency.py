@@ -0,0 +1,176 @@
+"""
+Measures how the rendering throughput scales with threads, process pools and independent processes on one host.
+
+Run from the repository root, the repository is added to the import path when ``qsketchmetric`` is not
+installed::
+
+    python benchmarks/bench_concurrency.py [--modes threads processes independent] [--workers 1 2 4 8]
+        [--renders 50] [--sizes 10 100] [--output concurrency.json]
+
+Every worker renders ``--renders`` variants of one template from its own :class:`TemplateRegistry`, after one
+warm-up rendering. The templates are the example files and synthetic facades of ``--sizes`` windows, see
+``bench_parallel.py``. ``independent`` starts the workers as separate Python processes, like several services on
+one host, the pools share their start-up.
+
+For every template, mode and number of workers the results hold the renders per second of all workers together,
+the median and the 99th percentile of the latency of one rendering and the memory of every worker. The memory is
+read from ``/proc/self/status`` on Linux: ``rss_kb`` is the growth of the resident set size of the worker over its
+renderings, ``peak_kb`` the growth of its peak, both from a baseline taken before the warm-up, so forked pool
+workers do not report the memory they inherit from the parent. Threads share one process and report the largest
+growth as one value. Throughput that stops growing with threads points at the GIL, throughput that stops growing
+with processes points at memory bandwidth or the number of cores.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+
+import ezdxf
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bench_parallel import facade  # noqa: E402
+from qsketchmetric.registry import TemplateRegistry  # noqa: E402
+from qsketchmetric.renderer import Renderer  # noqa: E402
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+VARIABLES = {"w": 100, "l": 200, "h": 50, "width": 100, "height": 50}
+
+
+def memory() -> tuple[int, int]:
+    """
+        Reads the current and the peak resident set size of the process from ``/proc/self/status``.
+
+        :return: ``VmRSS`` and ``VmHWM`` in kB, zeros where ``/proc`` is not available.
+    """
+
+    try:
+        status = Path("/proc/self/status").read_text().splitlines()
+    except OSError:
+        return 0, 0
+
+    fields = dict(line.split(":", 1) for line in status if ":" in line)
+
+    return int(fields["VmRSS"].split()[0]), int(fields["VmHWM"].split()[0])
+
+
+def work(path: str, renders: int) -> dict:
+    """
+        Renders one template ``renders`` times, like one worker.
+
+        :return: The wall clock start and end of the timed renderings, their latencies in milliseconds and the
+            growth of the current and the peak resident set size of the process in kB.
+    """
+
+    rss, peak = memory()
+    registry = TemplateRegistry()
+
+    def render(i):
+        variables = VARIABLES | {"w": 20 + i % 10, "width": 100 + i % 50, "height": 50 + i % 20}
+        Renderer(Path(path), ezdxf.new(), variables=variables, registry=registry).render()
+
+    render(0)
+    latencies = []
+    start = time.time()
+
+    for i in range(renders):
+        begin = time.perf_counter()
+        render(i)
+        latencies.append((time.perf_counter() - begin) * 1000)
+
+    end = time.time()
+    current = memory()
+
+    return {"start": start, "end": end, "latencies": latencies, "rss_kb": current[0] - rss,
+            "peak_kb": current[1] - peak}
+
+
+def run(mode: str, path: Path, workers: int, renders: int) -> list[dict]:
+    """
+        Runs ``workers`` workers over one template in one mode.
+
+        :return: The results of :func:`work` of every worker.
+    """
+
+    if mode == "threads":
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(work, [str(path)] * workers, [renders] * workers))
+
+    if mode == "processes":
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(work, [str(path)] * workers, [renders] * workers))
+
+    children = [subprocess.Popen([sys.executable, __file__, "--child", str(path), str(renders)],
+                                 stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+
+    return [json.loads(child.communicate()[0]) for child in children]
+
+
+def summarize(mode: str, results: list[dict]) -> dict:
+    """
+        Combines the results of the workers of one run.
+    """
+
+    latencies = np.concatenate([r["latencies"] for r in results])
+    wall = max(r["end"] for r in results) - min(r["start"] for r in results)
+    rss = [r["rss_kb"] for r in results]
+    peak = [r["peak_kb"] for r in results]
+
+    if mode == "threads":
+        rss, peak = [max(rss)], [max(peak)]
+
+    return {"renders_per_s": len(latencies) / wall, "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)), "rss_kb": rss, "peak_kb": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["threads", "processes", "independent"],
+                        choices=["threads", "processes", "independent"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--renders", type=int, default=50, help="Number of timed renders of every worker.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 100], help="Windows of synthetic facades.")
+    parser.add_argument("--output", type=Path, help="Write the results to a JSON file instead of printing them.")
+    parser.add_argument("--child", nargs=2, metavar=("PATH", "RENDERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(work(args.child[0], int(args.child[1]))))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        templates = sorted(EXAMPLES.glob("*.dxf"))
+
+        for size in args.sizes:
+            templates.append(Path(directory) / f"facade_{size}.dxf")
+            facade(size).saveas(templates[-1])
+
+        report = {"python": sys.version.split()[0], "cpus": os.cpu_count(),
+                  "gil": getattr(sys, "_is_gil_enabled", lambda: True)(), "renders": args.renders, "results": []}
+
+        for path in templates:
+            entities = len(ezdxf.readfile(path).modelspace())
+
+            for mode in args.modes:
+                for workers in args.workers:
+                    result = {"template": path.name, "entities": entities, "mode": mode, "workers": workers}
+                    result |= summarize(mode, run(mode, path, workers, args.renders))
+                    report["results"].append(result)
+
+                    print(f"{path.name:<18}{mode:<12}{workers:>3} workers{result['renders_per_s']:>10.1f} renders/s"
+                          f"{result['p50_ms']:>9.2f} ms p50{result['p99_ms']:>9.2f} ms p99", file=sys.stderr)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
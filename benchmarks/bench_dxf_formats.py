@@ -0,0 +1,65 @@
+"""
+Compares the size and the load and save throughput of ASCII and binary DXF on the example drawings.
+
+Run from the repository root, the repository is added to the import path when ``qsketchmetric`` is not
+installed::
+
+    python benchmarks/bench_dxf_formats.py [--repeat 20] [DXF files ...]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import ezdxf
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qsketchmetric.dxfio import dxf_to_bytes, read_dxf  # noqa: E402
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+def bench(path: Path, repeat: int) -> list[tuple[str, int, float, float]]:
+    """
+        Measures one drawing in both formats.
+
+        :return: A list of ``(format, size in bytes, load time, save time)`` tuples, times are in milliseconds.
+    """
+
+    doc = ezdxf.readfile(path)
+    results = []
+
+    for fmt in ["asc", "bin"]:
+        data = dxf_to_bytes(doc, fmt)
+
+        load = min(timeit.repeat(lambda: read_dxf(data), number=1, repeat=repeat))
+        save = min(timeit.repeat(lambda: dxf_to_bytes(doc, fmt), number=1, repeat=repeat))
+
+        results.append((fmt, len(data), load * 1000, save * 1000))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", type=Path, default=sorted(EXAMPLES.glob("*.dxf")))
+    parser.add_argument("--repeat", type=int, default=20, help="Number of timed runs, the best one is reported.")
+    args = parser.parse_args()
+
+    print(f"{'file':<20}{'format':<8}{'size [kB]':>12}{'load [ms]':>12}{'save [ms]':>12}{'load [MB/s]':>14}")
+
+    for path in args.paths:
+        results = bench(path, args.repeat)
+        ascii_size = results[0][1]
+
+        for fmt, size, load, save in results:
+            print(f"{path.name:<20}{fmt:<8}{size / 1000:>12.1f}{load:>12.2f}{save:>12.2f}"
+                  f"{size / 1000 / load:>14.1f}")
+
+        print(f"{'':<20}{'ratio':<8}{results[1][1] / ascii_size:>12.2f}{results[1][2] / results[0][2]:>12.2f}"
+              f"{results[1][3] / results[0][3]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
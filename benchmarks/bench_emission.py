@@ -0,0 +1,97 @@
+"""
+Compares the usual ezdxf ``add_*`` calls with the :class:`BulkEmitter`, and the default rendering with the
+rendering with ``bulk_emission=True``.
+
+Run from the repository root, the repository is added to the import path when ``qsketchmetric`` is not
+installed::
+
+    python benchmarks/bench_emission.py [--entities 10000] [--repeat 20] [DXF files ...]
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+import ezdxf
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qsketchmetric.emit import BulkEmitter  # noqa: E402
+from qsketchmetric.registry import TemplateRegistry  # noqa: E402
+from qsketchmetric.renderer import Renderer  # noqa: E402
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+VARIABLES = {"w": 300, "l": 400, "h": 50, "width": 1000, "height": 500}
+
+
+def bench_entities(count: int, repeat: int) -> list[tuple[str, float, float]]:
+    """
+        Measures adding ``count`` entities of every kind to a new drawing.
+
+        :return: A list of ``(kind, add_* time, BulkEmitter time)`` tuples, times are in microseconds per entity.
+    """
+
+    rng = np.random.default_rng(0)
+    lines = rng.uniform(0, 1000, (count, 2, 2))
+    circles = np.column_stack([rng.uniform(0, 1000, (count, 2)), rng.uniform(1, 10, count)])
+    attribs = {"layer": "CUTTING", "linetype": "CONTINUOUS"}
+
+    def usual(kind):
+        msp = ezdxf.new().modelspace()
+
+        if kind == "LINE":
+            for start, end in lines.tolist():
+                msp.add_line(start, end, dxfattribs=attribs)
+        else:
+            for x, y, radius in circles.tolist():
+                msp.add_circle((x, y), radius, dxfattribs=attribs)
+
+    def bulk(kind):
+        emitter = BulkEmitter(ezdxf.new().modelspace())
+
+        if kind == "LINE":
+            emitter.add_lines(lines, attribs)
+        else:
+            emitter.add_circles(circles, attribs)
+
+    return [(kind, *(min(timeit.repeat(lambda: f(kind), number=1, repeat=repeat)) / count * 1e6
+                     for f in (usual, bulk))) for kind in ("LINE", "CIRCLE")]
+
+
+def bench_render(path: Path, repeat: int) -> tuple[float, float]:
+    """
+        Measures rendering one drawing from a :class:`TemplateRegistry` without and with bulk emission.
+
+        :return: Both times in milliseconds.
+    """
+
+    registry = TemplateRegistry()
+
+    def render(bulk_emission):
+        Renderer(path, ezdxf.new(), variables=VARIABLES, registry=registry, bulk_emission=bulk_emission).render()
+
+    return tuple(min(timeit.repeat(lambda: render(bulk), number=1, repeat=repeat)) * 1000 for bulk in (False, True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", type=Path, default=[EXAMPLES / "box_side.dxf", EXAMPLES / "wrapper.dxf"])
+    parser.add_argument("--entities", type=int, default=10000, help="Number of entities added directly.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of timed runs, the best one is reported.")
+    args = parser.parse_args()
+
+    print(f"{'entity':<20}{'add_* [us]':>12}{'bulk [us]':>12}{'speedup':>10}")
+
+    for kind, usual, bulk in bench_entities(args.entities, args.repeat):
+        print(f"{kind:<20}{usual:>12.2f}{bulk:>12.2f}{usual / bulk:>10.2f}")
+
+    print(f"\n{'file':<20}{'render [ms]':>12}{'bulk [ms]':>12}{'speedup':>10}")
+
+    for path in args.paths:
+        usual, bulk = bench_render(path, args.repeat)
+        print(f"{path.name:<20}{usual:>12.2f}{bulk:>12.2f}{usual / bulk:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures the peak memory of every rendering phase per entity of the example templates.
+
+Run from the repository root, the repository is added to the import path when ``qsketchmetric`` is not
+installed::
+
+    python benchmarks/bench_memory.py [--output memory.json] [--baseline memory.json] [--tolerance 0.1]
+
+With ``--baseline`` the results are compared with an earlier ``--output`` file and the script exits with
+status 1 when the peak memory per entity of a phase grew by more than the tolerance.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import ezdxf
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qsketchmetric.profiling import MemoryProfiler  # noqa: E402
+from qsketchmetric.renderer import Renderer  # noqa: E402
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+VARIABLES = {
+    "box_side.dxf": {"width": 100, "height": 50},
+    "wrapper.dxf": {"w": 100, "l": 200, "h": 50},
+    "chalice.dxf": {},
+}
+
+
+def bench(path: Path, variables: dict[str, float]) -> dict[str, float]:
+    """
+        Renders one template with the memory profiler.
+
+        :return: The peak memory per input entity of every phase, in bytes.
+    """
+
+    profiler = MemoryProfiler(top=0)
+    renderer = Renderer(path, ezdxf.new(), variables=variables, memory_profiler=profiler)
+    renderer.render()
+    profiler.stop()
+
+    entities = len(renderer.input_msp)
+
+    return {name: record["peak"] / entities for name, record in profiler.phases.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", type=Path, help="Write the results to a JSON file.")
+    parser.add_argument("--baseline", type=Path, help="Compare the results with an earlier JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative growth. Defaults to 0.1.")
+    args = parser.parse_args()
+
+    results = {name: bench(EXAMPLES / name, variables) for name, variables in VARIABLES.items()}
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    regressions = []
+
+    print(f"{'file':<16}{'phase':<18}{'peak [B/entity]':>16}{'baseline':>12}")
+
+    for name, phases in results.items():
+        for phase, peak in phases.items():
+            previous = baseline.get(name, {}).get(phase)
+            print(f"{name:<16}{phase:<18}{peak:>16.0f}{'' if previous is None else f'{previous:.0f}':>12}")
+
+            if previous is not None and peak > previous * (1 + args.tolerance):
+                regressions.append(f"{name} {phase}: {previous:.0f} -> {peak:.0f} B/entity")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if regressions:
+        print("\nRegressions:\n" + "\n".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
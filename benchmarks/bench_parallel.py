@@ -0,0 +1,86 @@
+"""
+Compares the rendering time of a large synthetic facade traversed in one piece and split into subtrees rendered by a
+process pool, see the ``executor`` of :class:`qsketchmetric.renderer.Renderer`.
+
+Run from the repository root, the repository is added to the import path when ``qsketchmetric`` is not
+installed::
+
+    python benchmarks/bench_parallel.py [--windows 400] [--workers 1 2 4 8] [--repeat 5]
+
+The facade is a horizontal spine with a window hanging off every spine node, every window is a grid of panes
+that only depends on the position of its spine node, so it is an independent subtree.
+"""
+import argparse
+import os
+import sys
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import ezdxf
+from ezdxf.document import Drawing
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qsketchmetric.renderer import Renderer  # noqa: E402
+
+
+def facade(windows: int, panes: int = 4) -> Drawing:
+    """
+        Builds a parametric facade of ``windows`` windows of ``panes`` by ``panes`` panes. The width of the panes
+        is the variable ``w``.
+    """
+
+    doc = ezdxf.new()
+    doc.appids.new("QCAD")
+    doc.layers.new("VIRTUAL_LAYER")
+    msp = doc.modelspace()
+    msp.add_mtext("----- custom -----")
+
+    for i in range(windows):
+        x = i * 100
+        msp.add_line((x, 0), (x + 100, 0), dxfattribs={"layer": "VIRTUAL_LAYER"}).set_xdata(
+            "QCAD", [(1000, "c:4*w+20")])
+        msp.add_line((x, 0), (x + 10, 10), dxfattribs={"layer": "VIRTUAL_LAYER"}).set_xdata("QCAD", [(1000, "c:c")])
+
+        for row in range(panes + 1):
+            for column in range(panes):
+                start, end = (x + 10 + column * 20, 10 + row * 20), (x + 30 + column * 20, 10 + row * 20)
+                msp.add_line(start, end).set_xdata("QCAD", [(1000, "c:w")])
+                start, end = (x + 10 + row * 20, 10 + column * 20), (x + 10 + row * 20, 30 + column * 20)
+                msp.add_line(start, end).set_xdata("QCAD", [(1000, "c:c")])
+
+        msp.add_circle((x + 50, 50), 5).set_xdata("QCAD", [(1000, "c:w/4")])
+
+    return doc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--windows", type=int, default=400, help="Number of windows of the facade.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs, the best one is reported.")
+    args = parser.parse_args()
+
+    template = facade(args.windows)
+
+    def render(executor=None, parts=8):
+        Renderer(template, ezdxf.new(), variables={"w": 25}, bulk_emission=True, executor=executor,
+                 parts=parts).render()
+
+    serial = min(timeit.repeat(render, number=1, repeat=args.repeat)) * 1000
+
+    print(f"{len(template.modelspace())} entities, {os.cpu_count()} CPUs")
+    print(f"{'workers':<10}{'render [ms]':>12}{'speedup':>10}")
+    print(f"{'serial':<10}{serial:>12.1f}{1:>10.2f}")
+
+    for workers in args.workers:
+        with ProcessPoolExecutor(workers) as executor:
+            render(executor, 2 * workers)
+            parallel = min(timeit.repeat(lambda: render(executor, 2 * workers), number=1, repeat=args.repeat)) * 1000
+
+        print(f"{workers:<10}{parallel:>12.1f}{serial / parallel:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
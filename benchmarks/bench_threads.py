@@ -0,0 +1,62 @@
+"""
+Measures the rendering throughput of one shared template for a growing number of threads.
+
+Run from the repository root, the repository is added to the import path when ``qsketchmetric`` is not
+installed::
+
+    python benchmarks/bench_threads.py [--renders 200] [--threads 1 2 4 8] [template.dxf]
+
+On builds with the GIL the threads take turns, on free-threaded builds the throughput should grow with the
+number of threads.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import ezdxf
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qsketchmetric.registry import TemplateRegistry  # noqa: E402
+from qsketchmetric.renderer import Renderer  # noqa: E402
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", type=Path, default=EXAMPLES / "wrapper.dxf")
+    parser.add_argument("--renders", type=int, default=200, help="Number of renders for every thread count.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    registry = TemplateRegistry()
+    variables = [{"w": 100 + i % 50, "l": 200 + i % 30, "h": 50 + i % 20, "width": 100 + i % 50,
+                  "height": 50 + i % 20} for i in range(args.renders)]
+
+    def render(v):
+        Renderer(args.path, ezdxf.new(), variables=v, registry=registry).render()
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, template {args.path.name}")
+    print(f"{'threads':>8}{'renders/s':>12}{'speedup':>10}")
+
+    render(variables[0])
+    baseline = None
+
+    for threads in args.threads:
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(render, variables))
+
+        throughput = args.renders / (time.perf_counter() - start)
+        baseline = baseline or throughput
+
+        print(f"{threads:>8}{throughput:>12.1f}{throughput / baseline:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from pathlib import Path
+from typing import Optional, Dict
+
+import ezdxf
+import numpy as np
+
+from qsketchmetric.expression import Value
+from qsketchmetric.template import CompiledTemplate
+
+
+class BatchRenderer:
+    """
+    :param input_parametric_path: Path to the parametric file intended for rendering.
+    :param variables: Columns of variable values. Every value is a 1-D :class:`numpy.ndarray` with one entry per
+        variant, or a scalar shared by all variants.
+    :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
+        decimal places. Defaults to 3.
+    :param solver: **(Optional)** Strategy used to place the graph nodes, see :class:`Renderer`.
+        Defaults to ``"dfs"``.
+    :param output_npy_path: **(Optional)** Path of a ``.npy`` file the results are written to. The file is
+        memory-mapped, so batches larger than the available memory can be rendered. Defaults to ``None``, which
+        keeps the results in memory.
+    :param chunk_size: **(Optional)** Number of variants computed in one vectorized pass. Defaults to 65536.
+
+    The :class:`BatchRenderer` class computes the points and extents of a parametric DXF file for many variable
+    sets at once. The template is compiled into a :class:`CompiledTemplate` once and every expression is evaluated
+    for a whole chunk of variants in one vectorized pass. No DXF output is created.
+
+    The ``.npy`` file holds one record per variant with the fields ``"extents"`` (width and height) and
+    ``"points"`` (one ``(x, y)`` field per named point). Read it back with :func:`numpy.load`, optionally with
+    ``mmap_mode="r"``.
+    """
+
+    def __init__(self, input_parametric_path: Path, variables: dict[str, Value], accuracy: int = 3,
+                 solver: str = "dfs", output_npy_path: Optional[Path] = None, chunk_size: int = 65536):
+        """
+            Instantiate a new :class:`BatchRenderer` object.
+        """
+
+        self.accuracy = accuracy
+        self.solver = solver
+        self.chunk_size = chunk_size
+
+        self.input_parametric_path: Path = Path(input_parametric_path)
+        self.output_npy_path: Optional[Path] = Path(output_npy_path) if output_npy_path else None
+
+        self.template = CompiledTemplate(ezdxf.readfile(self.input_parametric_path), accuracy)
+
+        self.variables: dict[str, Value] = {k: v if np.ndim(v) == 0 else np.asarray(v, dtype=float)
+                                            for k, v in variables.items()}
+        self.size: int = CompiledTemplate.batch_size(self.variables)
+
+        self.points: Dict[str, np.ndarray] = {}
+        self.extents: np.ndarray = np.empty((0, 2))
+
+    def render(self) -> dict[str, np.ndarray]:
+        """
+            The main method of the :class:`BatchRenderer` class.
+            Computes the geometry of every variant, chunk by chunk.
+
+            :return: A dictionary mapping the named points to ``(B, 2)`` arrays of their rendered positions.
+        """
+
+        store = None
+
+        for start in range(0, self.size, self.chunk_size):
+            stop = min(start + self.chunk_size, self.size)
+            chunk = {k: v if np.ndim(v) == 0 else v[start:stop] for k, v in self.variables.items()}
+            geometry = self.template.evaluate(chunk, solver=self.solver)
+
+            if store is None:
+                store = self._allocate(list(geometry["points"].keys()))
+
+            store["extents"][start:stop] = geometry["extents"]
+
+            for name, position in geometry["points"].items():
+                store["points"][name][start:stop] = position
+
+        if store is not None:
+            if isinstance(store, np.memmap):
+                store.flush()
+
+            self.extents = store["extents"]
+            self.points = {name: store["points"][name] for name in store.dtype["points"].names or ()}
+
+        return self.points
+
+    def get_bb_dimensions(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+            Retrieve the bounding box dimensions of every rendered variant.
+
+            :return: A tuple containing the arrays of widths and heights.
+        """
+
+        return self.extents[:, 0], self.extents[:, 1]
+
+    def _allocate(self, point_names: list[str]) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Allocates the structured result array, memory-mapped to :attr:`output_npy_path` if it is set.
+
+            :param point_names: Names of the points returned by the template.
+        """
+
+        dtype = np.dtype([("extents", np.float64, (2,)),
+                          ("points", [(name, np.float64, (2,)) for name in point_names])])
+
+        if self.output_npy_path is None:
+            return np.zeros(self.size, dtype=dtype)
+
+        return np.lib.format.open_memmap(self.output_npy_path, mode="w+", dtype=dtype, shape=(self.size,))
@@ -0,0 +1,101 @@
+import io
+from pathlib import Path
+from typing import Union, BinaryIO
+
+import ezdxf
+from ezdxf.document import Drawing
+from ezdxf.filemanagement import dxf_stream_info
+from ezdxf.lldxf.tagger import binary_tags_loader
+
+BINARY_SENTINEL = b"AutoCAD Binary DXF\r\n\x1a\x00"
+FORMATS = ("asc", "bin")
+
+Source = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+Target = Union[str, Path, BinaryIO]
+
+
+def read_dxf(source: Source) -> Drawing:
+    """
+        Read an ASCII or a binary DXF document. The format is detected automatically.
+
+        :param source: Path of the DXF file, the content of the file as bytes or a binary stream opened for
+            reading.
+
+        :return: The loaded DXF document.
+    """
+
+    if isinstance(source, (str, Path)):
+        return ezdxf.readfile(source)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return dxf_from_bytes(bytes(source))
+
+    return dxf_from_bytes(source.read())
+
+
+def dxf_from_bytes(data: bytes) -> Drawing:
+    """
+        Load an ASCII or a binary DXF document from its content.
+
+        :param data: Content of a DXF file.
+
+        :return: The loaded DXF document.
+    """
+
+    if data.startswith(BINARY_SENTINEL):
+        return Drawing.load(binary_tags_loader(data, errors="surrogateescape"))
+
+    data = data.replace(b"\r\n", b"\n")
+    info = dxf_stream_info(io.StringIO(data.decode("utf-8", errors="ignore")))
+
+    return ezdxf.read(io.StringIO(data.decode(info.encoding, errors="surrogateescape")))
+
+
+def write_dxf(doc: Drawing, target: Target, fmt: str = "asc"):
+    """
+        Write a DXF document as ASCII or binary DXF.
+
+        :param doc: DXF document to write.
+        :param target: Path of the output file or a binary stream opened for writing.
+        :param fmt: **(Optional)** ``"asc"`` for ASCII DXF or ``"bin"`` for binary DXF. Binary DXF files are
+            smaller and faster to load and save. Defaults to ``"asc"``.
+    """
+
+    _check_format(fmt)
+
+    if isinstance(target, (str, Path)):
+        doc.saveas(target, fmt=fmt)
+    elif fmt == "bin":
+        doc.write(target, fmt="bin")
+    else:
+        stream = io.TextIOWrapper(target, encoding=doc.output_encoding, errors="dxfreplace", newline="")
+        doc.write(stream)
+        stream.flush()
+        stream.detach()
+
+
+def dxf_to_bytes(doc: Drawing, fmt: str = "asc") -> bytes:
+    """
+        Serialize a DXF document into bytes, without touching the filesystem.
+
+        :param doc: DXF document to serialize.
+        :param fmt: **(Optional)** ``"asc"`` for ASCII DXF or ``"bin"`` for binary DXF. Defaults to ``"asc"``.
+
+        :return: The content of the DXF file.
+    """
+
+    buffer = io.BytesIO()
+    write_dxf(doc, buffer, fmt)
+
+    return buffer.getvalue()
+
+
+def _check_format(fmt: str):
+    """
+        .. note:: This function is private and not intended for external use.
+
+        Raises a :class:`ValueError` for unknown output formats.
+    """
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown DXF format: '{fmt}'. Use 'asc' or 'bin'.")
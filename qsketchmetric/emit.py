@@ -0,0 +1,124 @@
+from typing import Iterable, Type
+
+import numpy as np
+from ezdxf.entities import DXFGraphic, Line, Circle, Arc, Insert
+from ezdxf.lldxf.const import DXFInvalidLineType
+from ezdxf.layouts import BaseLayout
+from ezdxf.math import Vec3
+
+
+class BulkEmitter:
+    """
+    :param layout: Layout the entities are added to, for example the modelspace of the output drawing.
+
+    The :class:`BulkEmitter` class adds many entities of one kind to a layout from arrays of coordinates. The
+    DXF attributes shared by a batch are checked once per batch and copied into every entity as they are, the
+    coordinates are written straight into the entities. The usual ``add_line``, ``add_circle``, ``add_arc`` and
+    ``add_blockref`` methods of ezdxf build and validate an attribute dictionary for every single entity instead.
+
+    :class:`Renderer` uses it with ``bulk_emission=True``.
+
+    .. warning::
+        Only the linetype is checked, like ezdxf checks it. The shared attributes must otherwise be valid DXF
+        attributes of the right types, for example ``float`` scale factors and ``int`` counts.
+    """
+
+    def __init__(self, layout: BaseLayout):
+        """
+            Instantiate a new :class:`BulkEmitter` object.
+        """
+
+        self.layout = layout
+        self.doc = layout.doc
+
+    def add_lines(self, lines: np.ndarray, dxfattribs: dict) -> list[Line]:
+        """
+            Add LINE entities.
+
+            :param lines: ``(N, 2, 2)`` array of start and end points.
+            :param dxfattribs: DXF attributes shared by all lines, like ``layer`` and ``linetype``.
+        """
+
+        return self._add(Line, dxfattribs, ({"start": Vec3(x0, y0), "end": Vec3(x1, y1)}
+                                            for (x0, y0), (x1, y1) in np.asarray(lines).tolist()))
+
+    def add_circles(self, circles: np.ndarray, dxfattribs: dict) -> list[Circle]:
+        """
+            Add CIRCLE entities.
+
+            :param circles: ``(N, 3)`` array of centers and radii.
+            :param dxfattribs: DXF attributes shared by all circles.
+        """
+
+        return self._add(Circle, dxfattribs, ({"center": Vec3(x, y), "radius": radius}
+                                              for x, y, radius in np.asarray(circles).tolist()))
+
+    def add_arcs(self, arcs: np.ndarray, dxfattribs: dict) -> list[Arc]:
+        """
+            Add ARC entities.
+
+            :param arcs: ``(N, 5)`` array of centers, radii, start angles and end angles in degrees.
+            :param dxfattribs: DXF attributes shared by all arcs.
+        """
+
+        return self._add(Arc, dxfattribs, ({"center": Vec3(x, y), "radius": radius,
+                                            "start_angle": start, "end_angle": end}
+                                           for x, y, radius, start, end in np.asarray(arcs).tolist()))
+
+    def add_blockrefs(self, name: str, points: np.ndarray, dxfattribs: dict) -> list[Insert]:
+        """
+            Add INSERT entities of one block.
+
+            :param name: Name of the block.
+            :param points: ``(N, 2)`` array of insertion points.
+            :param dxfattribs: DXF attributes shared by all block references, like ``xscale`` and ``yscale``.
+        """
+
+        return self._add(Insert, dxfattribs | {"name": name}, ({"insert": Vec3(x, y)}
+                                                               for x, y in np.asarray(points).tolist()))
+
+    @staticmethod
+    def translate(entities: Iterable[DXFGraphic], dx: float, dy: float):
+        """
+            Move LINE, CIRCLE, ARC and INSERT entities, other entities are left as they are.
+
+            :param entities: The entities.
+            :param dx: Shift along the X axis.
+            :param dy: Shift along the Y axis.
+        """
+
+        shift = Vec3(dx, dy)
+
+        for e in entities:
+            attribs = e.dxf.__dict__
+
+            for key in ("start", "end", "center", "insert"):
+                if key in attribs:
+                    attribs[key] = attribs[key] + shift
+
+    def _add(self, cls: Type[DXFGraphic], dxfattribs: dict, batch: Iterable[dict]) -> list:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Creates the entities of a batch, binds them to the drawing and adds them to the layout.
+        """
+
+        shared = dict(cls.DEFAULT_ATTRIBS) | dxfattribs
+
+        if self.doc and shared.get("linetype", "BYLAYER") not in self.doc.linetypes:
+            raise DXFInvalidLineType(f'Linetype "{shared["linetype"]}" not defined.')
+
+        entitydb = self.doc.entitydb
+        block_record = self.layout.block_record
+        entities = []
+
+        for coordinates in batch:
+            e = cls()
+            e.doc = self.doc
+            e.dxf.__dict__.update(shared)
+            e.dxf.__dict__.update(coordinates)
+            entitydb.add(e)
+            block_record.add_entity(e)
+            entities.append(e)
+
+        return entities
@@ -0,0 +1,94 @@
+import math
+from functools import lru_cache, reduce
+from typing import Union
+
+import numpy as np
+from py_expression_eval import Expression, Parser  # type: ignore
+
+Value = Union[float, np.ndarray]
+
+
+class VectorParser(Parser):
+    """
+    The :class:`VectorParser` class is a drop-in replacement of :class:`py_expression_eval.Parser` whose operators
+    and functions work element-wise on :class:`numpy.ndarray` values.
+
+    Expressions parsed with it can be evaluated for one scalar variable set, exactly like with the original parser,
+    or for whole columns of variable values at once. Every variable may be a scalar or a 1-D array, arrays of the
+    same length are combined element by element.
+    """
+
+    def __init__(self):
+        """
+            Instantiate a new :class:`VectorParser` object.
+        """
+
+        super().__init__()
+
+        self.ops1 |= {
+            'sin': np.sin,
+            'cos': np.cos,
+            'tan': np.tan,
+            'asin': np.arcsin,
+            'acos': np.arccos,
+            'atan': np.arctan,
+            'sind': lambda a: np.sin(np.radians(a)),
+            'cosd': lambda a: np.cos(np.radians(a)),
+            'tand': lambda a: np.tan(np.radians(a)),
+            'asind': lambda a: np.degrees(np.arcsin(a)),
+            'acosd': lambda a: np.degrees(np.arccos(a)),
+            'atand': lambda a: np.degrees(np.arctan(a)),
+            'sqrt': np.sqrt,
+            'abs': np.abs,
+            'ceil': np.ceil,
+            'floor': np.floor,
+            'round': np.round,
+            'not': np.logical_not,
+            'exp': np.exp,
+        }
+
+        self.ops2 |= {
+            '^': np.power,
+            '**': np.power,
+            'and': np.logical_and,
+            'or': np.logical_or,
+            'xor': np.logical_xor,
+        }
+
+        self.functions |= {
+            'log': lambda a, base=math.e: np.log(a) / np.log(base),
+            'min': lambda *a: reduce(np.minimum, a),
+            'max': lambda *a: reduce(np.maximum, a),
+            'pyt': np.hypot,
+            'pow': np.power,
+            'atan2': np.arctan2,
+            'if': np.where,
+        }
+
+
+@lru_cache(maxsize=4096)
+def parse(expression: str) -> Expression:
+    """
+        Parse an expression with the :class:`VectorParser`. The 4096 most recently used expressions are cached, so
+        the expressions of the templates in use are parsed only once while a long-running process that sees many
+        distinct expressions does not keep all of them.
+
+        :param expression: Expression to parse.
+
+        :return: Parsed expression ready to be evaluated on scalars or arrays.
+    """
+
+    return VectorParser().parse(expression)
+
+
+def evaluate(expression: str, variables: dict[str, Value]) -> Value:
+    """
+        Evaluate an expression for scalar or columnar variables.
+
+        :param expression: Expression to evaluate.
+        :param variables: Variables used by the expression. Values are scalars or 1-D arrays of the same length.
+
+        :return: A scalar if the expression depends on scalars only, otherwise an array.
+    """
+
+    return parse(expression).evaluate(variables)
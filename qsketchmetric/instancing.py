@@ -0,0 +1,121 @@
+import hashlib
+from pathlib import Path
+from typing import Optional, Any, Union
+
+from ezdxf.document import Drawing
+
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.renderer import Renderer
+
+_RUNTIME_OPTIONS = ("limits", "cost_profiler", "memory_profiler", "executor", "parts")
+
+
+class InstanceCache:
+    """
+    :param output_dxf: The drawing all copies are placed in.
+    :param registry: **(Optional)** A :class:`TemplateRegistry` the parametric files are taken from. Defaults to
+        a new registry.
+    :param renderer_options: **(Optional)** Keyword arguments passed to every :class:`Renderer`, like
+        ``accuracy`` or ``solver``. Defaults to ``None``.
+
+    The :class:`InstanceCache` class places many copies of parametric templates in one output drawing. The first
+    copy of a template rendered with a given set of variables is rendered into a new block definition, every copy,
+    the first one included, is placed as a single INSERT of that block at its offset. A sheet holding a hundred
+    identical parts then stores their geometry once.
+
+    The rendered block has the lower left corner of its extents at its origin, so an INSERT at ``offset`` covers
+    exactly the area the entities of ``Renderer(..., offset=offset)`` would cover.
+
+    The renderers created by the cache render the sub-templates of their templates through the same cache, so a
+    sub-template is rendered once per set of bound variables across the whole drawing.
+    """
+
+    def __init__(self, output_dxf: Drawing, registry: Optional[TemplateRegistry] = None,
+                 renderer_options: Optional[dict[str, Any]] = None):
+        """
+            Instantiate a new :class:`InstanceCache` object.
+        """
+
+        self.output_dxf = output_dxf
+        self.output_msp = output_dxf.modelspace()
+        self.registry = registry if registry is not None else TemplateRegistry()
+        self.renderer_options = renderer_options or {}
+
+        self.instances: dict[tuple, tuple[str, dict[str, tuple[float, float]]]] = {}
+        self._rendering: list[Path] = []
+
+        self.renders: int = 0
+        self.hits: int = 0
+
+    def place(self, input_parametric_path: Union[str, Path], variables: Optional[dict[str, float]] = None,
+              offset: tuple[float, float] = (0, 0), layer: str = "0") -> dict[str, tuple[float, float]]:
+        """
+            Place one copy of a template, rendering it only if no copy with the same variables was placed yet.
+
+            :param input_parametric_path: Path to the parametric file.
+            :param variables: **(Optional)** Variables of the copy. Defaults to an empty dictionary.
+            :param offset: **(Optional)** Position of the lower left corner of the copy. Defaults to (0, 0).
+            :param layer: **(Optional)** Layer of the INSERT entity. Defaults to ``"0"``.
+
+            :return: The rendered points of the template, like :meth:`Renderer.render`. They do not include the
+                offset.
+        """
+
+        name, points = self.block(input_parametric_path, variables)
+        self.output_msp.add_blockref(name, offset, dxfattribs={"layer": layer})
+
+        return dict(points)
+
+    def block(self, input_parametric_path: Union[str, Path],
+              variables: Optional[dict[str, float]] = None) -> tuple[str, dict[str, tuple[float, float]]]:
+        """
+            Get the block definition of a template rendered with the given variables, rendering it on first use.
+
+            :param input_parametric_path: Path to the parametric file.
+            :param variables: **(Optional)** Variables of the rendering. Defaults to an empty dictionary.
+
+            :return: The name of the block and the rendered points of the template.
+
+            :raises ValueError: If the template references itself through its sub-templates.
+        """
+
+        path = Path(input_parametric_path).resolve()
+        key = self._key(path, variables or {})
+
+        if key in self.instances:
+            self.hits += 1
+            return self.instances[key]
+
+        if path in self._rendering:
+            raise ValueError("Cyclic sub-template reference: " +
+                             " -> ".join(p.name for p in self._rendering[self._rendering.index(path):] + [path]))
+
+        name = f"{path.stem}_{hashlib.blake2b(repr(key).encode(), digest_size=6).hexdigest()}"
+        block = self.output_dxf.blocks.new(name=name)
+        self._rendering.append(path)
+
+        try:
+            points = Renderer(path, self.output_dxf, variables=dict(variables or {}), registry=self.registry,
+                              output_layout=block, instances=self, **self.renderer_options).render()
+        except Exception:
+            self.output_dxf.blocks.delete_block(name, safe=False)
+            raise
+        finally:
+            self._rendering.pop()
+
+        self.instances[key] = (name, points)
+        self.renders += 1
+
+        return self.instances[key]
+
+    def _key(self, path: Path, variables: dict[str, float]) -> tuple:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the key identifying a rendering. The renderer options that change the rendered entities are
+            part of it, they are fixed for the cache but keep the block names of caches with different options
+            apart. Limits, profilers and executors only change how the rendering runs and are left out.
+        """
+
+        return (str(path), tuple(sorted((k, float(v)) for k, v in variables.items())),
+                tuple(sorted((k, repr(v)) for k, v in self.renderer_options.items() if k not in _RUNTIME_OPTIONS)))
@@ -0,0 +1,198 @@
+from pathlib import Path
+from typing import Optional, Union, Callable, Any
+
+import ezdxf
+import numpy as np
+
+from qsketchmetric.expression import Value
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.template import CompiledTemplate
+
+Measure = Callable[[dict[str, Any]], np.ndarray]
+Constraint = Callable[[dict[str, Any]], np.ndarray]
+Searched = Union[str, dict[str, Callable[[np.ndarray], Value]]]
+
+
+def width(geometry: dict[str, Any]) -> np.ndarray:
+    """
+        Measures the width of the drawing, for :meth:`InverseSolver.solve`.
+    """
+
+    return geometry["extents"][:, 0]
+
+
+def height(geometry: dict[str, Any]) -> np.ndarray:
+    """
+        Measures the height of the drawing, for :meth:`InverseSolver.solve`.
+    """
+
+    return geometry["extents"][:, 1]
+
+
+def point(name: str, axis: int) -> Measure:
+    """
+        Returns a measure of one coordinate of a named point, for :meth:`InverseSolver.solve`.
+
+        :param name: Name of the point.
+        :param axis: ``0`` for the x coordinate, ``1`` for the y coordinate.
+    """
+
+    return lambda geometry: geometry["points"][name][:, axis]
+
+
+def fits(max_width: float, max_height: float) -> Constraint:
+    """
+        Returns a constraint met by the drawings fitting into a rectangle, for :meth:`InverseSolver.maximize`.
+
+        :param max_width: Width of the rectangle.
+        :param max_height: Height of the rectangle.
+    """
+
+    return lambda geometry: (width(geometry) <= max_width) & (height(geometry) <= max_height)
+
+
+class InverseSolver:
+    """
+    :param input_parametric_path: Path to the parametric file, or a :class:`CompiledTemplate`.
+    :param variables: **(Optional)** Variables of the drawing that are not searched. Defaults to an empty
+        dictionary.
+    :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
+        decimal places. Defaults to 3.
+    :param solver: **(Optional)** Strategy used to place the graph nodes, see :class:`Renderer`.
+        Defaults to ``"dfs"``.
+    :param samples: **(Optional)** Number of candidate values evaluated in one vectorized pass. Defaults to 64.
+    :param registry: **(Optional)** A :class:`TemplateRegistry` the compiled template is taken from.
+        Defaults to ``None``, which reads the file.
+
+    The :class:`InverseSolver` class finds the values of variables that give the drawing a wanted size or put a
+    point at a wanted position. The template is compiled into a :class:`CompiledTemplate` once, every step of the
+    search evaluates a whole range of candidate values in one vectorized pass of :meth:`CompiledTemplate.evaluate`
+    and narrows the range to the two neighbouring candidates around the answer. Every step makes the range
+    ``samples - 1`` times smaller, so a few steps reach any tolerance.
+
+    The searched variable is either the name of one variable, or a dictionary mapping several variables to
+    functions of the searched value, for example ``{"w": lambda t: t, "l": lambda t: 1.5 * t}`` to keep the
+    proportions of a part.
+
+    .. note::
+        The search assumes the measure changes continuously with the searched value. If the target is met
+        several times in the range, the smallest value is found by :meth:`solve`. Named points are rounded to the
+        accuracy, so they are found with that precision at best.
+    """
+
+    def __init__(self, input_parametric_path: Union[Path, CompiledTemplate],
+                 variables: Optional[dict[str, Value]] = None, accuracy: int = 3, solver: str = "dfs",
+                 samples: int = 64, registry: Optional[TemplateRegistry] = None):
+        """
+            Instantiate a new :class:`InverseSolver` object.
+        """
+
+        if samples < 3:
+            raise ValueError("At least 3 samples are needed.")
+
+        self.solver = solver
+        self.samples = samples
+        self.variables: dict[str, Value] = dict(variables or {})
+
+        if isinstance(input_parametric_path, CompiledTemplate):
+            self.template = input_parametric_path
+        elif registry is not None:
+            self.template = registry.get_compiled(input_parametric_path, accuracy)
+        else:
+            self.template = CompiledTemplate(ezdxf.readfile(input_parametric_path), accuracy)
+
+        self.template.plan(solver)
+
+        self.evaluations: int = 0
+
+    def solve(self, searched: Searched, measure: Measure, target: float, low: float, high: float,
+              tolerance: float = 1e-6) -> float:
+        """
+            Find the value for which the measure of the drawing equals the target.
+
+            :param searched: Name of the searched variable, or a dictionary of variables and their functions of
+                the searched value.
+            :param measure: Function of the geometry returned by :meth:`CompiledTemplate.evaluate` to a ``(B,)``
+                array, for example :func:`width`, :func:`height` or :func:`point`.
+            :param target: Wanted value of the measure.
+            :param low: Lower end of the searched range.
+            :param high: Upper end of the searched range.
+            :param tolerance: **(Optional)** Width of the range the answer is interpolated in. Defaults to ``1e-6``.
+
+            :raises ValueError: If the measure does not reach the target in the range.
+
+            :return: The searched value.
+        """
+
+        while True:
+            values = np.linspace(low, high, self.samples)
+            residuals = measure(self._evaluate(searched, values)) - target
+
+            exact = np.flatnonzero(residuals == 0)
+            crossing = np.flatnonzero(np.sign(residuals[:-1]) * np.sign(residuals[1:]) < 0)
+
+            if exact.size and (not crossing.size or exact[0] <= crossing[0]):
+                return float(values[exact[0]])
+
+            if not crossing.size:
+                raise ValueError(f"The measure does not reach {target} between {low} and {high}.")
+
+            i = crossing[0]
+            low, high = values[i], values[i + 1]
+
+            if high - low <= max(tolerance, 4 * np.spacing(max(abs(low), abs(high)))):
+                return float(low - residuals[i] * (high - low) / (residuals[i + 1] - residuals[i]))
+
+    def maximize(self, searched: Searched, constraint: Constraint, low: float, high: float,
+                 tolerance: float = 1e-6) -> float:
+        """
+            Find the largest value for which the drawing meets a constraint, for example the largest width of a
+            part fitting into a panel with :func:`fits`. The constraint must hold from the lower end of the range
+            up to the answer and not beyond it.
+
+            :param searched: Name of the searched variable, or a dictionary of variables and their functions of
+                the searched value.
+            :param constraint: Function of the geometry returned by :meth:`CompiledTemplate.evaluate` to a ``(B,)``
+                boolean array.
+            :param low: Lower end of the searched range.
+            :param high: Upper end of the searched range.
+            :param tolerance: **(Optional)** Precision of the answer. Defaults to ``1e-6``.
+
+            :raises ValueError: If the constraint is not met at the lower end of the range.
+
+            :return: The searched value, the constraint is met for it.
+        """
+
+        while True:
+            values = np.linspace(low, high, self.samples)
+            met = np.asarray(constraint(self._evaluate(searched, values)), dtype=bool)
+
+            if not met[0]:
+                raise ValueError(f"The constraint is not met for {low}.")
+
+            if met.all():
+                return float(high)
+
+            i = np.argmin(met) - 1
+            low, high = values[i], values[i + 1]
+
+            if high - low <= max(tolerance, 4 * np.spacing(max(abs(low), abs(high)))):
+                return float(low)
+
+    def _evaluate(self, searched: Searched, values: np.ndarray) -> dict[str, Any]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evaluates the geometry for every candidate value in one pass.
+        """
+
+        if isinstance(searched, str):
+            candidates = {searched: values}
+        else:
+            candidates = {name: np.broadcast_to(np.asarray(function(values), dtype=float), values.shape)
+                          for name, function in searched.items()}
+
+        self.evaluations += len(values)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.template.evaluate(self.variables | candidates, self.solver)
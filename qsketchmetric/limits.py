@@ -0,0 +1,146 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Iterator
+
+
+class LimitExceeded(RuntimeError):
+    """
+        Raised when a computation exceeds one of its :class:`Limits`.
+    """
+
+
+class Cancelled(RuntimeError):
+    """
+        Raised when a computation is stopped through its :class:`CancelToken`.
+    """
+
+
+class CancelToken:
+    """
+    The :class:`CancelToken` class lets another thread stop a running computation. The computation stops with
+    :class:`Cancelled` at its next check, usually within a few entities. One token may be shared by many
+    computations, for example all renderings of one request.
+    """
+
+    def __init__(self):
+        """
+            Instantiate a new :class:`CancelToken` object.
+        """
+
+        self._event = threading.Event()
+
+    def cancel(self):
+        """
+            Ask every computation using the token to stop.
+        """
+
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+            ``True`` once :meth:`cancel` was called.
+        """
+
+        return self._event.is_set()
+
+
+class Limits:
+    """
+    :param max_entities: **(Optional)** Maximum number of entities the computation may add to a drawing.
+        Defaults to ``None``, which means no limit.
+    :param max_nodes: **(Optional)** Maximum number of nodes of the graph of the drawing. Defaults to ``None``,
+        which means no limit.
+    :param timeout: **(Optional)** Number of seconds the computation may run. Defaults to ``None``, which means
+        no limit.
+    :param token: **(Optional)** A :class:`CancelToken` stopping the computation when cancelled.
+        Defaults to ``None``.
+
+    The :class:`Limits` class bounds the resources of one :meth:`Renderer.render` or
+    :meth:`SemiAutomaticParameterization.parametrize` call. The traversal and emission loops check the limits as
+    they go and abort with :class:`LimitExceeded` or :class:`Cancelled`, so a malformed or huge drawing cannot keep
+    a worker busy.
+
+    The timeout and the entity count start over with every call. Sub-templates rendered by a call count towards
+    the limits of that call. Use one :class:`Limits` object per concurrent computation, the token may be shared.
+    """
+
+    def __init__(self, max_entities: Optional[int] = None, max_nodes: Optional[int] = None,
+                 timeout: Optional[float] = None, token: Optional[CancelToken] = None):
+        """
+            Instantiate a new :class:`Limits` object.
+        """
+
+        self.max_entities = max_entities
+        self.max_nodes = max_nodes
+        self.timeout = timeout
+        self.token = token
+
+        self.entities: int = 0
+
+        self._deadline: Optional[float] = None
+        self._depth = 0
+
+    @contextmanager
+    def running(self) -> Iterator["Limits"]:
+        """
+            Apply the limits to the enclosed block. The timeout and the entity count are reset when the outermost
+            block is entered, nested blocks share them.
+        """
+
+        if not self._depth:
+            self.entities = 0
+            self._deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        self._depth += 1
+
+        try:
+            self.check()
+            yield self
+        finally:
+            self._depth -= 1
+
+    @property
+    def remaining(self) -> Optional[float]:
+        """
+            Number of seconds the running computation has left before its timeout, ``None`` without a timeout.
+        """
+
+        return None if self._deadline is None else self._deadline - time.monotonic()
+
+    def check(self, nodes: Optional[int] = None):
+        """
+            Raise if the computation was cancelled or ran out of time.
+
+            :param nodes: **(Optional)** Current number of graph nodes, checked against ``max_nodes``.
+                Defaults to ``None``.
+
+            :raises Cancelled: If the token was cancelled.
+            :raises LimitExceeded: If the timeout or the maximum number of nodes was exceeded.
+        """
+
+        if self.token is not None and self.token.cancelled:
+            raise Cancelled("The computation was cancelled.")
+
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise LimitExceeded(f"The computation exceeded its timeout of {self.timeout} s.")
+
+        if nodes is not None and self.max_nodes is not None and nodes > self.max_nodes:
+            raise LimitExceeded(f"The drawing has more than {self.max_nodes} nodes.")
+
+    def add_entities(self, count: int = 1):
+        """
+            Count entities added to a drawing and check the limits.
+
+            :param count: **(Optional)** Number of added entities. Defaults to 1.
+
+            :raises LimitExceeded: If the maximum number of entities was exceeded.
+        """
+
+        self.entities += count
+
+        if self.max_entities is not None and self.entities > self.max_entities:
+            raise LimitExceeded(f"The computation added more than {self.max_entities} entities.")
+
+        self.check()
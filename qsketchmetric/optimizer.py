@@ -0,0 +1,379 @@
+import math
+import re
+from collections import defaultdict, Counter
+from pathlib import Path
+from typing import Optional, Union
+
+import ezdxf
+from ezdxf.document import Drawing
+from ezdxf.entities import DXFGraphic
+from ezdxf.math import Vec3
+from py_expression_eval import Parser  # type: ignore
+
+from qsketchmetric.dxfio import FORMATS, Source, read_dxf
+from qsketchmetric.polyline import is_polyline, polyline_vertices
+
+APPID = "QCAD"
+EXPRESSION_KEYS = re.compile(r"^(c\d*|repeat|bind)$")
+
+
+class TemplateOptimizer:
+    """
+    :param input_dxf_path: Path to the parametric file to optimize. The file may also be given as bytes, as a
+        binary stream or as an already loaded :class:`ezdxf.document.Drawing`, which is then optimized in place.
+    :param output_dxf_path: **(Optional)** Path the optimized file is saved to. Defaults to ``None``, which keeps
+        the optimized drawing in memory only.
+    :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
+        decimal places. It must match the accuracy of the renderings. Defaults to 3.
+    :param solver: **(Optional)** The solver the template is rendered with, see :class:`Renderer`.
+        Defaults to ``"dfs"``.
+    :param output_format: **(Optional)** ``"asc"`` or ``"bin"``, the DXF format of the saved file.
+        Defaults to ``"asc"``.
+    :param remove_duplicates: **(Optional)** Also run the pass removing duplicated virtual lines, which changes
+        the rendered drawing, see below. Defaults to ``False``.
+
+    The :class:`TemplateOptimizer` class simplifies a parametric drawing ahead of time, so the graph
+    :class:`Renderer` walks on every rendering gets smaller. Unless ``remove_duplicates`` is set, the optimized
+    template renders the same drawing. Optimize the parametric DXF before compiling it into a
+    :class:`CompiledTemplate`, the compiled template then benefits as well. The passes are:
+
+    * **Constant folding.** MTEXT variables whose expression uses no variable are replaced by their value. These
+      values are then written into the expressions of the entities, expressions left without variables are
+      replaced by their value.
+    * **Zero-length virtual lines.** LINE entities on :ref:`VIRTUAL_LAYER` with a known length whose ends coincide
+      are removed. They are never drawn and would stop the ``"dfs"`` traversal with a division by zero. Lines with
+      ``?`` are drawn, even on :ref:`VIRTUAL_LAYER`, so they are kept.
+    * **Duplicated virtual lines.** Only with ``remove_duplicates`` and the ``"dfs"`` solver, a LINE on
+      :ref:`VIRTUAL_LAYER` joining the same two nodes with the same expression as an earlier one is removed. The
+      traversal walked such a line back to the node it came from and drew the entities anchored there again, on
+      top of the first copies. **This pass changes the drawing**, those second copies are no longer drawn.
+    * **Virtual chains.** Only with the ``"dfs"`` solver, two collinear LINE entities on :ref:`VIRTUAL_LAYER` with
+      the ``c`` expression, meeting in a node nothing else is anchored in, are merged into one line.
+
+    The ``"lstsq"`` solver weights every line as an equation, so removing duplicated lines or merging chains could
+    move the nodes of inconsistent loops. Only the first two passes are applied for it.
+    """
+
+    def __init__(self, input_dxf_path: Union[Source, Drawing], output_dxf_path: Optional[Path] = None,
+                 accuracy: int = 3, solver: str = "dfs", output_format: str = "asc", remove_duplicates: bool = False):
+        """
+            Instantiate a new :class:`TemplateOptimizer` object.
+        """
+
+        if solver not in ("dfs", "lstsq"):
+            raise ValueError(f"Unknown solver: '{solver}'. Use 'dfs' or 'lstsq'.")
+
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown DXF format: '{output_format}'. Use 'asc' or 'bin'.")
+
+        self.accuracy = accuracy
+        self.solver = solver
+        self.output_format = output_format
+        self.remove_duplicates = remove_duplicates
+        self.output_dxf_path: Optional[Path] = Path(output_dxf_path) if output_dxf_path else None
+
+        if isinstance(input_dxf_path, (str, Path)):
+            self.input_dxf: Drawing = ezdxf.readfile(input_dxf_path)
+        elif isinstance(input_dxf_path, Drawing):
+            self.input_dxf = input_dxf_path
+        else:
+            self.input_dxf = read_dxf(input_dxf_path)
+
+        self.input_msp = self.input_dxf.modelspace()
+
+        self.constants: dict[str, float] = {}
+        self.stats: dict[str, int] = {"constants": 0, "expressions": 0, "zero_length": 0, "duplicates": 0,
+                                      "chains": 0}
+
+    def optimize(self) -> Drawing:
+        """
+            The main method of the :class:`TemplateOptimizer` class.
+            Runs the passes and saves the optimized drawing, if an output path was given. The number of changes
+            made by every pass is counted in :attr:`stats`.
+
+            :return: The optimized drawing.
+        """
+
+        self._fold_constants()
+        self._remove_zero_length_lines()
+
+        if self.solver == "dfs":
+            if self.remove_duplicates:
+                self._remove_duplicated_lines()
+
+            self._merge_chains()
+
+        if self.output_dxf_path:
+            self.input_dxf.saveas(self.output_dxf_path, fmt=self.output_format)
+
+        return self.input_dxf
+
+    def _fold_constants(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Replaces the constant MTEXT variables by their values and writes them into the expressions of the
+            entities. MTEXT variables take precedence over the variables given to the renderer, so their values
+            are final.
+        """
+
+        mtext = self.input_dxf.query("MTEXT")[0]
+        head, separator, custom = mtext.text.rpartition("----- custom -----")
+        entries = custom.split(r"\P")
+
+        for i, entry in enumerate(entries):
+            if ":" not in entry:
+                continue
+
+            name, expression = entry.split(":")[0].strip(), entry.split(":")[1].strip()
+            parsed = Parser().parse(expression)
+
+            if not parsed.variables() and name != "c":
+                self.constants[name] = float(parsed.evaluate({}))
+                literal = self._literal(self.constants[name])
+
+                if literal is not None and literal != expression:
+                    entries[i] = f"{name}: {literal}"
+                    self.stats["constants"] += 1
+
+        mtext.text = head + separator + r"\P".join(entries)
+
+        if not self.constants:
+            return
+
+        for entity in self._entities():
+            xdata = [tag[1] for tag in entity.get_xdata(APPID)]
+            folded = [self._fold_entry(entry) if entity.dxftype() != "POINT" else entry for entry in xdata]
+
+            if folded != xdata:
+                entity.set_xdata(APPID, [(1000, entry) for entry in folded])
+
+    def _fold_entry(self, entry: str) -> str:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Folds the constants into one ``key:value`` XDATA entry, if it holds expressions.
+        """
+
+        key, value = entry.split(":", 1)
+
+        if not EXPRESSION_KEYS.match(key):
+            return entry
+
+        if key == "bind":
+            parts = [binding.split("=", 1) for binding in value.split("@")]
+            value = "@".join(f"{name}={self._fold(expression)}" for name, expression in parts)
+        else:
+            value = "@".join(map(self._fold, value.split("@")))
+
+        return f"{key}:{value}"
+
+    def _fold(self, expression: str) -> str:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Writes the values of the constants into an expression, and replaces the expression by its value when
+            no variable is left. Every constant is written exactly, so the value of the expression does not change.
+        """
+
+        stripped = expression.strip()
+
+        if stripped == "?" or not stripped:
+            return expression
+
+        folded = stripped
+
+        for name, value in self.constants.items():
+            literal = self._literal(value)
+
+            if literal is not None:
+                folded = re.sub(rf"(?<![\w.]){re.escape(name)}(?![\w(])",
+                                literal if value >= 0 else f"({literal})", folded)
+
+        parsed = Parser().parse(folded)
+
+        if not parsed.variables():
+            folded = self._literal(float(parsed.evaluate({}))) or folded
+
+        if folded != stripped:
+            self.stats["expressions"] += 1
+            return folded
+
+        return expression
+
+    def _remove_zero_length_lines(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Removes the virtual lines with a known length whose ends coincide. Lines with ``?`` are drawn by
+            :meth:`Renderer._construct_rest_of_dxf` on any layer, so they are kept.
+        """
+
+        for line in self._virtual_lines():
+            if self._node(line.dxf.start) == self._node(line.dxf.end) and self._expression(line) != "?":
+                self.input_msp.delete_entity(line)
+                self.stats["zero_length"] += 1
+
+    def _remove_duplicated_lines(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Removes the virtual lines joining the same nodes with the same expression as an earlier virtual line.
+            Lines with ``?`` are kept, they are drawn.
+        """
+
+        seen = set()
+
+        for line in self._virtual_lines():
+            expression = self._expression(line)
+            key = (frozenset([self._node(line.dxf.start), self._node(line.dxf.end)]), expression)
+
+            if expression == "?":
+                continue
+
+            if key in seen:
+                self.input_msp.delete_entity(line)
+                self.stats["duplicates"] += 1
+            else:
+                seen.add(key)
+
+    def _merge_chains(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Merges chains of collinear virtual lines with the ``c`` expression. The ``c`` expression keeps the
+            length of a line, so the traversal moves the far end of the chain exactly like the far end of the merged
+            line. The middle node must not hold anything else and must not be the root of the traversal.
+
+            The candidates are found in one pass over the nodes. After every merge the anchors and edges are updated
+            in place, so longer chains are merged link by link.
+        """
+
+        anchors: dict[Vec3, list[DXFGraphic]] = defaultdict(list)
+
+        for entity in self._entities():
+            for node in self._anchors(entity):
+                anchors[node].append(entity)
+
+        if not anchors:
+            return
+
+        root = min(anchors)
+        edges = Counter(frozenset([self._node(e.dxf.start), self._node(e.dxf.end)]) for e in self._virtual_lines())
+
+        for node in list(anchors):
+            entities = anchors[node]
+
+            if node == root or len(entities) != 2 or entities[0] is entities[1]:
+                continue
+
+            first, second = entities
+
+            if not all(self._is_chain_link(e) for e in entities):
+                continue
+
+            start = self._other_end(first, node)
+            end = self._other_end(second, node)
+
+            if start == end or edges[frozenset([start, end])] or not self._collinear(start, node, end):
+                continue
+
+            first.dxf.start, first.dxf.end = start, end
+            self.input_msp.delete_entity(second)
+            self.stats["chains"] += 1
+
+            del anchors[node]
+            anchors[end] = [first if e is second else e for e in anchors[end]]
+            edges -= Counter([frozenset([start, node]), frozenset([node, end])])
+            edges[frozenset([start, end])] += 1
+
+    def _is_chain_link(self, entity: DXFGraphic) -> bool:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return (entity.dxftype() == "LINE" and entity.dxf.layer == "VIRTUAL_LAYER" and
+                self._expression(entity) == "c" and self._node(entity.dxf.start) != self._node(entity.dxf.end))
+
+    def _other_end(self, line: DXFGraphic, node: Vec3) -> Vec3:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        start, end = self._node(line.dxf.start), self._node(line.dxf.end)
+
+        return end if start == node else start
+
+    @staticmethod
+    def _collinear(start: Vec3, middle: Vec3, end: Vec3) -> bool:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Checks that the middle node lies on the segment between the other two.
+        """
+
+        first, second = middle - start, end - middle
+
+        return math.isclose(first.x * second.y - first.y * second.x, 0, abs_tol=1e-9 * first.magnitude *
+                            second.magnitude) and first.dot(second) > 0
+
+    def _anchors(self, entity: DXFGraphic) -> list[Vec3]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the graph nodes an entity is anchored in, like :meth:`Renderer._prepare_graph` builds them.
+        """
+
+        if entity.dxftype() == "LINE":
+            return [self._node(entity.dxf.start), self._node(entity.dxf.end)]
+        elif entity.dxftype() in ["CIRCLE", "ARC"]:
+            return [self._node(entity.dxf.center)]
+        elif entity.dxftype() == "POINT":
+            return [self._node(entity.dxf.location)]
+        elif entity.dxftype() == "INSERT":
+            return [self._node(entity.dxf.insert)]
+        elif is_polyline(entity):
+            return [self._node(Vec3(x, y)) for x, y in polyline_vertices(entity)[0][:, :2].tolist()]
+
+        return []
+
+    def _entities(self) -> list[DXFGraphic]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the entities of the graph, every entity but the MTEXT.
+        """
+
+        return [e for e in self.input_msp if e.dxftype() != "MTEXT" and e.has_xdata(APPID)]
+
+    def _virtual_lines(self) -> list[DXFGraphic]:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return [e for e in self._entities() if e.dxftype() == "LINE" and e.dxf.layer == "VIRTUAL_LAYER"]
+
+    @staticmethod
+    def _expression(entity: DXFGraphic) -> str:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return dict(map(lambda x: (x[1].split(":", 1)), entity.get_xdata(APPID))).get("c", "").strip()
+
+    def _node(self, point: Vec3) -> Vec3:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return Vec3(round(point.x, self.accuracy), round(point.y, self.accuracy), 0)
+
+    @staticmethod
+    def _literal(value: float) -> Optional[str]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Writes a value so that parsing it gives back exactly the same value, ``None`` for infinite values.
+        """
+
+        return repr(value) if math.isfinite(value) else None
@@ -0,0 +1,184 @@
+import math
+from typing import Iterable
+
+import numpy as np
+from ezdxf.entities import DXFGraphic
+from ezdxf.layouts import BaseLayout
+from ezdxf.math import Vec3
+
+
+def is_polyline(e: DXFGraphic) -> bool:
+    """
+        Tells if the entity is a polyline supported as a sequence of straight and bulged segments, a LWPOLYLINE or
+        a 2D POLYLINE.
+
+        :param e: Entity to check.
+    """
+
+    return e.dxftype() == "LWPOLYLINE" or (e.dxftype() == "POLYLINE" and e.is_2d_polyline)
+
+
+def polyline_vertices(e: DXFGraphic) -> tuple[np.ndarray, bool]:
+    """
+        Reads the vertices of a LWPOLYLINE or a 2D POLYLINE into one array.
+
+        :param e: Polyline to read.
+
+        :return: A ``(N, 3)`` array of ``x``, ``y`` and ``bulge`` values and a flag telling if the polyline is
+            closed.
+    """
+
+    if e.dxftype() == "LWPOLYLINE":
+        return np.array(e.get_points("xyb"), dtype=float).reshape(-1, 3), e.closed
+
+    return np.array([(*v.dxf.location.vec2, v.dxf.bulge) for v in e.vertices], dtype=float).reshape(-1, 3), \
+        e.is_closed
+
+
+def set_polyline_vertices(e: DXFGraphic, vertices: np.ndarray):
+    """
+        Writes an array of vertices, as returned by :func:`polyline_vertices`, back to the polyline.
+
+        :param e: Polyline to update, it must have the same number of vertices as the array.
+        :param vertices: A ``(N, 3)`` array of ``x``, ``y`` and ``bulge`` values.
+    """
+
+    if e.dxftype() == "LWPOLYLINE":
+        e.set_points(vertices.tolist(), format="xyb")
+        return
+
+    for vertex, (x, y, bulge) in zip(e.vertices, vertices.tolist()):
+        vertex.dxf.location = Vec3(x, y, vertex.dxf.location.z)
+        vertex.dxf.bulge = bulge
+
+
+def polyline_segments(vertices: np.ndarray, closed: bool) -> list[tuple[int, int]]:
+    """
+        Lists the segments of a polyline as pairs of vertex indices.
+
+        :param vertices: Vertices as returned by :func:`polyline_vertices`.
+        :param closed: Tells if the polyline is closed.
+    """
+
+    count = len(vertices) if closed and len(vertices) > 2 else len(vertices) - 1
+    return [(i, (i + 1) % len(vertices)) for i in range(max(count, 0))]
+
+
+def merge_into_lwpolylines(layout: BaseLayout, entities: Iterable[DXFGraphic],
+                           accuracy: int = 3) -> list[DXFGraphic]:
+    """
+        Stitches connected LINE and ARC entities that share a layer and a linetype into LWPOLYLINE entities.
+        Arcs become bulged segments. Chains are split at nodes where more than two segments meet, chains made of
+        a single segment are left untouched.
+
+        :param layout: Layout the entities belong to, the LWPOLYLINE entities are added to it.
+        :param entities: Entities to merge, entities other than LINE and ARC are kept as they are.
+        :param accuracy: **(Optional)** Number of decimal places used to decide if two endpoints meet.
+            Defaults to 3.
+
+        :return: The entities after merging, the merged LINE and ARC entities are deleted from the layout.
+    """
+
+    kept: list[DXFGraphic] = []
+    groups: dict[tuple[str, str], list[tuple[tuple[float, float], tuple[float, float], float, DXFGraphic]]] = {}
+
+    for e in entities:
+        segment = _segment(e)
+
+        if segment is None:
+            kept.append(e)
+        else:
+            groups.setdefault((e.dxf.layer, e.dxf.linetype), []).append((*segment, e))
+
+    for (layer, linetype), segments in groups.items():
+        for chain, closed in _chains(segments, accuracy):
+            if len(chain) == 1:
+                kept.append(segments[chain[0][0]][3])
+                continue
+
+            points = []
+
+            for index, forward in chain:
+                start, end, bulge, _ = segments[index]
+                points.append((*start, 0, 0, bulge) if forward else (*end, 0, 0, -bulge))
+
+            if not closed:
+                index, forward = chain[-1]
+                points.append((*(segments[index][1] if forward else segments[index][0]), 0, 0, 0))
+
+            kept.append(layout.add_lwpolyline(points, format="xyseb", close=closed,
+                                              dxfattribs={"layer": layer, "linetype": linetype}))
+
+            for index, _ in chain:
+                layout.delete_entity(segments[index][3])
+
+    return kept
+
+
+def _segment(e: DXFGraphic):
+    """
+        .. note:: This function is private and not intended for external use.
+
+        Returns the start point, the end point and the bulge of a LINE or an ARC, ``None`` for other entities and
+        for full circle arcs.
+    """
+
+    if e.dxftype() == "LINE":
+        return e.dxf.start.vec2, e.dxf.end.vec2, 0.0
+
+    if e.dxftype() == "ARC":
+        sweep = (e.dxf.end_angle - e.dxf.start_angle) % 360
+
+        if sweep:
+            return e.start_point.vec2, e.end_point.vec2, math.tan(math.radians(sweep) / 4)
+
+    return None
+
+
+def _chains(segments: list, accuracy: int) -> list[tuple[list[tuple[int, bool]], bool]]:
+    """
+        .. note:: This function is private and not intended for external use.
+
+        Walks the segments into chains.
+
+        :return: A list of chains, every chain is a list of ``(segment index, forward)`` tuples and a flag telling
+            if the chain is closed.
+    """
+
+    def key(point):
+        return round(point[0], accuracy), round(point[1], accuracy)
+
+    ends = [(key(s[0]), key(s[1])) for s in segments]
+    nodes: dict[tuple[float, float], list[int]] = {}
+
+    for i, (start, end) in enumerate(ends):
+        nodes.setdefault(start, []).append(i)
+        nodes.setdefault(end, []).append(i)
+
+    used = [False] * len(segments)
+    chains = []
+    starts = [n for n, s in nodes.items() if len(s) != 2] + [n for n, s in nodes.items() if len(s) == 2]
+
+    for first in starts:
+        for i in nodes[first]:
+            if used[i]:
+                continue
+
+            chain, node = [], first
+
+            while True:
+                used[i] = True
+                forward = ends[i][0] == node
+                chain.append((i, forward))
+                node = ends[i][1] if forward else ends[i][0]
+
+                candidates = [s for s in nodes[node] if not used[s]]
+
+                if len(nodes[node]) != 2 or not candidates:
+                    break
+
+                i = candidates[0]
+
+            chains.append((chain, node == first and len(nodes[first]) == 2 and len(chain) > 1))
+
+    return chains
@@ -0,0 +1,188 @@
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Union, Iterator
+
+import ezdxf
+from ezdxf.addons import Importer
+from ezdxf.document import Drawing
+
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.renderer import Renderer
+
+
+class DocumentPool:
+    """
+    :param registry: **(Optional)** The :class:`TemplateRegistry` the templates are read from. Defaults to a new
+        registry.
+    :param max_idle: **(Optional)** Number of idle output drawings kept per template. Defaults to 4.
+    :param units: **(Optional)** Drawing units set on every new output drawing, for example
+        :attr:`ezdxf.units.MM`. Defaults to ``None``, which keeps the units of :meth:`ezdxf.new`.
+
+    The :class:`DocumentPool` class reuses output drawings between the renderings of a template. The first output
+    drawing of a template is created with :meth:`ezdxf.new` and prepared once: the layers of the template, the
+    linetypes of its ``line`` XDATA and the blocks of its INSERT entities are registered, so :class:`Renderer` finds
+    them and skips their setup. When the drawing is released, the rendered entities and the blocks added by the
+    rendering are deleted and the drawing is handed to the next rendering of the same template.
+
+    Take drawings with :meth:`document`, which releases them when the rendering is done, or with :meth:`acquire`
+    and :meth:`release`. The pool is safe to use from many threads, every drawing is used by one rendering at a
+    time.
+
+    .. note::
+        The registered blocks stay in the saved output as block definitions, even if the rendered drawing only
+        references their scaled copies.
+    """
+
+    def __init__(self, registry: Optional[TemplateRegistry] = None, max_idle: int = 4, units: Optional[int] = None):
+        """
+            Instantiate a new :class:`DocumentPool` object.
+        """
+
+        self.registry = registry if registry is not None else TemplateRegistry()
+        self.max_idle = max_idle
+        self.units = units
+
+        self.created: int = 0
+        self.reused: int = 0
+
+        self._idle: dict[Path, dict] = {}
+        self._in_use: dict[int, tuple[Path, Drawing, set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, path: Union[str, Path]) -> Drawing:
+        """
+            Take an output drawing prepared for a template.
+
+            :param path: Path to the parametric file.
+
+            :return: An output drawing without entities. Give it back with :meth:`release`.
+        """
+
+        path = Path(path).resolve()
+        template = self.registry.get(path)
+
+        with self._lock:
+            entry = self._idle.get(path)
+
+            if entry is not None and entry["template"] is not template:
+                del self._idle[path]
+                entry = None
+
+            if entry is not None and entry["documents"]:
+                doc = entry["documents"].pop()
+                self._in_use[id(doc)] = (path, template, entry["blocks"])
+                self.reused += 1
+                return doc
+
+        doc = self._prepare(template)
+        blocks = {block.name for block in doc.blocks}
+
+        with self._lock:
+            self._in_use[id(doc)] = (path, template, blocks)
+            self.created += 1
+
+        return doc
+
+    def release(self, doc: Drawing):
+        """
+            Give an output drawing back to the pool. Its entities and the blocks added since it was prepared are
+            deleted, so save it before.
+
+            :param doc: A drawing taken with :meth:`acquire`.
+        """
+
+        with self._lock:
+            path, template, blocks = self._in_use.pop(id(doc))
+
+        self._reset(doc, blocks)
+
+        with self._lock:
+            entry = self._idle.setdefault(path, {"template": template, "blocks": blocks, "documents": []})
+
+            if entry["template"] is template and len(entry["documents"]) < self.max_idle:
+                entry["documents"].append(doc)
+
+    def discard(self, doc: Drawing):
+        """
+            Forget an output drawing taken with :meth:`acquire` without reusing it, for example after a failed
+            rendering.
+
+            :param doc: A drawing taken with :meth:`acquire`.
+        """
+
+        with self._lock:
+            self._in_use.pop(id(doc), None)
+
+    @contextmanager
+    def document(self, path: Union[str, Path]) -> Iterator[Drawing]:
+        """
+            Take an output drawing for the enclosed block. It is released when the block ends and discarded when
+            the block raises.
+
+            :param path: Path to the parametric file.
+        """
+
+        doc = self.acquire(path)
+
+        try:
+            yield doc
+        except BaseException:
+            self.discard(doc)
+            raise
+
+        self.release(doc)
+
+    def _prepare(self, template: Drawing) -> Drawing:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Creates an output drawing with the layers, linetypes and blocks the template needs, registered like
+            :meth:`Renderer._prepare_graph` registers them.
+        """
+
+        doc = ezdxf.new()
+
+        if self.units is not None:
+            doc.units = self.units
+
+        importer = Importer(template, doc)
+        imported = False
+
+        for entity in filter(lambda x: x.dxftype() != "MTEXT", template.modelspace()):
+            layer = entity.dxf.layer
+            xdata = dict(map(lambda x: (x[1].split(":", 1)), entity.get_xdata("QCAD"))) if entity.has_xdata(
+                "QCAD") else {}
+
+            if layer != "VIRTUAL_LAYER" and layer not in doc.layers:
+                doc.layers.new(name=layer, dxfattribs={"color": template.layers.get(layer).color})
+
+            if xdata.get("line"):
+                name = Renderer.linetype_name(xdata["line"])
+
+                if name not in doc.linetypes:
+                    doc.linetypes.add(name=name, pattern=xdata["line"], description="- - custom - -")
+
+            if entity.dxftype() == "INSERT" and "template" not in xdata and entity.dxf.name not in doc.blocks:
+                importer.import_block(entity.dxf.name, rename=False)
+                imported = True
+
+        if imported:
+            importer.finalize()
+
+        return doc
+
+    @staticmethod
+    def _reset(doc: Drawing, blocks: set[str]):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Deletes the entities of the modelspace and the blocks that are not in the prepared drawing.
+        """
+
+        doc.modelspace().delete_all_entities()
+
+        for name in [block.name for block in doc.blocks if block.name not in blocks]:
+            doc.blocks.delete_block(name, safe=False)
+
+        doc.entitydb.purge()
@@ -0,0 +1,268 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Any, Union
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+]
+
+
+class MemoryProfiler:
+    """
+    :param top: **(Optional)** Number of allocation sites reported for every phase. Collecting them needs two
+        :mod:`tracemalloc` snapshots per phase, set it to 0 to measure only the totals. Defaults to 5.
+    :param frames: **(Optional)** Number of frames stored for every allocation, see :func:`tracemalloc.start`.
+        Defaults to 1.
+
+    The :class:`MemoryProfiler` class records the memory allocated by named phases of a computation with
+    :mod:`tracemalloc`. Tracing is started on the first phase, if it is not running already, and stopped by
+    :meth:`stop`.
+
+    For every phase :attr:`phases` holds a dictionary with:
+
+    * ``"peak"``: the highest memory usage during the phase, relative to its start, in bytes.
+    * ``"net"``: the memory still allocated at the end of the phase, relative to its start, in bytes.
+    * ``"top"``: the allocation sites that grew the most during the phase, as ``(site, bytes)`` tuples.
+
+    Running a phase again with the same name adds up the net values and keeps the highest peak.
+
+    .. warning::
+        Tracing slows the program down several times. Use the profiler to find the memory hungry phases, not to
+        measure the speed.
+    """
+
+    def __init__(self, top: int = 5, frames: int = 1):
+        """
+            Instantiate a new :class:`MemoryProfiler` object.
+        """
+
+        self.top = top
+        self.frames = frames
+        self.phases: dict[str, dict] = {}
+
+        self._started = False
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+            Measure the memory allocated by the enclosed block.
+
+            :param name: Name of the phase.
+        """
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+
+        before = tracemalloc.take_snapshot().filter_traces(_FILTERS) if self.top else None
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            top = []
+
+            if before is not None:
+                after = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+                top = [(str(stat.traceback), stat.size_diff) for stat in
+                       after.compare_to(before, "lineno")[:self.top] if stat.size_diff > 0]
+
+            record = self.phases.setdefault(name, {"peak": 0, "net": 0, "top": []})
+            record["peak"] = max(record["peak"], peak - start)
+            record["net"] += current - start
+            record["top"] = top or record["top"]
+
+    def stop(self):
+        """
+            Stop tracing, if it was started by the profiler.
+        """
+
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def report(self) -> str:
+        """
+            Format the recorded phases as a text table, followed by the top allocation sites of every phase.
+        """
+
+        lines = [f"{'phase':<24}{'peak [kB]':>12}{'net [kB]':>12}"]
+        lines += [f"{name:<24}{record['peak'] / 1024:>12.1f}{record['net'] / 1024:>12.1f}"
+                  for name, record in self.phases.items()]
+
+        for name, record in self.phases.items():
+            if record["top"]:
+                lines += ["", f"{name}:"] + [f"  {size / 1024:>10.1f} kB  {site}" for site, size in record["top"]]
+
+        return "\n".join(lines)
+
+
+class CostProfiler:
+    """
+    The :class:`CostProfiler` class attributes the cost of rendering to the entities of the parametric drawing,
+    so template authors can see which of their entities are expensive. Pass it to :class:`Renderer` as
+    ``cost_profiler``, renderings with the same profiler add up.
+
+    For every source entity, keyed by its handle, :attr:`entities` holds a dictionary with:
+
+    * ``"type"`` and ``"layer"``: the DXF type and the layer of the entity.
+    * ``"time"``: the seconds spent on the entity by category. ``"prepare"`` is reading the entity into the graph,
+      ``"evaluate"`` evaluating its expressions, ``"import"`` importing and copying its block, ``"extents"``
+      measuring its block, ``"sub_template"`` rendering its sub-template, ``"traverse"`` walking its edges and
+      ``"emit"`` creating its output entities. Every category holds the time not spent in the other categories,
+      so the times add up.
+    * ``"expressions"``: the seconds spent evaluating each of its expressions.
+    * ``"visits"``: the number of times the traversal examined the entity, a measure of the fan-out.
+    * ``"output"``: the number of output entities created for the entity.
+
+    :attr:`expressions` holds the ``"time"`` and the number of ``"calls"`` of every distinct expression. Time spent
+    outside of the entities, like centering the drawing, is not attributed.
+
+    .. warning::
+        Timing every entity slows the rendering down. Compare the entities with each other rather than with
+        unprofiled renderings.
+    """
+
+    def __init__(self):
+        """
+            Instantiate a new :class:`CostProfiler` object.
+        """
+
+        self.entities: dict[str, dict[str, Any]] = {}
+        self.expressions: dict[str, dict[str, float]] = {}
+
+        self._stack: list[float] = []
+
+    def entity(self, handle: Optional[str], dxftype: Optional[str] = None,
+               layer: Optional[str] = None) -> dict[str, Any]:
+        """
+            Get the record of a source entity, creating it on first use.
+
+            :param handle: Handle of the entity. Costs without a handle are recorded under ``"?"``.
+            :param dxftype: **(Optional)** DXF type of the entity, set if given.
+            :param layer: **(Optional)** Layer of the entity, set if given.
+        """
+
+        record = self.entities.setdefault(handle or "?", {"type": None, "layer": None, "time": {},
+                                                          "expressions": {}, "visits": 0, "output": 0})
+
+        if dxftype is not None:
+            record["type"], record["layer"] = dxftype, layer
+
+        return record
+
+    @contextmanager
+    def measure(self, handle: Optional[str], category: str, expression: Optional[str] = None) -> Iterator[None]:
+        """
+            Attribute the time of the enclosed block to an entity. The time of nested blocks is attributed to the
+            nested blocks only.
+
+            :param handle: Handle of the source entity.
+            :param category: Category of the cost.
+            :param expression: **(Optional)** The expression evaluated by the block. Defaults to ``None``.
+        """
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            spent = elapsed - self._stack.pop()
+
+            if self._stack:
+                self._stack[-1] += elapsed
+
+            record = self.entity(handle)
+            record["time"][category] = record["time"].get(category, 0.0) + spent
+
+            if expression is not None:
+                record["expressions"][expression] = record["expressions"].get(expression, 0.0) + spent
+                totals = self.expressions.setdefault(expression, {"time": 0.0, "calls": 0})
+                totals["time"] += spent
+                totals["calls"] += 1
+
+    def count(self, handle: Optional[str], output: int = 0, visits: int = 0):
+        """
+            Count output entities and traversal visits of a source entity.
+        """
+
+        record = self.entity(handle)
+        record["output"] += output
+        record["visits"] += visits
+
+    def hot_spots(self, top: int = 10) -> list[tuple[str, float]]:
+        """
+            :return: The handles of the most expensive entities and their total times, the most expensive first.
+        """
+
+        totals = [(handle, sum(record["time"].values())) for handle, record in self.entities.items()]
+
+        return sorted(totals, key=lambda x: x[1], reverse=True)[:top]
+
+    def to_json(self, path: Optional[Union[str, Path]] = None) -> str:
+        """
+            Export the records as JSON, with the ``"entities"`` and ``"expressions"`` keys.
+
+            :param path: **(Optional)** File the JSON is written to. Defaults to ``None``.
+
+            :return: The JSON document.
+        """
+
+        document = json.dumps({"entities": self.entities, "expressions": self.expressions}, indent=2)
+
+        if path is not None:
+            Path(path).write_text(document)
+
+        return document
+
+    def to_collapsed(self, path: Optional[Union[str, Path]] = None) -> str:
+        """
+            Export the times in the collapsed stack format read by flame graph tools like ``flamegraph.pl`` or
+            speedscope. Every line is a stack ``render;<type> <handle>;<category>[;<expression>]`` followed by its
+            time in microseconds.
+
+            :param path: **(Optional)** File the stacks are written to. Defaults to ``None``.
+
+            :return: The collapsed stacks.
+        """
+
+        lines = []
+
+        for handle, record in self.entities.items():
+            frame = f"render;{record['type'] or 'ENTITY'} {handle}"
+
+            for category, spent in record["time"].items():
+                if category == "evaluate":
+                    lines += [f"{frame};evaluate;{self._frame(expression)} {round(seconds * 1e6)}"
+                              for expression, seconds in record["expressions"].items() if round(seconds * 1e6)]
+                    spent -= sum(record["expressions"].values())
+
+                if round(spent * 1e6) > 0:
+                    lines.append(f"{frame};{category} {round(spent * 1e6)}")
+
+        document = "\n".join(lines) + "\n"
+
+        if path is not None:
+            Path(path).write_text(document)
+
+        return document
+
+    @staticmethod
+    def _frame(expression: str) -> str:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Makes an expression usable as a frame name, the collapsed format separates frames by ``;`` and the
+            count by a space.
+        """
+
+        return expression.replace(";", ",").replace(" ", "")
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+from ezdxf.document import Drawing
+
+from qsketchmetric.dxfio import read_dxf
+from qsketchmetric.template import CompiledTemplate
+
+
+class TemplateRegistry:
+    """
+    :param max_file_bytes: **(Optional)** Budget of the registry in bytes of DXF files. When the files of the
+        loaded templates are larger together, the least recently used templates are evicted. The parsed drawings
+        and their compiled templates take several times the size of the file in memory, so choose the budget
+        accordingly. Defaults to ``None``, which never evicts.
+    :param check_hash: **(Optional)** When the modification time or the size of a file changes, compare the hash
+        of its content before reloading it, so files that were only touched are not parsed again.
+        Defaults to ``True``.
+
+    The :class:`TemplateRegistry` class keeps parsed parametric DXF files in memory for long-running processes.
+    Templates are keyed by their resolved path and reloaded when the file changes on disk. A lookup costs a single
+    ``os.stat`` call as long as the file is unchanged.
+
+    Pass the registry to :class:`Renderer` to render from the cached templates. The rendering does not modify the
+    templates, so one template can be rendered any number of times.
+
+    The registry is safe to use from many threads. Files are read, hashed and parsed outside of its lock, so a
+    large file being loaded does not hold up lookups of other templates. The counters :attr:`hits`,
+    :attr:`loads`, :attr:`invalidations` and :attr:`evictions` describe how well it performs, :attr:`size` is the
+    total size of the cached files.
+    """
+
+    def __init__(self, max_file_bytes: Optional[int] = None, check_hash: bool = True):
+        """
+            Instantiate a new :class:`TemplateRegistry` object.
+        """
+
+        self.max_file_bytes = max_file_bytes
+        self.check_hash = check_hash
+
+        self.hits: int = 0
+        self.loads: int = 0
+        self.invalidations: int = 0
+        self.evictions: int = 0
+        self.size: int = 0
+
+        self._entries: OrderedDict[Path, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Union[str, Path]) -> Drawing:
+        """
+            Retrieve a parsed template, loading it if it is not cached or changed on disk.
+
+            :param path: Path to the parametric file.
+
+            :return: The parsed template. It is shared, do not modify it.
+        """
+
+        path = Path(path).resolve()
+        stat = os.stat(path)
+
+        with self._lock:
+            stale = self._entries.get(path)
+
+            if stale is not None and stale["mtime"] == stat.st_mtime_ns and stale["size"] == stat.st_size:
+                return self._hit(path, stale)
+
+        data = path.read_bytes()
+        digest = self._hash(data)
+
+        if stale is not None and self.check_hash and stale["size"] == stat.st_size and stale["hash"] == digest:
+            with self._lock:
+                if self._entries.get(path) is stale:
+                    # The file was only touched, the hash is compared once per change.
+                    stale["mtime"] = stat.st_mtime_ns
+                    return self._hit(path, stale)
+
+        doc = read_dxf(data)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry is not None and entry is not stale and entry["hash"] == digest:
+                # Another thread loaded the same content in the meantime.
+                return self._hit(path, entry)
+
+            if entry is not None:
+                self.invalidations += 1
+                self._discard(path)
+
+            self.loads += 1
+            self._entries[path] = {"doc": doc, "mtime": stat.st_mtime_ns, "size": len(data), "hash": digest,
+                                   "compiled": {}}
+            self.size += len(data)
+            self._evict()
+
+        return doc
+
+    def get_compiled(self, path: Union[str, Path], accuracy: int = 3) -> CompiledTemplate:
+        """
+            Retrieve a template compiled for geometry-only evaluation. The compiled template is cached with the
+            parsed one and dropped together with it.
+
+            :param path: Path to the parametric file.
+            :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
+                decimal places. Defaults to 3.
+        """
+
+        doc = self.get(path)
+
+        with self._lock:
+            entry = self._entries.get(Path(path).resolve())
+            compiled = entry["compiled"].get(accuracy) if entry and entry["doc"] is doc else None
+
+        if compiled is None:
+            compiled = CompiledTemplate(doc, accuracy)
+
+            with self._lock:
+                entry = self._entries.get(Path(path).resolve())
+
+                if entry and entry["doc"] is doc:
+                    compiled = entry["compiled"].setdefault(accuracy, compiled)
+
+        return compiled
+
+    def invalidate(self, path: Optional[Union[str, Path]] = None):
+        """
+            Drop a template from the registry, or all templates.
+
+            :param path: **(Optional)** Path to the parametric file. Defaults to ``None``, which drops every
+                template.
+        """
+
+        with self._lock:
+            for key in [Path(path).resolve()] if path is not None else list(self._entries):
+                if key in self._entries:
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def __contains__(self, path: Union[str, Path]) -> bool:
+        return Path(path).resolve() in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _hit(self, path: Path, entry: dict) -> Drawing:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Counts a lookup served from the cache and marks the entry as the most recently used one. Call it
+            holding the lock.
+        """
+
+        self.hits += 1
+        self._entries.move_to_end(path)
+
+        return entry["doc"]
+
+    def _discard(self, path: Path):
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        self.size -= self._entries.pop(path)["size"]
+
+    def _evict(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evicts the least recently used templates until the registry fits in its budget. The most recent
+            template is always kept.
+        """
+
+        while self.max_file_bytes is not None and self.size > self.max_file_bytes and len(self._entries) > 1:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    @staticmethod
+    def _hash(data: bytes) -> bytes:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return hashlib.blake2b(data, digest_size=16).digest()
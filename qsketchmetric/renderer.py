@@ -1,32 +1,86 @@
+import hashlib
 import math
 import string
+from concurrent.futures import Executor, Future, wait
+from contextlib import nullcontext
 from copy import deepcopy
 from pathlib import Path
-from random import choice
-from typing import Optional, Dict
+from random import Random
+from typing import Optional, Dict, Union, Any, Iterable, TYPE_CHECKING
 
 import ezdxf
+import numpy as np
 from ezdxf import bbox
 from ezdxf.addons import Importer
 from ezdxf.document import Drawing
-from ezdxf.entities import DXFGraphic
-from ezdxf.layouts import Modelspace
+from ezdxf.entities import DXFGraphic, Arc
+from ezdxf.layouts import Modelspace, BaseLayout
 from ezdxf.math import Vec3
 from py_expression_eval import Parser  # type: ignore
 
+from qsketchmetric.dxfio import Source, Target, read_dxf, write_dxf, dxf_to_bytes
+from qsketchmetric.emit import BulkEmitter
+from qsketchmetric.limits import Limits
+from qsketchmetric.profiling import MemoryProfiler, CostProfiler
+from qsketchmetric.repeat import parse_repeat
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.sparse import SparseLeastSquares
+from qsketchmetric.template import CompiledTemplate
+from qsketchmetric.polyline import merge_into_lwpolylines, is_polyline, polyline_vertices, polyline_segments, \
+    set_polyline_vertices
+
+if TYPE_CHECKING:
+    from qsketchmetric.instancing import InstanceCache
+
+_JOIN_POLL = 0.05
+
 
 class Renderer:
     """
-    :param input_parametric_path: Path to the parametric file intended for rendering.
+    :param input_parametric_path: Path to the parametric file intended for rendering, in ASCII or binary DXF.
+        The file may also be given as bytes, as a binary stream or as an already loaded
+        :class:`ezdxf.document.Drawing`, which is not modified by the rendering.
     :param output_rendered_object: A pre-initialized :class:`ezdxf.document.Drawing` drawing object.
         You can initialize such an object using methods like :meth:`ezdxf.readfile` or :meth:`ezdxf.new`
         By providing an already existing drawing, users can merge multiple visual elements into a singular
-        representation.
+        representation. It may be left out when only :meth:`compute_geometry` is used.
     :param variables: **(Optional)** Supplementary constant variables that can enhance the mathematical
         representations used. Defaults to an empty dictionary.
     :param offset: **(Optional)** Provides offsets for the parametric visualization. Defaults to (0, 0).
     :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
         decimal places. Defaults to 3.
+    :param solver: **(Optional)** Strategy used to place the graph nodes. ``"dfs"`` fixes the nodes one by one
+        in the order of the traversal, ``"lstsq"`` solves all node positions at once as a least squares problem
+        over the edge directions and lengths. Defaults to ``"dfs"``.
+    :param merge_polylines: **(Optional)** Stitch connected output LINE and ARC entities that share a layer and
+        a linetype into LWPOLYLINE entities. Defaults to ``False``.
+    :param registry: **(Optional)** A :class:`TemplateRegistry` the parametric file is taken from, so it is parsed
+        only once for many renderings. The parametric file must then be given as a path. Defaults to ``None``,
+        which reads the file.
+    :param memory_profiler: **(Optional)** A :class:`MemoryProfiler` recording the memory allocated by every
+        phase of :meth:`render`. Defaults to ``None``, which disables profiling.
+    :param output_layout: **(Optional)** Layout of the output drawing the rendered entities are added to, for
+        example a block definition. Defaults to ``None``, which uses the modelspace of the output drawing.
+    :param instances: **(Optional)** An :class:`InstanceCache` the sub-templates are rendered with, so renderings
+        into one output drawing share their sub-template blocks. Defaults to ``None``, which creates a cache on
+        the first sub-template.
+    :param limits: **(Optional)** :class:`Limits` bounding the number of graph nodes and output entities, the run
+        time of :meth:`render` and allowing to cancel it. Defaults to ``None``, which means no limits.
+    :param cost_profiler: **(Optional)** A :class:`CostProfiler` attributing the time and the output of
+        :meth:`render` to the entities and expressions of the parametric file. Defaults to ``None``, which
+        disables profiling.
+    :param bulk_emission: **(Optional)** Collect the LINE, CIRCLE, ARC and INSERT entities during the traversal
+        and add them to the output DXF in batches with a :class:`BulkEmitter`, which is faster for large drawings.
+        The entities are then grouped by type and attributes in the output. Defaults to ``False``.
+    :param executor: **(Optional)** A :class:`concurrent.futures.Executor`, for example a
+        :class:`concurrent.futures.ProcessPoolExecutor`, the independent subtrees of the graph are traversed with,
+        see :meth:`CompiledTemplate.split`. Only the ``"dfs"`` solver supports it and it implies
+        ``bulk_emission``. The workers stop at the timeout of the ``limits``, a cancellation stops the rendering
+        while the started jobs run to their end. The traversal in the workers is not profiled, so a
+        ``cost_profiler`` cannot be used with it and a ``memory_profiler`` only measures the calling process.
+        Defaults to ``None``, which traverses the whole graph in the calling thread.
+    :param parts: **(Optional)** Number of parts the graph is roughly split into for the ``executor``.
+        Defaults to 8.
 
 
     The :class:`Renderer` class interprets parametric DXF files, transforming them into visual representations.
@@ -34,14 +88,23 @@ class Renderer:
     .. warning::
         Remember to make sure that the output and input DXF files are configured in the same units
 
+    .. note::
+        Rendering does not modify the parametric file, it only writes to the output drawing. Many
+        :class:`Renderer` instances can therefore run in parallel threads over one template shared through a
+        :class:`TemplateRegistry`, as long as each of them renders into its own output drawing.
+
     .. seealso::
           `ezdxf Documentation <https://ezdxf.readthedocs.io/en/stable/>`_ - A comprehensive library to manage
           DXF drawings, allowing users to read, write, and modify DXF content efficiently.
     """
 
-    def __init__(self, input_parametric_path: Path, output_rendered_object: Drawing,
+    def __init__(self, input_parametric_path: Union[Source, Drawing], output_rendered_object: Optional[Drawing] = None,
                  variables: Optional[dict[str, float]] = None, offset: tuple[int, int] = (0, 0),
-                 accuracy: int = 3):
+                 accuracy: int = 3, solver: str = "dfs", merge_polylines: bool = False,
+                 registry: Optional[TemplateRegistry] = None, memory_profiler: Optional[MemoryProfiler] = None,
+                 output_layout: Optional[BaseLayout] = None, instances: Optional["InstanceCache"] = None,
+                 limits: Optional[Limits] = None, cost_profiler: Optional[CostProfiler] = None,
+                 bulk_emission: bool = False, executor: Optional[Executor] = None, parts: int = 8):
         """
             Instantiate a new :class:``Renderer`` object.
         """
@@ -49,26 +112,100 @@ class Renderer:
         if variables is None:
             variables = dict()
 
+        if solver not in ("dfs", "lstsq"):
+            raise ValueError(f"Unknown solver: '{solver}'. Use 'dfs' or 'lstsq'.")
+
+        if executor is not None and (solver != "dfs" or cost_profiler is not None):
+            raise ValueError("An executor needs the 'dfs' solver and cannot be used with a cost profiler.")
+
+        self.solver = solver
+        self.merge_polylines = merge_polylines
+        self.memory_profiler = memory_profiler
+
         self.accuracy = accuracy
 
-        self.new_points: Dict[Vec3, tuple[int, int]] = {}
-        self.input_parametric_path: Path = Path(input_parametric_path)
+        self.input_parametric_path: Optional[Path] = None
+
+        if isinstance(input_parametric_path, (str, Path)):
+            self.input_parametric_path = Path(input_parametric_path)
+        elif registry is not None:
+            raise ValueError("A registry needs the parametric file to be given as a path.")
+
+        if registry is not None:
+            self.input_dxf: Drawing = registry.get(self.input_parametric_path)
+        elif self.input_parametric_path is not None:
+            self.input_dxf = ezdxf.readfile(self.input_parametric_path)
+        elif isinstance(input_parametric_path, Drawing):
+            self.input_dxf = input_parametric_path
+        else:
+            self.input_dxf = read_dxf(input_parametric_path)
 
-        self.input_dxf: Drawing = ezdxf.readfile(self.input_parametric_path)
         self.input_msp: Modelspace = self.input_dxf.modelspace()
 
-        self.output_dxf: Drawing = output_rendered_object
-        self.output_msp: Modelspace = self.output_dxf.modelspace()
+        self.output_dxf: Optional[Drawing] = output_rendered_object
+        self.output_msp: Optional[BaseLayout] = output_layout
+        if output_layout is None and self.output_dxf is not None:
+            self.output_msp = self.output_dxf.modelspace()
+
+        self.variables: Dict[str, float] = {} | variables
 
+        self.new_entities: list[DXFGraphic] = []
+        self.polylines: list[dict] = []
+        self.closure_residuals: Dict[tuple[Vec3, Vec3], float] = {}
+        self._random = Random()
+        self._registry = registry
+        self._template: Optional[CompiledTemplate] = None
+        self._instances = instances
+        self._emitter: Optional[BulkEmitter] = BulkEmitter(self.output_msp) if (
+            bulk_emission or executor is not None) and self.output_msp is not None else None
+        self._init_traversal({}, {}, offset, limits, cost_profiler, self._emitter is not None)
+        self._executor = executor
+        self._parts = parts
+        self._part_size = 0
+        self._pending: list[tuple[Vec3, float, float, list[Vec3]]] = []
+        self._jobs: list[Future] = []
+        self._remote: list[Dict[tuple, tuple[dict, list[tuple]]]] = []
+        self._extents: list[bbox.BoundingBox] = []
+
+    def _init_traversal(self, graph: Dict[Vec3, list[tuple[str, Vec3, float, dict]]],
+                        visited_graph: Dict[Vec3, list[tuple[str, Vec3]]], offset: tuple[float, float],
+                        limits: Optional[Limits], cost_profiler: Optional[CostProfiler], bulk: bool):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Sets the state :meth:`_dfs` works on, for a new renderer and for a worker of the executor, see
+            :meth:`_worker`.
+        """
+
+        self.graph = graph
+        self.visited_graph = visited_graph
         self.offset_x: float = offset[0]
         self.offset_y: float = offset[1]
+        self.limits = limits
+        self.cost_profiler = cost_profiler
 
-        self.variables: Dict[str, float] = {} | variables
-
-        self.graph: Dict[Vec3, list[tuple[str, Vec3, float, dict]]] = {}
-        self.visited_graph: Dict[Vec3, list[tuple[str, Vec3]]] = {}
+        self.new_points: Dict[Vec3, tuple[float, float]] = {}
         self.points: Dict[str, Vec3] = {}
-        self.new_entities: list[DXFGraphic] = []
+        self._bulk = bulk
+        self._batches: Dict[tuple, tuple[dict, list[tuple]]] = {}
+        self._placement = 0
+        self._subtrees: Dict[int, tuple[int, list[Vec3]]] = {}
+
+    @classmethod
+    def _worker(cls, graph: Dict[Vec3, list[tuple[str, Vec3, float, dict]]],
+                visited_graph: Dict[Vec3, list[tuple[str, Vec3]]], offset: tuple[float, float],
+                limits: Optional[Limits]) -> "Renderer":
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Creates the renderer traversing subtrees of the graph in a worker of the executor, see
+            :meth:`_traverse`. It has no input or output drawing and keeps its entities in batches.
+        """
+
+        renderer = cls.__new__(cls)
+        renderer._init_traversal(graph, visited_graph, offset, limits, None, True)
+
+        return renderer
 
     def render(self) -> dict[str, tuple[float, float]]:
         """
@@ -78,26 +215,136 @@ class Renderer:
            :return: A dictionary containing rendered points marked in the parametric drawing.
         """
 
-        extracted_texts: filter = filter(None, self.input_dxf.query("MTEXT")[0].text.split(
-            "----- custom -----")[-1].split("\P"))
+        if self.output_dxf is None:
+            raise ValueError("An output drawing is needed to render, use compute_geometry for the geometry only.")
+
+        with self.limits.running() if self.limits else nullcontext():
+            with self._phase("variables"):
+                mtext = self.input_dxf.query("MTEXT")[0]
 
-        extracted_variables: Dict[str, float] = {
-            v.split(":")[0].strip(): float(Parser().parse(v.split(":")[1].strip()).evaluate(self.variables)) for v in
-            extracted_texts}
+                if self.cost_profiler:
+                    self.cost_profiler.entity(mtext.dxf.handle, "MTEXT", mtext.dxf.layer)
 
-        self.variables |= extracted_variables
+                extracted_texts: filter = filter(None, mtext.text.split("----- custom -----")[-1].split("\P"))
 
-        self._prepare_graph()
+                extracted_variables: Dict[str, float] = {
+                    v.split(":")[0].strip(): float(self._evaluate(v.split(":")[1].strip(), mtext.dxf.handle))
+                    for v in extracted_texts}
+
+                self.variables |= extracted_variables
+
+            with self._phase("prepare_graph"):
+                self._prepare_graph()
+
+            with self._phase("solve"):
+                root = min(self.graph.keys())
+                self.new_points = {root: (root.x, root.y)}
+
+                if self.solver == "lstsq":
+                    self._solve(root)
+                else:
+                    self._split()
+                    self._dfs(root, 0, 0)
+                    self._join()
 
-        root = min(self.graph.keys())
-        self.new_points = {root: (root.x, root.y)}
+            with self._phase("construct"):
+                self._construct_rest_of_dxf()
+                self._construct_polylines()
 
-        self._dfs(root, 0, 0)
-        self._construct_rest_of_dxf()
-        self._center_drawing()
+                if self._emitter is not None:
+                    self._flush()
+
+            with self._phase("center_drawing"):
+                self._center_drawing()
+
+            if self.merge_polylines:
+                with self._phase("merge_polylines"):
+                    self.new_entities = merge_into_lwpolylines(self.output_msp, self.new_entities, self.accuracy)
 
         return self.points
 
+    def compute_geometry(self, variables: Optional[dict[str, float]] = None,
+                         segments: bool = False) -> dict[str, Any]:
+        """
+            Compute the named points and the bounding box of the rendered drawing without creating any DXF
+            entities. The template is compiled into a :class:`CompiledTemplate` on the first call, or taken from
+            the registry, so repeated calls only evaluate the expressions and place the nodes numerically.
+
+            The offset of the renderer is not applied, like for the points returned by :meth:`render`.
+
+            :param variables: **(Optional)** Variables overriding the variables of the renderer.
+                Defaults to ``None``.
+            :param segments: **(Optional)** Also return the coordinates of the rendered entities, see
+                :meth:`CompiledTemplate.evaluate`. Defaults to ``False``.
+
+            :return: A dictionary with ``"points"``, the named points mapped to their ``(x, y)`` positions, and
+                ``"extents"``, the width and height of the drawing. With ``segments`` it also holds the
+                ``"lines"``, ``"circles"``, ``"arcs"``, ``"inserts"``, ``"repeats"`` and ``"polylines"`` arrays of
+                the drawing and the ``"layers"`` of the entities.
+        """
+
+        geometry = self._compiled().evaluate(self.variables | (variables or {}), self.solver, segments)
+
+        result: dict[str, Any] = {
+            "points": {name: tuple(position[0].tolist()) for name, position in geometry["points"].items()},
+            "extents": tuple(geometry["extents"][0].tolist()),
+        }
+
+        if segments:
+            result |= {key: geometry[key][0] for key in ("lines", "circles", "arcs", "inserts", "repeats")}
+            result |= {"polylines": [polyline[0] for polyline in geometry["polylines"]], "layers": geometry["layers"]}
+
+        return result
+
+    def compute_partial(self, points: Iterable[str] = (), layers: Iterable[str] = (),
+                        variables: Optional[dict[str, float]] = None) -> dict[str, Any]:
+        """
+            Compute only some named points and the entities on some layers, see
+            :meth:`CompiledTemplate.evaluate_partial`. Only the part of the graph placing them is traversed and
+            only the expressions and MTEXT variables on that part are evaluated, so a few anchor points of a large
+            drawing are much cheaper than the whole geometry.
+
+            The drawing is not moved to the lower left corner of its extents, which are not computed. The
+            coordinates are those of the parametric drawing, the node with the lowest coordinates keeps its
+            position. They differ from the points of :meth:`render` and :meth:`compute_geometry` by one shift, so
+            distances and relative placements are the same.
+
+            :param points: **(Optional)** Names of the points to compute. Defaults to none.
+            :param layers: **(Optional)** Layers whose entities are computed. Defaults to none.
+            :param variables: **(Optional)** Variables overriding the variables of the renderer.
+                Defaults to ``None``.
+
+            :return: A dictionary with ``"points"``, the requested points mapped to their ``(x, y)`` positions.
+                With ``layers`` it also holds the ``"lines"``, ``"circles"``, ``"arcs"``, ``"inserts"``,
+                ``"repeats"`` and ``"polylines"`` arrays of the entities on the layers and their ``"layers"``, like
+                :meth:`compute_geometry` with ``segments``.
+        """
+
+        layers = tuple(layers)
+        geometry = self._compiled().evaluate_partial(self.variables | (variables or {}), self.solver, points, layers)
+
+        result: dict[str, Any] = {
+            "points": {name: tuple(position[0].tolist()) for name, position in geometry["points"].items()}}
+
+        if layers:
+            result |= {key: geometry[key][0] for key in ("lines", "circles", "arcs", "inserts", "repeats")}
+            result |= {"polylines": [polyline[0] for polyline in geometry["polylines"]], "layers": geometry["layers"]}
+
+        return result
+
+    def render_to_bytes(self, fmt: str = "asc") -> bytes:
+        """
+            Render like :meth:`render` and serialize the output DXF straight into a buffer.
+
+            :param fmt: **(Optional)** ``"asc"`` for ASCII DXF or ``"bin"`` for binary DXF. Defaults to ``"asc"``.
+
+            :return: The content of the output DXF file. The rendered points stay available in :attr:`points`.
+        """
+
+        self.render()
+
+        return dxf_to_bytes(self.output_dxf, fmt)
+
     def get_bb_dimensions(self, custom_msp=None) -> tuple[float, float]:
         """
             Retrieve the bounding box dimensions of the output DXF.
@@ -118,6 +365,17 @@ class Renderer:
         return (bounding_box.rect_vertices()[2].x - bounding_box.rect_vertices()[0].x,
                 bounding_box.rect_vertices()[2].y - bounding_box.rect_vertices()[0].y)
 
+    def save(self, target: Target, fmt: str = "asc"):
+        """
+            Save the output DXF.
+
+            :param target: Path of the output file or a binary stream opened for writing.
+            :param fmt: **(Optional)** ``"asc"`` for ASCII DXF or ``"bin"`` for binary DXF. Binary DXF files are
+                smaller and faster to load and save. Defaults to ``"asc"``.
+        """
+
+        write_dxf(self.output_dxf, target, fmt)
+
     def _prepare_graph(self):
         """
             .. note:: This method is private and not intended for external use.
@@ -129,7 +387,12 @@ class Renderer:
             - **LINE**: Determines start and end points, assesses line types, and updates the graph.
             - **CIRCLE**: Evaluates the center point and updates the graph.
             - **ARC**: Evaluates the center point, accounting for start and end angles, and updates the graph.
+            - **INSERT**: Copies the block, evaluates its scale factors and the optional ``repeat`` array, see
+              :func:`parse_repeat`, and updates the graph. An INSERT with the ``template`` XDATA is a sub-template
+              instead, see :meth:`_render_sub_template`.
             - **POINT**: Evaluates the location point and updates the graph.
+            - **LWPOLYLINE**, 2D **POLYLINE**: Treats every segment like a LINE, the expression of the segment ``i``
+              is taken from the ``c<i>`` XDATA with the ``c`` XDATA as default.
 
             :note: Entities of type "MTEXT" are filtered out during processing.
         """
@@ -137,119 +400,341 @@ class Renderer:
         del_blocks = []
 
         for entity in filter(lambda x: x.dxftype() != "MTEXT", self.input_msp.entity_space.entities):
-            new_length = "?"
+            handle = entity.dxf.handle
 
-            xdata = dict(map(lambda x: (x[1].split(":")), entity.get_xdata("QCAD")))
+            if self.cost_profiler:
+                self.cost_profiler.entity(handle, entity.dxftype(), entity.dxf.layer)
 
-            constant_xdata = xdata.get("c", False)
-            line_xdata = xdata.get("line", False)
-            line_type = "BYLAYER"
-            layer = entity.dxf.layer
+            with self._cost(handle, "prepare"):
+                self._add_to_graph(entity, handle, input_layers, del_blocks)
 
-            input_layers[layer] = self.input_dxf.layers.get(entity.dxf.layer).color
+            self._check(len(self.graph))
 
-            if line_xdata:
-                line_type = ''.join(choice(string.ascii_lowercase) for _ in range(8))
+        for block in del_blocks:
+            self.output_dxf.blocks.delete_block(block)
+
+        self._prepare_layers(input_layers)
+
+    def _add_to_graph(self, entity: DXFGraphic, handle: str, input_layers: dict[str, int], del_blocks: list[str]):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds one entity of the parametric drawing to the graph, see :meth:`_prepare_graph`.
+
+            :param entity: The entity.
+            :param handle: Handle of the entity, stored in the graph data so costs can be attributed to it.
+            :param input_layers: Colors of the layers used by the entities, updated with the layer of the entity.
+            :param del_blocks: Names of the blocks imported by the rendering, deleted from the output DXF once copied.
+                Blocks that were already in the output DXF are kept.
+        """
+
+        new_length = "?"
+
+        xdata = dict(map(lambda x: (x[1].split(":", 1)), entity.get_xdata("QCAD")))
+
+        constant_xdata = xdata.get("c", False)
+        line_xdata = xdata.get("line", False)
+        line_type = "BYLAYER"
+        layer = entity.dxf.layer
+
+        input_layers[layer] = self.input_dxf.layers.get(entity.dxf.layer).color
+
+        if line_xdata:
+            line_type = self.linetype_name(line_xdata)
+
+            if line_type not in self.output_dxf.linetypes:
                 self.output_dxf.linetypes.add(name=line_type, pattern=line_xdata, description="- - custom - -", )
 
-            if entity.dxftype() == "LINE":
+        if entity.dxftype() == "LINE":
 
-                start = entity.dxf.start
-                end = entity.dxf.end
+            start = entity.dxf.start
+            end = entity.dxf.end
 
-                start = Vec3(round(start.x, self.accuracy), round(start.y, self.accuracy), 0)
-                end = Vec3(round(end.x, self.accuracy), round(end.y, self.accuracy), 0)
+            start = Vec3(round(start.x, self.accuracy), round(start.y, self.accuracy), 0)
+            end = Vec3(round(end.x, self.accuracy), round(end.y, self.accuracy), 0)
 
-                self.variables["c"] = math.dist(start, end)
+            self.variables["c"] = math.dist(start, end)
 
-                if constant_xdata == "?":
-                    pass
-                else:
-                    new_length = Parser().parse(constant_xdata).evaluate(self.variables)
+            if constant_xdata == "?":
+                pass
+            else:
+                new_length = self._evaluate(constant_xdata, handle)
 
-                e_data_start = {"layer": layer, "linetype": line_type, "start": True}
-                e_data_end = {"layer": layer, "linetype": line_type, "start": False}
+            e_data_start = {"layer": layer, "linetype": line_type, "start": True, "handle": handle}
+            e_data_end = {"layer": layer, "linetype": line_type, "start": False, "handle": handle}
 
-                self.graph[end] = self.graph.get(end, []) + [("LINE", start, new_length, e_data_end)]
-                self.graph[start] = self.graph.get(start, []) + [("LINE", end, new_length, e_data_start)]
-                self.visited_graph[end] = self.visited_graph.get(end, []) + [(layer, start)]
-                self.visited_graph[start] = self.visited_graph.get(start, []) + [(layer, end)]
+            self.graph[end] = self.graph.get(end, []) + [("LINE", start, new_length, e_data_end)]
+            self.graph[start] = self.graph.get(start, []) + [("LINE", end, new_length, e_data_start)]
+            self.visited_graph[end] = self.visited_graph.get(end, []) + [(layer, start)]
+            self.visited_graph[start] = self.visited_graph.get(start, []) + [(layer, end)]
+
+        elif entity.dxftype() == "CIRCLE":
+            center = entity.dxf.center
+            center = Vec3(round(center.x, self.accuracy), round(center.y, self.accuracy), 0)
+            self.variables["c"] = entity.dxf.radius
 
-            elif entity.dxftype() == "CIRCLE":
-                center = entity.dxf.center
-                center = Vec3(round(center.x, self.accuracy), round(center.y, self.accuracy), 0)
-                self.variables["c"] = entity.dxf.radius
+            new_length = self._evaluate(constant_xdata, handle)
 
-                new_length = Parser().parse(constant_xdata).evaluate(self.variables)
+            e_data = {"layer": layer, "radius": entity.dxf.radius, "linetype": line_type, "handle": handle}
 
-                e_data = {"layer": layer, "radius": entity.dxf.radius, "linetype": line_type}
+            self.graph[center] = self.graph.get(center, []) + [("CIRCLE", center, new_length, e_data)]
 
-                self.graph[center] = self.graph.get(center, []) + [("CIRCLE", center, new_length, e_data)]
+        elif entity.dxftype() == "ARC":
+            center = entity.dxf.center
+            center = Vec3(round(center.x, self.accuracy), round(center.y, self.accuracy), 0)
+            self.variables["c"] = entity.dxf.radius
 
-            elif entity.dxftype() == "ARC":
-                center = entity.dxf.center
-                center = Vec3(round(center.x, self.accuracy), round(center.y, self.accuracy), 0)
-                self.variables["c"] = entity.dxf.radius
+            new_length = self._evaluate(constant_xdata, handle)
 
-                new_length = Parser().parse(constant_xdata).evaluate(self.variables)
+            e_data = {"layer": layer, "radius": entity.dxf.radius, "start_angle": entity.dxf.start_angle,
+                      "end_angle": entity.dxf.end_angle, "linetype": line_type, "handle": handle}
 
-                e_data = {"layer": layer, "radius": entity.dxf.radius, "start_angle": entity.dxf.start_angle,
-                          "end_angle": entity.dxf.end_angle, "linetype": line_type}
+            self.graph[center] = self.graph.get(center, []) + [("ARC", center, new_length, e_data)]
 
-                self.graph[center] = self.graph.get(center, []) + [("ARC", center, new_length, e_data)]
+        elif entity.dxftype() == "POINT" and layer == "VIRTUAL_LAYER":
+            location = entity.dxf.location
+            location = Vec3(round(location.x, self.accuracy), round(location.y, self.accuracy), 0)
 
-            elif entity.dxftype() == "POINT" and layer == "VIRTUAL_LAYER":
-                location = entity.dxf.location
-                location = Vec3(round(location.x, self.accuracy), round(location.y, self.accuracy), 0)
+            e_data = {"name": list(xdata.values())[0], "handle": handle}
 
-                e_data = {"name": list(xdata.values())[0]}
+            self.graph[location] = self.graph.get(location, []) + [("POINT", location, 0, e_data)]
 
-                self.graph[location] = self.graph.get(location, []) + [("POINT", location, 0, e_data)]
+        elif is_polyline(entity):
+            vertices, closed = polyline_vertices(entity)
+            nodes = [Vec3(round(x, self.accuracy), round(y, self.accuracy), 0) for x, y in vertices[:, :2].tolist()]
 
-            elif entity.dxftype() == "INSERT":
-                position = entity.dxf.insert
-                position = Vec3(round(position.x, self.accuracy), round(position.y, self.accuracy), 0)
+            self.polylines.append({"nodes": nodes, "bulges": vertices[:, 2], "closed": closed, "layer": layer,
+                                   "linetype": line_type, "handle": handle})
 
-                if entity.dxf.name not in self.output_dxf.blocks:
-                    importer = Importer(self.input_dxf, self.output_dxf)
-                    importer.import_block(entity.dxf.name, rename=False)
-                    importer.finalize()
+            for i, (a, b) in enumerate(polyline_segments(vertices, closed)):
+                start, end = nodes[a], nodes[b]
+
+                if start == end:
+                    continue
+
+                self.variables["c"] = math.dist(start, end)
+                segment_xdata = xdata.get(f"c{i}", constant_xdata)
+                new_length = "?" if segment_xdata == "?" else self._evaluate(segment_xdata, handle)
+
+                e_data_start = {"layer": layer, "linetype": line_type, "start": True,
+                                "polyline": len(self.polylines) - 1, "handle": handle}
+                e_data_end = {"layer": layer, "linetype": line_type, "start": False,
+                              "polyline": len(self.polylines) - 1, "handle": handle}
+
+                self.graph[end] = self.graph.get(end, []) + [("LINE", start, new_length, e_data_end)]
+                self.graph[start] = self.graph.get(start, []) + [("LINE", end, new_length, e_data_start)]
+                self.visited_graph[end] = self.visited_graph.get(end, []) + [(layer, start)]
+                self.visited_graph[start] = self.visited_graph.get(start, []) + [(layer, end)]
+
+        elif entity.dxftype() == "INSERT":
+            position = entity.dxf.insert
+            position = Vec3(round(position.x, self.accuracy), round(position.y, self.accuracy), 0)
+
+            if "template" in xdata:
+                with self._cost(handle, "sub_template"):
+                    e_data = {"layer": layer, "name": self._render_sub_template(xdata, handle), "linetype": line_type,
+                              "xscale": 1, "yscale": 1, "repeat": None, "handle": handle}
+            else:
+                with self._cost(handle, "import"):
+                    if entity.dxf.name not in self.output_dxf.blocks:
+                        importer = Importer(self.input_dxf, self.output_dxf)
+                        importer.import_block(entity.dxf.name, rename=False)
+                        importer.finalize()
+                        del_blocks.append(entity.dxf.name)
+
+                with self._cost(handle, "extents"):
+                    org_w, org_h = self.get_bb_dimensions(entity.block())
 
                 xscale, yscale = None, None
-                org_w, org_h = self.get_bb_dimensions(entity.block())
                 raw_new_w, raw_new_h = map(lambda x: x.strip(), constant_xdata.split("@"))
 
                 if raw_new_w != "?":
                     self.variables["c"] = org_w
-                    xscale = Parser().parse(raw_new_w).evaluate(self.variables) / org_w
+                    xscale = self._evaluate(raw_new_w, handle) / org_w
 
                 if raw_new_h != "?":
                     self.variables["c"] = org_h
-                    yscale = Parser().parse(raw_new_h).evaluate(self.variables) / org_h
+                    yscale = self._evaluate(raw_new_h, handle) / org_h
 
                 xscale = xscale or yscale
                 yscale = yscale or xscale
 
-                new_block_name = entity.dxf.name + "_" + ''.join(choice(string.ascii_lowercase) for _ in range(8))
-                new_block = self.output_dxf.blocks.new(name=new_block_name)
+                new_block_name = entity.dxf.name + "_" + self._random_name()
 
-                for copy_entity in entity.block().entity_space.entities:
-                    if copy_entity.dxf.layer != "VIRTUAL_LAYER":
-                        copy_entity.dxf.linetype = line_type
-                        new_block.add_entity(copy_entity.copy())
+                with self._cost(handle, "import"):
+                    new_block = self.output_dxf.blocks.new(name=new_block_name)
 
-                del_blocks.append(entity.dxf.name)
-                entity.dxf.name = new_block_name
+                    for block_entity in entity.block().entity_space.entities:
+                        if block_entity.dxf.layer != "VIRTUAL_LAYER":
+                            copy_entity = block_entity.copy()
+                            copy_entity.dxf.linetype = line_type
+                            new_block.add_entity(copy_entity)
 
-                e_data = {"layer": layer, "name": entity.dxf.name, "linetype": line_type,
-                          "xscale": xscale, "yscale": yscale}
+                e_data = {"layer": layer, "name": new_block_name, "linetype": line_type,
+                          "xscale": xscale, "yscale": yscale, "repeat": None, "handle": handle}
 
-                self.graph[position] = self.graph.get(position, []) + [("INSERT", position, 0, e_data)]
+            if "repeat" in xdata:
+                e_data["repeat"] = tuple(map(float, parse_repeat(
+                    xdata["repeat"], lambda x: self._evaluate(x, handle))))
 
-        for block in del_blocks:
-            self.output_dxf.blocks.delete_block(block)
+            self.graph[position] = self.graph.get(position, []) + [("INSERT", position, 0, e_data)]
 
-        self._prepare_layers(input_layers)
+    def _render_sub_template(self, xdata: dict[str, str], handle: Optional[str] = None) -> str:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Renders the sub-template of an INSERT into a block of the output DXF and returns the name of the block.
+
+            The ``template`` XDATA holds the path of the sub-template, relative to the parametric file. The
+            optional ``bind`` XDATA sets variables of the sub-template to expressions of the variables of this
+            template, as ``name=expression`` pairs separated by ``@``, for example ``bind:w=width/2@h=height``.
+            Variables that are not bound keep the defaults of the sub-template. The lower left corner of the
+            rendered sub-template is placed at the insertion point, its ``c`` XDATA is not used.
+
+            Sub-templates are rendered through an :class:`InstanceCache`, so every sub-template is rendered only
+            once per set of bound values.
+
+            :param xdata: XDATA of the INSERT.
+            :param handle: **(Optional)** Handle of the INSERT.
+
+            :raises ValueError: If the sub-template references this template, directly or through its own
+                sub-templates.
+        """
+
+        from qsketchmetric.instancing import InstanceCache
+
+        if self._instances is None:
+            self._instances = InstanceCache(self.output_dxf, self._registry, {
+                "accuracy": self.accuracy, "solver": self.solver, "merge_polylines": self.merge_polylines,
+                "limits": self.limits, "cost_profiler": self.cost_profiler})
+
+        base = self.input_parametric_path.resolve().parent if self.input_parametric_path else Path.cwd()
+        path = (base / xdata["template"].strip()).resolve()
+
+        if self.input_parametric_path is not None and path == self.input_parametric_path.resolve():
+            raise ValueError(f"Cyclic sub-template reference: {path.name} -> {path.name}")
+
+        bindings = {}
+
+        for binding in filter(None, map(lambda x: x.strip(), xdata.get("bind", "").split("@"))):
+            name, expression = map(lambda x: x.strip(), binding.split("=", 1))
+            bindings[name] = float(self._evaluate(expression, handle))
+
+        return self._instances.block(path, bindings)[0]
+
+    def _phase(self, name: str):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the context measuring the phase ``name`` with the memory profiler, if there is one.
+        """
+
+        return self.memory_profiler.phase(name) if self.memory_profiler else nullcontext()
+
+    def _check(self, nodes: Optional[int] = None):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Checks the limits of the renderer, if there are any, see :meth:`Limits.check`.
+        """
+
+        if self.limits:
+            self.limits.check(nodes)
+
+    def _count(self, entities: int = 1, handle: Optional[str] = None):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Counts entities added to the output DXF against the limits of the renderer, if there are any, and
+            attributes them to the source entity ``handle`` in the cost profiler.
+        """
+
+        if self.limits:
+            self.limits.add_entities(entities)
+
+        if self.cost_profiler:
+            self.cost_profiler.count(handle, output=entities)
+
+    def _cost(self, handle: Optional[str], category: str):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the context attributing its time to the source entity ``handle`` in the cost profiler, if there
+            is one.
+        """
+
+        return self.cost_profiler.measure(handle, category) if self.cost_profiler else nullcontext()
+
+    def _visit(self, data: dict):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Counts a visit of the traversal to the source entity of the graph data ``data`` and returns the context
+            attributing the time of the visit to it, if there is a cost profiler.
+        """
+
+        if not self.cost_profiler:
+            return nullcontext()
+
+        self.cost_profiler.count(data.get("handle"), visits=1)
+
+        return self.cost_profiler.measure(data.get("handle"), "traverse")
+
+    def _evaluate(self, expression: str, handle: Optional[str] = None) -> float:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evaluates an expression with the variables of the renderer, timing it with the cost profiler.
+
+            :param expression: The expression.
+            :param handle: **(Optional)** Handle of the entity the expression belongs to.
+        """
+
+        if not self.cost_profiler:
+            return Parser().parse(expression).evaluate(self.variables)
+
+        with self.cost_profiler.measure(handle, "evaluate", expression):
+            return Parser().parse(expression).evaluate(self.variables)
+
+    def _compiled(self) -> CompiledTemplate:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the :class:`CompiledTemplate` of the parametric file, compiled on the first call or taken from
+            the registry.
+        """
+
+        if self._template is None:
+            if self._registry is not None:
+                self._template = self._registry.get_compiled(self.input_parametric_path, self.accuracy)
+            else:
+                self._template = CompiledTemplate(self.input_dxf, self.accuracy)
+
+        return self._template
+
+    @staticmethod
+    def linetype_name(pattern: str) -> str:
+        """
+            Returns the name of the linetype added to the output DXF for a ``line`` XDATA pattern, 8 lowercase
+            letters derived from the pattern. Entities with the same pattern share one linetype, also across
+            renderings into one output drawing.
+
+            :param pattern: The pattern, in the ezdxf complex line pattern format.
+        """
+
+        digest = hashlib.blake2b(pattern.encode(), digest_size=8).digest()
+
+        return ''.join(string.ascii_lowercase[byte % 26] for byte in digest)
+
+    def _random_name(self) -> str:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns a random name of 8 lowercase letters for the blocks added to the output DXF.
+            Every instance draws from its own generator, so concurrent renderers do not share random state.
+        """
+
+        return ''.join(self._random.choice(string.ascii_lowercase) for _ in range(8))
 
     def _prepare_layers(self, input_layers: dict[str, int]):
         output_layers = [layer.dxf.name for layer in self.output_dxf.layers]
@@ -272,22 +757,35 @@ class Renderer:
         """
 
         for node, v in self.graph.items():
+            self._check()
+
             for line in [l for l in v if
                          l[0] == "LINE" and l[2] == "?" and (l[3]["layer"], l[1]) in self.visited_graph[node]]:
-                start = (self.new_points[node][0] + self.offset_x, self.new_points[node][1] + self.offset_y)
-                end = (self.new_points[line[1]][0] + self.offset_x, self.new_points[line[1]][1] + self.offset_y)
-                start, end = (start, end) if line[3]["start"] else (end, start)
-
-                self.new_entities.append(
-                    self.output_msp.add_line(
-                        start, end,
-                        dxfattribs={"layer": line[3]["layer"], "linetype": line[3]["linetype"]}
-                    )
-                )
+                self._add_line(self.new_points[node], self.new_points[line[1]], line[3])
 
                 self.visited_graph[line[1]].remove((line[3]["layer"], node))
                 self.visited_graph[node].remove((line[3]["layer"], line[1]))
 
+    def _construct_polylines(self):
+        """
+        .. note:: This method is private and not intended for external use.
+
+        Adds one LWPOLYLINE per polyline of the input DXF. All vertices are moved to their rendered positions at
+        once, the bulges are kept, so bulged segments stay arcs of the same angle.
+        """
+
+        for polyline in self.polylines:
+            self._count(handle=polyline.get("handle"))
+
+            with self._cost(polyline.get("handle"), "emit"):
+                vertices = np.column_stack([[self.new_points[n] for n in polyline["nodes"]], polyline["bulges"]])
+                vertices[:, 0] += self.offset_x
+                vertices[:, 1] += self.offset_y
+
+                self.new_entities.append(self.output_msp.add_lwpolyline(
+                    vertices.tolist(), format="xyb", close=polyline["closed"],
+                    dxfattribs={"layer": polyline["layer"], "linetype": polyline["linetype"]}))
+
     def _dfs(self, node: Vec3, offset_x: float, offset_y: float):
         """
             .. note:: This method is private and not intended for external use.
@@ -302,54 +800,391 @@ class Renderer:
             :param offset_y: Y-coordinate offset for current node and its connected entities.
         """
 
+        self._check()
+
         for name, vector, length, data in [c for c in self.graph[node] if c[2] != "?"]:
+            with self._visit(data):
+                if name == "LINE":
+                    if (data["layer"], vector) in self.visited_graph[node]:
+                        factor = length / math.dist(vector, node)
+
+                        new_offset_x = (vector.x - node.x) * factor - (vector.x - node.x)
+                        new_offset_y = (vector.y - node.y) * factor - (vector.y - node.y)
+
+                        self.new_points[vector] = (vector.x + offset_x + new_offset_x,
+                                                   vector.y + offset_y + new_offset_y)
+
+                        if data["layer"] != "VIRTUAL_LAYER":
+                            self._add_line((node.x + offset_x, node.y + offset_y), self.new_points[vector], data)
+
+                        self.visited_graph[node].remove((data["layer"], vector))
+                        self.visited_graph[vector].remove((data["layer"], node))
+
+                        self._placement += 1
+
+                        if self._placement in self._subtrees:
+                            self._defer(vector, offset_x + new_offset_x, offset_y + new_offset_y)
+                            continue
+
+                        self._dfs(vector, offset_x + new_offset_x, offset_y + new_offset_y)
+
+                else:
+                    self._add_node_entity(name, node.x + offset_x, node.y + offset_y, length, data)
+
+    def _split(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Looks up the subtrees of the graph traversed by the executor, see :meth:`CompiledTemplate.split`.
+            Templates that cannot be compiled, for example with sub-templates, are traversed in one piece.
+        """
+
+        if self._executor is None:
+            return
+
+        try:
+            template = self._compiled()
+        except ValueError:
+            return
+
+        nodes = template.plan("dfs")["nodes"]
+        self._part_size = math.ceil(len(nodes) / max(self._parts, 1))
+        self._subtrees = {first: (end, [Vec3(x, y) for x, y in template.nodes[nodes[first:end]].tolist()])
+                          for first, end in template.split(self._parts)}
+
+    def _defer(self, node: Vec3, offset_x: float, offset_y: float):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Leaves the subtree starting at the already placed node to the executor. Subtrees are sent in groups of
+            about one part of the graph, see :meth:`CompiledTemplate.split`.
+        """
+
+        end, nodes = self._subtrees[self._placement]
+        self._placement = end - 1
+        self._pending.append((node, offset_x, offset_y, nodes))
+
+        if sum(len(n) for *_, n in self._pending) >= self._part_size:
+            self._submit()
+
+    def _submit(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Sends the pending subtrees to the executor as one job.
+        """
+
+        nodes = {n for *_, subtree in self._pending for n in subtree}
+
+        self._jobs.append(self._executor.submit(
+            Renderer._traverse, {n: self.graph[n] for n in nodes}, {n: list(self.visited_graph[n]) for n in nodes},
+            [start for *start, _ in self._pending], (self.offset_x, self.offset_y),
+            self.limits.remaining if self.limits else None))
+
+        self._pending = []
+
+    def _join(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Waits for the jobs of the executor and merges their points, entity batches and extents into the
+            rendering. The limits of the renderer are checked while waiting, so a cancellation or the timeout
+            stops the rendering and cancels the jobs that did not start yet.
+        """
+
+        if self._pending:
+            self._submit()
+
+        try:
+            for job in self._jobs:
+                while self.limits and not wait([job], timeout=_JOIN_POLL).done:
+                    self._check()
+
+                new_points, points, batches, extents = job.result()
+
+                self.new_points |= new_points
+                self.points |= points
+                self._remote.append(batches)
+                self._extents.append(extents)
+                self._count(sum(len(rows) for _, rows in batches.values()))
+        finally:
+            for job in self._jobs:
+                job.cancel()
+
+            self._jobs = []
+
+    @staticmethod
+    def _traverse(graph: Dict[Vec3, list[tuple[str, Vec3, float, dict]]],
+                  visited_graph: Dict[Vec3, list[tuple[str, Vec3]]], starts: list[tuple[Vec3, float, float]],
+                  offset: tuple[float, float], timeout: Optional[float]) -> tuple[dict, dict, dict, bbox.BoundingBox]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Traverses subtrees of the graph like :meth:`_dfs`, in a worker of the executor. Nothing is added to a
+            drawing, the entities are kept in batches, see :meth:`_batch`, and measured, see :meth:`_measure`.
+
+            :param graph: The part of the graph of the subtrees.
+            :param visited_graph: The part of the visited graph of the subtrees.
+            :param starts: The placed first node of every subtree and the offsets of the traversal at that node.
+            :param offset: The offset of the rendering.
+            :param timeout: Number of seconds the rendering has left, ``None`` without a timeout.
+
+            :return: The placed nodes, the named points, the entity batches and their extents.
+        """
+
+        limits = None if timeout is None else Limits(timeout=timeout)
+        renderer = Renderer._worker(graph, visited_graph, offset, limits)
+
+        with limits.running() if limits else nullcontext():
+            for node, offset_x, offset_y in starts:
+                renderer._dfs(node, offset_x, offset_y)
+
+        return renderer.new_points, renderer.points, renderer._batches, Renderer._measure(renderer._batches)
+
+    def _solve(self, root: Vec3):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Places every node reachable from the root at once and adds geometric entities to the output DXF.
+
+            Each LINE with a known length contributes the equation ``end - start = length * direction`` to a linear
+            system over the node coordinates, the root is pinned to its original position. The system is solved
+            with the sparse :class:`SparseLeastSquares`, so closed loops are resolved in the least squares sense and the
+            result does not depend on the order in which the edges are listed. The norm of the unresolved part of
+            every equation is stored in :attr:`closure_residuals`.
+
+            :param root: Node pinned to its original position.
+        """
+
+        nodes = {root: 0}
+        stack = [root]
+        edges = []
+
+        while stack:
+            self._check()
+            node = stack.pop()
+
+            for name, vector, length, data in [c for c in self.graph[node] if c[0] == "LINE" and c[2] != "?"]:
+                with self._visit(data):
+                    if (data["layer"], vector) in self.visited_graph[node] and vector != node:
+                        self.visited_graph[node].remove((data["layer"], vector))
+                        self.visited_graph[vector].remove((data["layer"], node))
+                        edges.append((node, vector, length, data))
+
+                        if vector not in nodes:
+                            nodes[vector] = len(nodes)
+                            stack.append(vector)
+
+        target = np.zeros((len(edges) + 1, 2))
 
-            if name == "CIRCLE":
+        vectors = np.array([(e[1].x - e[0].x, e[1].y - e[0].y) for e in edges]).reshape(-1, 2)
+        lengths = np.array([e[2] for e in edges], dtype=float)
+
+        target[:-1] = vectors * (lengths / np.linalg.norm(vectors, axis=1))[:, None]
+        target[-1] = (root.x, root.y)
+
+        solver = SparseLeastSquares([nodes[e[0]] for e in edges], [nodes[e[1]] for e in edges], len(nodes))
+        positions = solver.solve(target)
+        residuals = np.linalg.norm(solver.system[:-1] @ positions - target[:-1], axis=1)
+
+        for node, i in nodes.items():
+            self.new_points[node] = (float(positions[i, 0]), float(positions[i, 1]))
+
+        self.closure_residuals = {(e[0], e[1]): float(r) for e, r in zip(edges, residuals)}
+
+        for node in nodes:
+            for name, vector, length, data in [c for c in self.graph[node] if c[0] != "LINE" and c[2] != "?"]:
+                self._add_node_entity(name, *self.new_points[node], length, data)
+
+        for start, end, _, data in edges:
+            if data["layer"] != "VIRTUAL_LAYER":
+                self._add_line(self.new_points[start], self.new_points[end], data)
+
+    def _add_line(self, start: tuple[float, float], end: tuple[float, float], data: dict):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds a LINE between two rendered node positions to the output DXF. Segments of polylines are skipped,
+            they are added as a whole by :meth:`_construct_polylines`.
+
+            :param start: Rendered position of the node the edge was reached from.
+            :param end: Rendered position of the node the edge leads to.
+            :param data: Edge data from the graph, decides the direction, layer and linetype of the line.
+        """
+
+        if "polyline" in data:
+            return
+
+        self._count(handle=data.get("handle"))
+
+        with self._cost(data.get("handle"), "emit"):
+            start = (start[0] + self.offset_x, start[1] + self.offset_y)
+            end = (end[0] + self.offset_x, end[1] + self.offset_y)
+            start, end = (start, end) if data["start"] else (end, start)
+
+            if self._bulk:
+                self._batch("LINE", {"layer": data["layer"], "linetype": data["linetype"]}, (*start, *end))
+                return
+
+            self.new_entities.append(self.output_msp.add_line(
+                start, end,
+                dxfattribs={"layer": data["layer"], "linetype": data["linetype"]}))
+
+    def _add_node_entity(self, name: str, x: float, y: float, length: float, data: dict):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds an entity anchored in a single node (CIRCLE, ARC, INSERT) to the output DXF, or records the
+            position of a POINT.
+
+            :param name: Type of the entity.
+            :param x: Rendered X-coordinate of the node.
+            :param y: Rendered Y-coordinate of the node.
+            :param length: Evaluated expression of the entity (radius for CIRCLE and ARC).
+            :param data: Entity data from the graph.
+        """
+
+        if name in ("CIRCLE", "ARC"):
+            self._count(handle=data.get("handle"))
+
+        with self._cost(data.get("handle"), "emit"):
+            if name in ("CIRCLE", "ARC") and self._bulk:
+                self._batch(name, {"layer": data["layer"], "linetype": data["linetype"]},
+                            (x + self.offset_x, y + self.offset_y, length) if name == "CIRCLE" else
+                            (x + self.offset_x, y + self.offset_y, length, data["start_angle"], data["end_angle"]))
+
+            elif name == "CIRCLE":
                 self.new_entities.append(self.output_msp.add_circle(
-                    (node.x + offset_x + self.offset_x, node.y + offset_y + self.offset_y), length,
+                    (x + self.offset_x, y + self.offset_y), length,
                     dxfattribs={"layer": data["layer"], "linetype": data["linetype"]}))
 
             elif name == "ARC":
                 self.new_entities.append(self.output_msp.add_arc(
-                    (node.x + offset_x + self.offset_x, node.y + offset_y + self.offset_y), length,
+                    (x + self.offset_x, y + self.offset_y), length,
                     data["start_angle"], data["end_angle"],
                     dxfattribs={"layer": data["layer"], "linetype": data["linetype"]}))
 
-            elif name == "LINE":
-                if (data["layer"], vector) in self.visited_graph[node]:
-                    factor = length / math.dist(vector, node)
+            elif name == "INSERT":
+                self._add_blockrefs(x + self.offset_x, y + self.offset_y, data)
+
+            elif name == "POINT":
+                self.points[data["name"]] = (x, y)
+
+    def _add_blockrefs(self, x: float, y: float, data: dict):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds the block reference of an INSERT. A repeated INSERT becomes a single MINSERT when its array is
+            aligned with the axes, otherwise one INSERT per copy, all referencing the same block definition.
 
-                    new_offset_x = (vector.x - node.x) * factor - (vector.x - node.x)
-                    new_offset_y = (vector.y - node.y) * factor - (vector.y - node.y)
+            :param x: X-coordinate of the first copy, offset included.
+            :param y: Y-coordinate of the first copy, offset included.
+            :param data: Entity data from the graph.
+        """
 
-                    self.new_points[vector] = (vector.x + offset_x + new_offset_x, vector.y + offset_y + new_offset_y)
+        attribs = {"layer": data["layer"], "xscale": data["xscale"], "yscale": data["yscale"],
+                   "linetype": data["linetype"]}
 
-                    if data["layer"] != "VIRTUAL_LAYER":
-                        start = (node.x + offset_x + self.offset_x, node.y + offset_y + self.offset_y)
-                        end = (vector.x + offset_x + new_offset_x + self.offset_x,
-                               vector.y + offset_y + new_offset_y + self.offset_y)
+        if data.get("repeat") is None:
+            self._count(handle=data.get("handle"))
+            self._add_blockref(data["name"], x, y, attribs)
+            return
 
-                        start, end = (start, end) if data["start"] else (end, start)
+        columns, rows, column_x, column_y, row_x, row_y = data["repeat"]
 
-                        self.new_entities.append(self.output_msp.add_line(
-                            start, end,
-                            dxfattribs={"layer": data["layer"], "linetype": data["linetype"]}))
+        if rows == 1 and column_x == 0:
+            columns, rows, column_x, column_y, row_x, row_y = 1, columns, 0, 0, column_x, column_y
 
-                    self.visited_graph[node].remove((data["layer"], vector))
-                    self.visited_graph[vector].remove((data["layer"], node))
+        if not columns or not rows:
+            return
 
-                    self._dfs(vector, offset_x + new_offset_x, offset_y + new_offset_y)
+        if column_y == 0 and row_x == 0:
+            self._count(handle=data.get("handle"))
+            self._add_blockref(data["name"], x, y, attribs | {
+                "column_count": int(columns), "row_count": int(rows),
+                "column_spacing": column_x, "row_spacing": row_y})
+            return
 
-            elif name == "INSERT":
-                self.new_entities.append(self.output_msp.add_blockref(data["name"], (
-                    node.x + offset_x + self.offset_x, node.y + offset_y + self.offset_y),
-                                                                      dxfattribs={"layer": data["layer"],
-                                                                                  "xscale": data["xscale"],
-                                                                                  "yscale": data["yscale"],
-                                                                                  "linetype": data["linetype"]}))
+        self._count(int(columns) * int(rows), data.get("handle"))
 
-            elif name == "POINT":
-                self.points[data["name"]] = (node.x + offset_x, node.y + offset_y)
+        for column in range(int(columns)):
+            for row in range(int(rows)):
+                self._add_blockref(data["name"], x + column * column_x + row * row_x,
+                                   y + column * column_y + row * row_y, attribs)
+
+    def _add_blockref(self, name: str, x: float, y: float, attribs: dict):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds one block reference, or keeps it for :meth:`_flush` with bulk emission.
+        """
+
+        if self._bulk:
+            self._batch("INSERT", {k: float(v) if isinstance(v, (int, float)) and "count" not in k else v
+                                   for k, v in attribs.items()}, (x, y), name)
+        else:
+            self.new_entities.append(self.output_msp.add_blockref(name, (x, y), dxfattribs=attribs))
+
+    def _batch(self, dxftype: str, attribs: dict, row: tuple, name: Optional[str] = None):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Keeps an entity for :meth:`_flush`. Entities of one type, block and set of attributes form one batch.
+
+            :param dxftype: Type of the entity.
+            :param attribs: DXF attributes of the entity, shared by its batch.
+            :param row: Coordinates of the entity, see :class:`BulkEmitter`.
+            :param name: **(Optional)** Name of the block of an INSERT. Defaults to ``None``.
+        """
+
+        self._batches.setdefault((dxftype, name, tuple(attribs.items())), (attribs, []))[1].append(row)
+
+    def _flush(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds the kept entities to the output DXF with the :class:`BulkEmitter`, batch by batch.
+        """
+
+        self._extents.append(self._measure(self._batches))
+
+        for batches in [self._batches] + self._remote:
+            for (dxftype, name, _), (attribs, rows) in batches.items():
+                if dxftype == "LINE":
+                    self.new_entities += self._emitter.add_lines(np.reshape(rows, (-1, 2, 2)), attribs)
+                elif dxftype == "CIRCLE":
+                    self.new_entities += self._emitter.add_circles(np.array(rows), attribs)
+                elif dxftype == "ARC":
+                    self.new_entities += self._emitter.add_arcs(np.array(rows), attribs)
+                else:
+                    self.new_entities += self._emitter.add_blockrefs(name, np.array(rows), attribs)
+
+        self._batches, self._remote = {}, []
+
+    @staticmethod
+    def _measure(batches: Dict[tuple, tuple[dict, list[tuple]]]) -> bbox.BoundingBox:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Computes the bounding box of the LINE, CIRCLE and ARC batches before they are added to the output DXF.
+            The extents of lines and circles are computed directly, arcs are measured by ezdxf like the entities.
+        """
+
+        box = bbox.BoundingBox()
+
+        for (dxftype, _, _), (attribs, rows) in batches.items():
+            if dxftype == "LINE":
+                box.extend(np.reshape(rows, (-1, 2)).tolist())
+            elif dxftype == "CIRCLE":
+                circles = np.array(rows)
+                radii = np.abs(circles[:, 2:])
+                box.extend(np.concatenate([circles[:, :2] - radii, circles[:, :2] + radii]).tolist())
+            elif dxftype == "ARC":
+                box = box.union(bbox.extents((Arc.new(dxfattribs={
+                    "center": (x, y), "radius": radius, "start_angle": start, "end_angle": end})
+                    for x, y, radius, start, end in rows), cache=bbox.Cache()))
+
+        return box
 
     def _center_drawing(self):
         """
@@ -359,6 +1194,10 @@ class Renderer:
             off the origin node.
         """
 
+        if self._emitter is not None:
+            self._center_bulk()
+            return
+
         new_entities_copy = deepcopy(self.new_entities)
 
         for e in new_entities_copy:
@@ -375,6 +1214,10 @@ class Renderer:
                 position = e.dxf.insert
                 e.update_dxf_attribs(
                     {"insert": Vec3(position.x - self.offset_x, position.y - self.offset_y)})
+            elif e.dxftype() == "LWPOLYLINE":
+                vertices, _ = polyline_vertices(e)
+                vertices[:, :2] -= (self.offset_x, self.offset_y)
+                set_polyline_vertices(e, vertices)
 
         bounding_box = bbox.extents(new_entities_copy, cache=bbox.Cache())
 
@@ -399,5 +1242,39 @@ class Renderer:
                 e.update_dxf_attribs(
                     {"insert": Vec3(position.x + bb_x, position.y + bb_y)})
 
+            elif e.dxftype() == "LWPOLYLINE":
+                vertices, _ = polyline_vertices(e)
+                vertices[:, :2] += (bb_x, bb_y)
+                set_polyline_vertices(e, vertices)
+
+        for k, v in self.points.items():
+            self.points[k] = (round(v[0] + bb_x, self.accuracy), round(v[1] + bb_y, self.accuracy))
+
+    def _center_bulk(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Like :meth:`_center_drawing` for bulk emission. The bounding box of the entities is moved by the offset
+            instead of moving copies of all entities, and the entities are moved with :meth:`BulkEmitter.translate`.
+            The LINE, CIRCLE and ARC entities were already measured by :meth:`_measure`, partly by the executor.
+        """
+
+        bounding_box = bbox.extents(filter(lambda e: e.dxftype() not in ("LINE", "CIRCLE", "ARC"), self.new_entities),
+                                    cache=bbox.Cache())
+
+        for extents in self._extents:
+            bounding_box = bounding_box.union(extents)
+
+        bb_x = self.offset_x - bounding_box.extmin.x
+        bb_y = self.offset_y - bounding_box.extmin.y
+
+        BulkEmitter.translate(self.new_entities, bb_x, bb_y)
+
+        for e in self.new_entities:
+            if e.dxftype() == "LWPOLYLINE":
+                vertices, _ = polyline_vertices(e)
+                vertices[:, :2] += (bb_x, bb_y)
+                set_polyline_vertices(e, vertices)
+
         for k, v in self.points.items():
             self.points[k] = (round(v[0] + bb_x, self.accuracy), round(v[1] + bb_y, self.accuracy))
@@ -0,0 +1,43 @@
+from typing import Callable
+
+import numpy as np
+
+from qsketchmetric.expression import Value
+
+
+def parse_repeat(directive: str, evaluate: Callable[[str], Value]) -> tuple[Value, ...]:
+    """
+        Evaluates the ``repeat`` XDATA of an INSERT into the layout of its array.
+
+        Two forms are supported:
+
+        * ``repeat:n@dx@dy`` - a linear array of ``n`` copies, every copy shifted by ``(dx, dy)`` from the
+          previous one.
+        * ``repeat:columns@rows@dx@dy`` - a rectangular array of ``columns`` times ``rows`` copies, ``dx`` apart
+          horizontally and ``dy`` apart vertically.
+
+        Every field is an expression of the variables. Counts are rounded to the nearest integer, negative
+        counts give an empty array.
+
+        :param directive: Value of the ``repeat`` XDATA.
+        :param evaluate: Function evaluating one field, for scalars or for arrays of variants.
+
+        :return: ``(columns, rows, column_x, column_y, row_x, row_y)``, the counts and the shifts between two
+            neighbouring columns and two neighbouring rows.
+    """
+
+    fields = [evaluate(field.strip()) for field in directive.split("@")]
+
+    if len(fields) == 3:
+        count, dx, dy = fields
+        columns, rows = count, np.ones_like(count)
+        column, row = (dx, dy), (np.zeros_like(dx), np.zeros_like(dy))
+    elif len(fields) == 4:
+        columns, rows, dx, dy = fields
+        column, row = (dx, np.zeros_like(dy)), (np.zeros_like(dx), dy)
+    else:
+        raise ValueError(f"Invalid repeat directive: '{directive}'. Use 'n@dx@dy' or 'columns@rows@dx@dy'.")
+
+    columns, rows = (np.maximum(np.round(np.asarray(c, dtype=float)), 0) for c in (columns, rows))
+
+    return columns, rows, *column, *row
@@ -2,24 +2,43 @@ import math
 import os
 import shutil
 import string
+from contextlib import nullcontext
 from pathlib import Path
 from random import choice
 
 import ezdxf
 from ezdxf import DXFTableEntryError, bbox
+from ezdxf.document import Drawing
 from ezdxf.math import Vec3
-from typing import Optional
+from typing import Optional, Union
+
+from qsketchmetric.dxfio import FORMATS, Source, read_dxf, dxf_to_bytes
+from qsketchmetric.limits import Limits
+from qsketchmetric.profiling import MemoryProfiler
+from qsketchmetric.polyline import is_polyline, polyline_vertices, set_polyline_vertices, polyline_segments
 
 
 class SemiAutomaticParameterization:
     """
-    :param input_dxf_path: Path to the DXF file to be parameterized.
+    :param input_dxf_path: Path to the DXF file to be parameterized. The DXF may also be given as bytes, as a
+        binary stream or as an already loaded :class:`ezdxf.document.Drawing`, which is then parameterized in
+        place.
     :param default_value: **(Optional)** Default expression describing the entities. Defaults to "c".
     :param output_dxf_path: **(Optional)** Path for the output parameterized DXF file. If not provided, the
         output file will be saved in the `parametric` directory, in the same directory
-        as the input file. With the name `input_file_name + _param`.
+        as the input file. With the name `input_file_name + _param`. When the input is not a path and no
+        output path is given, nothing is saved.
     :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
         decimal places. Defaults to 3.
+    :param output_format: **(Optional)** ``"asc"`` to save the output as ASCII DXF or ``"bin"`` to save it as
+        binary DXF, which is smaller and faster to load. The input file may be in either format.
+        Defaults to ``"asc"``.
+    :param memory_profiler: **(Optional)** A :class:`MemoryProfiler` recording the memory allocated by every
+        phase of :meth:`parametrize`. Defaults to ``None``, which disables profiling.
+    :param save: **(Optional)** Save the output file. Set it to ``False`` to keep the parameterized drawing in
+        memory only, without touching the filesystem. Defaults to ``True``.
+    :param limits: **(Optional)** :class:`Limits` bounding the number of graph nodes and added virtual lines, the
+        run time of :meth:`parametrize` and allowing to cancel it. Defaults to ``None``, which means no limits.
 
     The :class:`SemiAutomaticParameterize` class is used to semi-automatic parameterize a DXF file.
     By semi-automatic, it means that the user has to manually customize the parameters of each entity after
@@ -27,47 +46,108 @@ class SemiAutomaticParameterization:
 
     * Adding :ref:`MTEXT` entity.
     * Adding :ref:`VIRTUAL_LAYER` layer.
-    * Adding default expression to each entity.
+    * Adding default expression to each entity. Every segment of a LWPOLYLINE or 2D POLYLINE shares the
+      ``c`` expression of the polyline, add ``c<i>`` XDATA to override the expression of the segment ``i``.
     * Joining entities with virtual lines in to the one coherent graph.
     """
 
-    def __init__(self, input_dxf_path: Path, default_value: str = "c", output_dxf_path: Optional[Path] = None,
-                 accuracy: int = 3):
+    def __init__(self, input_dxf_path: Union[Source, Drawing], default_value: str = "c",
+                 output_dxf_path: Optional[Path] = None, accuracy: int = 3, output_format: str = "asc",
+                 memory_profiler: Optional[MemoryProfiler] = None, save: bool = True,
+                 limits: Optional[Limits] = None):
         """
         Initializes the :class:`SemiAutomaticParameterize` class.
         """
 
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown DXF format: '{output_format}'. Use 'asc' or 'bin'.")
+
         self.accuracy = accuracy
+        self.output_format = output_format
+        self.memory_profiler = memory_profiler
+        self.limits = limits
 
         self.graph_lines: dict[Vec3, list[Vec3]] = {}
         self.parents: dict[Vec3, Vec3] = {}
         self.available_parents: set[Vec3] = set()
         self.APPID: str = "QCAD"
         self.value: str = default_value
-        self.input_dxf_path: Path = Path(input_dxf_path)
+        self.input_dxf_path: Optional[Path] = None
         self.output_dxf_path: Optional[Path] = output_dxf_path
 
+        if isinstance(input_dxf_path, (str, Path)):
+            self.input_dxf_path = Path(input_dxf_path)
+
         if self.output_dxf_path:
             self.output_dxf_path = Path(self.output_dxf_path)
 
-        self._handle_output_path()
+        self.save: bool = save and (self.input_dxf_path is not None or self.output_dxf_path is not None)
+
+        if self.save:
+            self._handle_output_path()
+
+        if self.input_dxf_path is not None:
+            self.input_dxf: Drawing = ezdxf.readfile(self.input_dxf_path)
+        elif isinstance(input_dxf_path, Drawing):
+            self.input_dxf = input_dxf_path
+        else:
+            self.input_dxf = read_dxf(input_dxf_path)
 
-        self.input_dxf = ezdxf.readfile(self.input_dxf_path)
         self.input_msp = self.input_dxf.modelspace()
 
-    def parametrize(self):
+    def parametrize(self) -> Drawing:
         """
             The main method of the :class:`SemiAutomaticParameterize` class.
             Parametrizes the DXF file and saves it to the output path.
+
+            :return: The parameterized drawing, ready to be rendered without reading it back.
+        """
+
+        with self.limits.running() if self.limits else nullcontext():
+            with self._phase("set_appid_and_graph"):
+                self._set_appid_and_graph()
+
+            with self._phase("find_and_union"):
+                self._find_and_union()
+
+            with self._phase("draw_virtual_lines"):
+                self._draw_virtual_lines()
+
+            with self._phase("center_drawing"):
+                self._center_drawing()
+
+            with self._phase("draw_variables"):
+                self._draw_variables()
+
+            if self.save:
+                with self._phase("save"):
+                    self.input_dxf.saveas(self.output_dxf_path, fmt=self.output_format)
+
+        return self.input_dxf
+
+    def parametrize_to_bytes(self) -> bytes:
         """
+            Parametrizes the DXF file like :meth:`parametrize` and serializes the result in the output format.
 
-        self._set_appid_and_graph()
-        self._find_and_union()
-        self._draw_virtual_lines()
-        self._center_drawing()
-        self._draw_variables()
+            :return: The content of the parameterized DXF file.
+        """
 
-        self.input_dxf.saveas(self.output_dxf_path)
+        return dxf_to_bytes(self.parametrize(), self.output_format)
+
+    def _phase(self, name: str):
+        """
+            Returns the context measuring the phase ``name`` with the memory profiler, if there is one.
+        """
+
+        return self.memory_profiler.phase(name) if self.memory_profiler else nullcontext()
+
+    def _check(self, nodes: Optional[int] = None):
+        """
+            Checks the limits, if there are any, see :meth:`Limits.check`.
+        """
+
+        if self.limits:
+            self.limits.check(nodes)
 
     def _handle_output_path(self):
         """
@@ -85,8 +165,8 @@ class SemiAutomaticParameterization:
                 os.mkdir(self.output_dxf_path.parent)
 
         if os.path.exists(self.output_dxf_path) and self.output_dxf_path.is_file():
-            shutil.move(self.output_dxf_path, self.output_dxf_path.parent /
-                        (".backup_parametric_" + self.input_dxf_path.name))
+            name = self.input_dxf_path.name if self.input_dxf_path else self.output_dxf_path.name
+            shutil.move(self.output_dxf_path, self.output_dxf_path.parent / (".backup_parametric_" + name))
 
     def _draw_virtual_lines(self):
         """
@@ -99,6 +179,7 @@ class SemiAutomaticParameterization:
             self.available_parents.add(self._find_parent(n))
 
         for p in self.graph_lines.keys():
+            self._check()
 
             subgraph_points = [n for n in self.graph_lines.keys() if self._find_parent(n) == self._find_parent(p)]
             join_points = [n for n in self.graph_lines.keys() if self._find_parent(n) != self._find_parent(p)]
@@ -145,6 +226,8 @@ class SemiAutomaticParameterization:
         :param visited: list of already visited nodes grows while recursion progresses.
         """
 
+        self._check()
+
         visited.append(node)
         for n in self.graph_lines[node]:
             if n not in visited:
@@ -184,6 +267,23 @@ class SemiAutomaticParameterization:
                 e.update_dxf_attribs({"center": center})
                 self.graph_lines[center] = self.graph_lines.get(center, [])
 
+            elif is_polyline(e):
+                vertices, closed = polyline_vertices(e)
+                vertices[:, :2] = [[round(x, self.accuracy), round(y, self.accuracy)]
+                                   for x, y in vertices[:, :2].tolist()]
+                nodes = [Vec3(x, y) for x, y in vertices[:, :2].tolist()]
+
+                e.discard_xdata(self.APPID)
+                e.set_xdata(self.APPID, [(1000, f"c:{self.value}")])
+                set_polyline_vertices(e, vertices)
+
+                for node in nodes:
+                    self.graph_lines[node] = self.graph_lines.get(node, [])
+
+                for a, b in polyline_segments(vertices, closed):
+                    self.graph_lines[nodes[a]] += [nodes[b]]
+                    self.graph_lines[nodes[b]] += [nodes[a]]
+
             elif e.dxftype() == "INSERT":
                 insert = Vec3(round(e.dxf.insert.x, self.accuracy), round(e.dxf.insert.y, self.accuracy))
 
@@ -195,6 +295,8 @@ class SemiAutomaticParameterization:
             else:
                 e.destroy()
 
+            self._check(len(self.graph_lines))
+
     def _center_drawing(self):
         """
             Centers the parametric drawing.
@@ -218,6 +320,11 @@ class SemiAutomaticParameterization:
                 center = e.dxf.center
                 e.update_dxf_attribs({"center": (center[0] + bb_x, center[1] + bb_y)})
 
+            elif is_polyline(e):
+                vertices, _ = polyline_vertices(e)
+                vertices[:, :2] += (bb_x, bb_y)
+                set_polyline_vertices(e, vertices)
+
     def _draw_virtual_x_y_lines(self, subgraph_point: Vec3, join_point: Vec3):
         """
             Draws the virtual lines between the subgraph point and the join point.
@@ -228,6 +335,9 @@ class SemiAutomaticParameterization:
         delta_x = subgraph_point.x - join_point.x
         delta_y = subgraph_point.y - join_point.y
 
+        if self.limits:
+            self.limits.add_entities(bool(delta_x) + bool(delta_y))
+
         if delta_x:
             line = self.input_msp.add_line(subgraph_point, (join_point.x, subgraph_point.y),
                                            dxfattribs={"layer": "VIRTUAL_LAYER"})
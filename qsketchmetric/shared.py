@@ -0,0 +1,190 @@
+import gc
+import pickle
+import threading
+from multiprocessing import shared_memory, resource_tracker
+from pathlib import Path
+from typing import Iterable, Union
+
+import ezdxf
+
+from qsketchmetric.template import CompiledTemplate
+
+_ALIGNMENT = 64
+
+
+_attached: dict[str, tuple[shared_memory.SharedMemory, list[memoryview], CompiledTemplate]] = {}
+_attached_lock = threading.Lock()
+_preloaded: dict[tuple[Path, int], CompiledTemplate] = {}
+
+
+class SharedTemplate:
+    """
+    :param template: The compiled template to share.
+    :param solvers: **(Optional)** Solvers whose plans are built before sharing, so the workers do not build
+        them on their own. Defaults to ``("dfs",)``.
+
+    The :class:`SharedTemplate` class places a :class:`CompiledTemplate` in :mod:`multiprocessing.shared_memory`
+    once, so that many worker processes can use it without each of them parsing the DXF file or holding its own
+    copy of the arrays.
+
+    The template is pickled with protocol 5 and its :class:`numpy.ndarray` buffers are stored out of band in the
+    shared memory block. The nodes, edges, adjacency lists and string table of a :class:`CompiledTemplate` as well
+    as the index arrays and factors of its plans are arrays, :meth:`attach` rebuilds them as read-only views of the
+    block. Only a small Python part, the items, polylines and MTEXT variables and the dictionaries holding the
+    arrays, is stored in band and unpickled once by every worker.
+
+    A :class:`SharedTemplate` pickles into a few bytes naming the block, pass it to the workers of a process pool
+    and call :meth:`attach` there. A worker keeps its template and the block attached until it exits. The creating
+    process owns the block, call :meth:`unlink` when every worker is done, or use the object as a context manager.
+    """
+
+    def __init__(self, template: CompiledTemplate, solvers: Iterable[str] = ("dfs",)):
+        """
+            Instantiate a new :class:`SharedTemplate` object, copying the template into a new shared memory block.
+        """
+
+        for solver in solvers:
+            template.plan(solver)
+
+        buffers: list[pickle.PickleBuffer] = []
+        data = pickle.dumps(template, protocol=5, buffer_callback=buffers.append)
+
+        self.layout: list[tuple[int, int]] = []
+        offset = self._align(len(data))
+
+        for buffer in buffers:
+            length = buffer.raw().nbytes
+            self.layout.append((offset, length))
+            offset = self._align(offset + length)
+
+        self._memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.name: str = self._memory.name
+        self.size: int = len(data)
+
+        self._memory.buf[:len(data)] = data
+
+        for (start, length), buffer in zip(self.layout, buffers):
+            self._memory.buf[start:start + length] = buffer.raw()
+
+    def attach(self) -> CompiledTemplate:
+        """
+            Rebuild the template from the shared memory block. The block is attached and the template unpickled
+            once per process, later calls return the same template.
+
+            :return: A template whose arrays are read-only views of the shared memory.
+        """
+
+        with _attached_lock:
+            if self.name not in _attached:
+                memory = getattr(self, "_memory", None) or self._open(self.name)
+                view = memory.buf.toreadonly()
+                views = [view, view[:self.size]] + [view[start:start + length] for start, length in self.layout]
+
+                _attached[self.name] = (memory, views, pickle.loads(views[1], buffers=views[2:]))
+
+            return _attached[self.name][2]
+
+    def unlink(self):
+        """
+            Release the template attached in this process, then close and remove the shared memory block. Only the
+            creating process may call it, once the attached template is no longer used.
+
+            :raises BufferError: If the template attached in this process is still referenced. The block is removed
+                anyway and stays mapped until the template is released.
+        """
+
+        with _attached_lock:
+            memory, views = _attached.pop(self.name, (self._memory, []))[:2]
+
+        try:
+            for view in reversed(views):
+                view.release()
+
+            if memory is not self._memory:
+                memory.close()
+
+            self._memory.close()
+        finally:
+            self._memory.unlink()
+
+    def __enter__(self) -> "SharedTemplate":
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+    def __getstate__(self) -> dict:
+        return {"name": self.name, "size": self.size, "layout": self.layout}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+
+    @staticmethod
+    def _open(name: str) -> shared_memory.SharedMemory:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Attaches to an existing block without registering it with the resource tracker, which would remove
+            the block when the first worker exits.
+        """
+
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+        except TypeError:
+            memory = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(memory._name, "shared_memory")  # type: ignore[attr-defined]
+            return memory
+
+    @staticmethod
+    def _align(offset: int) -> int:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def preload_templates(paths: Iterable[Union[str, Path]], accuracy: int = 3,
+                      solvers: Iterable[str] = ("dfs",)) -> dict[Path, CompiledTemplate]:
+    """
+        Compile templates before a process pool forks its workers and freeze them with :func:`gc.freeze`.
+
+        Forked workers inherit the compiled templates through copy-on-write memory. Freezing moves them out of the
+        reach of the garbage collector, whose bookkeeping would otherwise write to, and so copy, the pages holding
+        them in every worker. Use :func:`preloaded_template` in the workers to look the templates up.
+
+        :param paths: Paths to the parametric files.
+        :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
+            decimal places. Defaults to 3.
+        :param solvers: **(Optional)** Solvers whose plans are built in advance. Defaults to ``("dfs",)``.
+
+        :return: The compiled templates keyed by their resolved paths.
+    """
+
+    solvers = tuple(solvers)
+
+    for path in map(lambda p: Path(p).resolve(), paths):
+        template = CompiledTemplate(ezdxf.readfile(path), accuracy)
+
+        for solver in solvers:
+            template.plan(solver)
+
+        _preloaded[(path, accuracy)] = template
+
+    gc.collect()
+    gc.freeze()
+
+    return {path: template for (path, a), template in _preloaded.items() if a == accuracy}
+
+
+def preloaded_template(path: Union[str, Path], accuracy: int = 3) -> CompiledTemplate:
+    """
+        Look up a template compiled by :func:`preload_templates`.
+
+        :param path: Path to the parametric file.
+        :param accuracy: **(Optional)** Accuracy the template was compiled with. Defaults to 3.
+
+        :raises KeyError: If the template was not preloaded.
+    """
+
+    return _preloaded[(Path(path).resolve(), accuracy)]
@@ -0,0 +1,91 @@
+from typing import Iterable
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import splu, spsolve_triangular
+
+
+class SparseLeastSquares:
+    """
+    :param starts: Index of the start node of every edge.
+    :param ends: Index of the end node of every edge.
+    :param nodes: Number of nodes.
+
+    The :class:`SparseLeastSquares` class solves the node positions of a graph from the vectors of its edges in
+    the least squares sense. Every edge contributes the equation ``position[end] - position[start] = vector``,
+    one more equation pins the node 0, so the system has one row per edge and one for the pin.
+
+    The system is kept as a sparse incidence matrix. Its normal equations matrix is the Laplacian of the graph plus
+    the pin, it is sparse, symmetric and positive definite for a connected graph and is factorized once with
+    :func:`scipy.sparse.linalg.splu`. Only the triangular factors and the permutations are kept, they pickle as
+    plain arrays, so a template holding them can be cached and shared between processes. The memory grows with the
+    number of edges and the fill-in of the factors instead of the product of nodes and edges of a dense
+    pseudo-inverse.
+    """
+
+    def __init__(self, starts: Iterable[int], ends: Iterable[int], nodes: int):
+        """
+            Instantiate a new :class:`SparseLeastSquares` object, factorizing the normal equations of the system.
+        """
+
+        starts, ends = np.asarray(list(starts), dtype=int), np.asarray(list(ends), dtype=int)
+        rows = np.arange(len(starts))
+
+        self.system = sparse.csr_matrix(
+            (np.concatenate([-np.ones(len(starts)), np.ones(len(ends)), [1.0]]),
+             (np.concatenate([rows, rows, [len(starts)]]), np.concatenate([starts, ends, [0]]))),
+            shape=(len(starts) + 1, nodes))
+
+        factor = splu((self.system.T @ self.system).tocsc(), permc_spec="MMD_AT_PLUS_A")
+
+        self.lower = sparse.csr_matrix(factor.L)
+        self.upper = sparse.csr_matrix(factor.U)
+        self.perm_r: np.ndarray = factor.perm_r
+        self.perm_c: np.ndarray = factor.perm_c
+
+    def solve(self, target: np.ndarray) -> np.ndarray:
+        """
+            Solve the positions of the nodes.
+
+            :param target: The vector of every edge followed by the position of the node 0, an ``(E + 1, ...)``
+                array. The trailing axes, for example the variants of a batch and the coordinates, are solved
+                independently.
+
+            :return: An ``(N, ...)`` array of positions.
+        """
+
+        shape = target.shape[1:]
+        rhs = self.system.T @ target.reshape(target.shape[0], -1)
+
+        return self._solve_normal(rhs).reshape((-1,) + shape)
+
+    def rows(self, nodes: list[int]) -> np.ndarray:
+        """
+            Compute the rows of the pseudo-inverse of the system for some nodes, the weights of every equation in
+            their positions.
+
+            :param nodes: Indices of the nodes.
+
+            :return: A dense ``(len(nodes), E + 1)`` array.
+        """
+
+        unit = np.zeros((self.system.shape[1], len(nodes)))
+        unit[nodes, np.arange(len(nodes))] = 1
+
+        return np.asarray((self.system @ self._solve_normal(unit)).T)
+
+    def _solve_normal(self, rhs: np.ndarray) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Solves the normal equations with the factors, ``perm_r`` and ``perm_c`` follow
+            :class:`scipy.sparse.linalg.SuperLU`.
+        """
+
+        permuted = np.empty_like(rhs, dtype=float)
+        permuted[self.perm_r] = rhs
+
+        solution = spsolve_triangular(self.lower, permuted, lower=True, unit_diagonal=True)
+        solution = spsolve_triangular(self.upper, solution, lower=False)
+
+        return np.asarray(solution)[self.perm_c]
@@ -0,0 +1,937 @@
+import math
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Optional, Dict, Any, Iterable
+
+import numpy as np
+from ezdxf import bbox
+from ezdxf.document import Drawing
+from ezdxf.math import Vec3
+
+from qsketchmetric.expression import Value, evaluate, parse
+from qsketchmetric.repeat import parse_repeat
+from qsketchmetric.sparse import SparseLeastSquares
+from qsketchmetric.polyline import is_polyline, polyline_vertices, polyline_segments
+
+_LINE, _ITEM = 0, 1
+
+
+class CompiledTemplate:
+    """
+    :param input_dxf: Parametric drawing, for example read with :meth:`ezdxf.readfile`. It is only read.
+    :param accuracy: **(Optional)** The precision used for calculations, represented by the number of
+        decimal places. Defaults to 3.
+
+    The :class:`CompiledTemplate` class reads the graph of a parametric DXF drawing once and keeps it as arrays.
+    Afterwards the geometry of the rendered drawing can be computed for any number of variable sets without
+    touching an ezdxf document.
+
+    The nodes, the edges and the adjacency lists are stored as columns of numbers, the expressions and layers of
+    the edges as codes into the :attr:`strings` table, and the traversal plans as index arrays, so a pickled
+    template is mostly raw buffers, see :class:`qsketchmetric.shared.SharedTemplate`. The adjacency list of the
+    node ``n`` is ``graph_entries[graph_offsets[n]:graph_offsets[n + 1]]``, every row holds the kind of the entry,
+    ``0`` for an edge and ``1`` for an item, the target node, the index of the edge or item and whether the node
+    is the start of the edge.
+
+    The traversal of :class:`qsketchmetric.renderer.Renderer` is replayed symbolically during compilation, so the
+    computed points and entities match the rendered ones. Every variable may be a scalar or a 1-D
+    :class:`numpy.ndarray`, arrays describe a batch of variants that are all computed in one vectorized pass.
+
+    .. note::
+        Extents are computed analytically. ezdxf approximates the extents of arcs by flattening them, so results
+        can differ from :meth:`Renderer.get_bb_dimensions` in the order of ``1e-3`` when an arc touches the
+        bounding box. Templates with sub-templates cannot be compiled.
+    """
+
+    MAX_PARTIAL_PLANS = 64
+    WEIGHT_CHUNK = 256
+
+    def __init__(self, input_dxf: Drawing, accuracy: int = 3):
+        """
+            Instantiate a new :class:`CompiledTemplate` object.
+        """
+
+        self.accuracy = accuracy
+
+        self.mtext_variables: list[tuple[str, str]] = []
+        self.items: list[dict[str, Any]] = []
+        self.polylines: list[dict[str, Any]] = []
+
+        self._points: list[Vec3] = []
+        self._node_index: Dict[Vec3, int] = {}
+        self._edges: list[dict[str, Any]] = []
+        self._graph: Dict[int, list[tuple[int, int, int, bool]]] = {}
+
+        self._read_variables(input_dxf)
+        self._read_entities(input_dxf)
+
+        self.root: int = self._node_index[min(self._points)]
+        self._freeze()
+
+        self.plans: Dict[str, dict[str, Any]] = {"dfs": self._plan_dfs()}
+        self.partial_plans: OrderedDict[tuple[str, frozenset, frozenset], dict[str, Any]] = OrderedDict()
+        self.splits: Dict[int, list[tuple[int, int]]] = {}
+
+    def evaluate(self, variables: Optional[dict[str, Value]] = None, solver: str = "dfs",
+                 segments: bool = False) -> dict[str, Any]:
+        """
+            Computes the geometry of the rendered drawing.
+
+            :param variables: **(Optional)** Variables of the drawing. Values are scalars or 1-D arrays of the
+                same length, one entry per variant.
+            :param solver: **(Optional)** ``"dfs"`` or ``"lstsq"``, see :class:`Renderer`. Defaults to ``"dfs"``.
+            :param segments: **(Optional)** Also return the coordinates of the rendered entities.
+                Defaults to ``False``.
+
+            :return: A dictionary with ``"points"``, the named points mapped to ``(B, 2)`` arrays, and
+                ``"extents"``, the ``(B, 2)`` array of widths and heights of the drawing, where ``B`` is the number
+                of variants. With ``segments`` it also holds ``"lines"`` ``(B, L, 2, 2)``, ``"circles"``
+                ``(B, C, 3)``, ``"arcs"`` ``(B, A, 5)`` and ``"inserts"`` ``(B, I, 4)`` arrays in the rendered
+                coordinates, the ``"repeats"`` ``(B, I, 6)`` array of the INSERT arrays, see :func:`parse_repeat`,
+                ``"polylines"``, a list of ``(B, N, 3)`` arrays of vertices and bulges, and ``"layers"``, the layer
+                of every entity by type.
+        """
+
+        values = self._resolve_variables(variables or {})
+        size = self.batch_size(values)
+        plan = self.plan(solver)
+
+        lengths = self._evaluate_edges(values, size)
+        positions = self._place(plan, lengths, size)
+
+        lines = np.concatenate([positions[plan["lines"]], positions[plan["open_lines"]]]).reshape(-1, 2, size, 2)
+        line_layers = self.strings[self.edge_layer[np.concatenate([plan["line_edges"], plan["open_edges"]])]].tolist()
+
+        circles, arcs, inserts, repeats, points, layers = self._place_items(plan["items"], positions, values, size)
+        polylines = self._place_polylines(plan, range(len(self.polylines)), positions, size)
+        layers |= {"lines": line_layers, "polylines": [polyline["layer"] for polyline in self.polylines]}
+
+        lower, upper = self._extents(plan, lines, circles, arcs, inserts, repeats, polylines, size)
+
+        result: dict[str, Any] = {
+            "points": {k: np.round(v - lower, self.accuracy) for k, v in points.items()},
+            "extents": upper - lower,
+        }
+
+        if segments:
+            result["lines"] = (lines - lower).transpose(2, 0, 1, 3)
+            result["circles"] = self._stack(circles, size, 3, lower)
+            result["arcs"] = self._stack(arcs, size, 5, lower)
+            result["inserts"] = self._stack(inserts, size, 4, lower)
+            result["repeats"] = self._stack(repeats, size, 6)
+            result["polylines"] = [np.concatenate([p[:, :, :2] - lower[:, None, :], p[:, :, 2:]], axis=2)
+                                   for p in polylines]
+            result["layers"] = layers
+
+        return result
+
+    def evaluate_partial(self, variables: Optional[dict[str, Value]] = None, solver: str = "dfs",
+                         points: Iterable[str] = (), layers: Iterable[str] = ()) -> dict[str, Any]:
+        """
+            Computes only the named points and the entities on the layers asked for. Only the edges placing them,
+            see :meth:`partial_plan`, and the MTEXT variables used on the way are evaluated.
+
+            The extents of the drawing are not known without the rest of the drawing, so the result is not moved to
+            the lower left corner like the result of :meth:`evaluate`. The coordinates are those of the parametric
+            drawing, where the node with the lowest coordinates keeps its position. They differ from the
+            coordinates of :meth:`evaluate` by the same shift for all entities and points of a variant.
+
+            :param variables: **(Optional)** Variables of the drawing, see :meth:`evaluate`.
+            :param solver: **(Optional)** ``"dfs"`` or ``"lstsq"``, see :class:`Renderer`. Defaults to ``"dfs"``.
+            :param points: **(Optional)** Names of the points to compute. Defaults to none.
+            :param layers: **(Optional)** Layers whose entities are computed. Defaults to none.
+
+            :return: A dictionary with ``"points"``, ``"lines"``, ``"circles"``, ``"arcs"``, ``"inserts"``,
+                ``"repeats"``, ``"polylines"`` and ``"layers"`` like the one of :meth:`evaluate` with ``segments``,
+                holding the requested points and entities only.
+        """
+
+        plan = self.plan(solver)
+        partial = self.partial_plan(solver, points, layers)
+
+        values = dict(variables or {})
+        values |= {name: evaluate(expression, values) for name, expression in self.mtext_variables
+                   if name in partial["variables"]}
+        size = self.batch_size(values)
+
+        lengths = self._evaluate_edges(values, size, partial["edges"])
+        positions = np.full((plan["least_squares"].system.shape[1] if solver == "lstsq" else len(plan["parents"]),
+                             size, 2), np.nan)
+
+        if solver == "lstsq":
+            target = np.zeros((len(plan["steps"]) + 1, size, 2))
+            target[partial["columns"]] = plan["directions"][partial["columns"], None, :] * \
+                lengths[partial["steps"]][:, :, None]
+            target[-1] = self.nodes[self.root]
+            positions[partial["placements"]] = plan["least_squares"].solve(target)[partial["placements"]]
+        else:
+            positions[0] = self.nodes[self.root]
+
+            for placement in partial["placements"][1:]:
+                positions[placement] = (positions[plan["parents"][placement]] + plan["directions"][placement - 1] *
+                                        lengths[plan["steps"][placement - 1]][:, None])
+
+        lines = positions[partial["lines"]].reshape(-1, 2, size, 2)
+        circles, arcs, inserts, repeats, found, entity_layers = self._place_items(partial["items"], positions,
+                                                                                  values, size)
+
+        entity_layers |= {"lines": self.strings[self.edge_layer[partial["line_edges"]]].tolist(),
+                          "polylines": [self.polylines[p]["layer"] for p in partial["polylines"]]}
+
+        return {
+            "points": {k: np.round(v, self.accuracy) for k, v in found.items()},
+            "lines": lines.transpose(2, 0, 1, 3),
+            "circles": self._stack(circles, size, 3),
+            "arcs": self._stack(arcs, size, 5),
+            "inserts": self._stack(inserts, size, 4),
+            "repeats": self._stack(repeats, size, 6),
+            "polylines": self._place_polylines(plan, partial["polylines"], positions, size),
+            "layers": entity_layers,
+        }
+
+    def _read_variables(self, input_dxf: Drawing):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Reads the custom variables defined in the MTEXT entity of the drawing.
+        """
+
+        extracted_texts = filter(None, input_dxf.query("MTEXT")[0].text.split("----- custom -----")[-1].split(r"\P"))
+        self.mtext_variables = [(v.split(":")[0].strip(), v.split(":")[1].strip()) for v in extracted_texts]
+
+    def _read_entities(self, input_dxf: Drawing):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Reads the entities of the drawing into nodes, edges and items, and builds the same adjacency lists
+            :meth:`Renderer._prepare_graph` builds, see :meth:`_freeze`.
+        """
+
+        for entity in filter(lambda x: x.dxftype() != "MTEXT", input_dxf.modelspace().entity_space.entities):
+            xdata = dict(map(lambda x: (x[1].split(":", 1)), entity.get_xdata("QCAD"))) if entity.has_xdata(
+                "QCAD") else {}
+            constant_xdata = xdata.get("c", False)
+            layer = entity.dxf.layer
+
+            if entity.dxftype() == "LINE":
+                self._edge(self._node(entity.dxf.start), self._node(entity.dxf.end), constant_xdata, layer)
+                continue
+
+            if is_polyline(entity):
+                vertices, closed = polyline_vertices(entity)
+                nodes = [self._node(Vec3(x, y)) for x, y in vertices[:, :2].tolist()]
+
+                for i, (a, b) in enumerate(polyline_segments(vertices, closed)):
+                    if nodes[a] != nodes[b]:
+                        self._edge(nodes[a], nodes[b], xdata.get(f"c{i}", constant_xdata), layer,
+                                   len(self.polylines))
+
+                self.polylines.append({"nodes": nodes, "bulges": vertices[:, 2], "closed": closed, "layer": layer})
+                continue
+
+            item: dict[str, Any] = {"type": entity.dxftype(), "layer": layer, "expression": constant_xdata}
+
+            if entity.dxftype() in ["CIRCLE", "ARC"]:
+                item |= {"node": self._node(entity.dxf.center), "c": entity.dxf.radius}
+
+                if entity.dxftype() == "ARC":
+                    item |= {"start_angle": entity.dxf.start_angle, "end_angle": entity.dxf.end_angle}
+
+            elif entity.dxftype() == "POINT" and layer == "VIRTUAL_LAYER":
+                item |= {"node": self._node(entity.dxf.location), "name": list(xdata.values())[0], "c": 0}
+
+            elif entity.dxftype() == "INSERT":
+                if "template" in xdata:
+                    raise ValueError("Sub-templates are not supported by compiled templates, use Renderer.render.")
+
+                block = entity.block()
+                size = bbox.extents(block, cache=bbox.Cache()).size
+                visible = bbox.extents(filter(lambda e: e.dxf.layer != "VIRTUAL_LAYER", block),
+                                       cache=bbox.Cache())
+
+                item |= {"node": self._node(entity.dxf.insert), "block": entity.dxf.name, "c": 0,
+                         "size": (size.x, size.y), "repeat": xdata.get("repeat"),
+                         "extents": (*visible.extmin.vec2, *visible.extmax.vec2) if visible.has_data else None}
+            else:
+                continue
+
+            self._graph.setdefault(item["node"], []).append((_ITEM, item["node"], len(self.items), True))
+            self.items.append(item)
+
+    def _edge(self, start: int, end: int, expression: str, layer: str, polyline: Optional[int] = None):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds an edge between two nodes, segments of polylines keep the index of their polyline and are not
+            drawn as lines.
+        """
+
+        index = len(self._edges)
+
+        self._edges.append({"start": start, "end": end, "expression": expression, "layer": layer,
+                            "c": math.dist(self._points[start], self._points[end]), "polyline": polyline,
+                            "drawn": layer != "VIRTUAL_LAYER" and polyline is None})
+
+        self._graph.setdefault(end, []).append((_LINE, start, index, False))
+        self._graph.setdefault(start, []).append((_LINE, end, index, True))
+
+    def _node(self, point: Vec3) -> int:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the index of the node at the rounded position of the point, adding the node if needed.
+        """
+
+        point = Vec3(round(point.x, self.accuracy), round(point.y, self.accuracy), 0)
+
+        if point not in self._node_index:
+            self._node_index[point] = len(self._points)
+            self._points.append(point)
+
+        return self._node_index[point]
+
+    def _freeze(self):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Turns the nodes, edges and adjacency lists read from the drawing into arrays and drops the lists.
+        """
+
+        edges = self._edges
+        strings = sorted({e["expression"] for e in edges} | {e["layer"] for e in edges}, key=str)
+        codes = {string: code for code, string in enumerate(strings)}
+
+        self.nodes: np.ndarray = np.array([point.vec2 for point in self._points], dtype=float).reshape(-1, 2)
+        self.strings: np.ndarray = np.array([str(string) for string in strings], dtype=str)
+
+        self.edge_start: np.ndarray = np.array([e["start"] for e in edges], dtype=int)
+        self.edge_end: np.ndarray = np.array([e["end"] for e in edges], dtype=int)
+        self.edge_expression: np.ndarray = np.array([codes[e["expression"]] for e in edges], dtype=int)
+        self.edge_layer: np.ndarray = np.array([codes[e["layer"]] for e in edges], dtype=int)
+        self.edge_polyline: np.ndarray = np.array([-1 if e["polyline"] is None else e["polyline"] for e in edges],
+                                                  dtype=int)
+        self.edge_drawn: np.ndarray = np.array([e["drawn"] for e in edges], dtype=bool)
+        self.edge_constants: np.ndarray = np.array([e["c"] for e in edges], dtype=float)
+
+        self.constant_edges: np.ndarray = np.array([e["expression"] == "c" for e in edges], dtype=bool)
+        self.unknown_edges: np.ndarray = np.array([e["expression"] == "?" for e in edges], dtype=bool)
+        self.expression_edges: np.ndarray = np.flatnonzero(~self.constant_edges & ~self.unknown_edges)
+
+        self.graph_order: np.ndarray = np.array(list(self._graph), dtype=int)
+        self.graph_offsets: np.ndarray = np.cumsum([0] + [len(self._graph.get(n, ()))
+                                                          for n in range(len(self._points))])
+        self.graph_entries: np.ndarray = np.array([entry for n in range(len(self._points))
+                                                   for entry in self._graph.get(n, ())], dtype=int).reshape(-1, 4)
+
+        for polyline in self.polylines:
+            polyline["nodes"] = np.array(polyline["nodes"], dtype=int)
+
+        del self._points, self._node_index, self._edges, self._graph
+
+    def _entries(self, node: int) -> list[list[int]]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the adjacency list of the node as rows of kind, target, index and start.
+        """
+
+        return self.graph_entries[self.graph_offsets[node]:self.graph_offsets[node + 1]].tolist()
+
+    def _visited(self) -> Dict[int, list[tuple[int, int]]]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the layer codes and targets of the edges of every node, like the ``visited_graph`` of
+            :meth:`Renderer._prepare_graph` the traversal removes the edges it follows from.
+        """
+
+        layers = self.edge_layer.tolist()
+
+        return {node: [(layers[index], target) for kind, target, index, _ in self._entries(node) if kind == _LINE]
+                for node in self.graph_order.tolist()}
+
+    def _numeric(self, entry: list[int]) -> bool:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Tells if the graph entry has a known length, entries marked with '?' are skipped by the traversal.
+        """
+
+        return entry[0] != _LINE or not self.unknown_edges[entry[2]]
+
+    def _plan_dfs(self) -> dict[str, Any]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Replays :meth:`Renderer._dfs` without computing any coordinates. Every call of the recursion becomes
+            a placement that is reached from its parent placement along one edge, so the positions of all
+            placements can later be computed for any lengths of the edges.
+        """
+
+        visited = self._visited()
+        layers, drawn = self.edge_layer.tolist(), self.edge_drawn.tolist()
+        nodes, parents, steps = [self.root], [-1], []
+        lines, line_edges, items = [], [], []
+        node_placement = np.full(len(self.nodes), -1)
+        node_placement[self.root] = 0
+
+        stack = [(0, iter(list(filter(self._numeric, self._entries(self.root)))))]
+
+        while stack:
+            placement, entries = stack[-1]
+            node = nodes[placement]
+
+            for kind, target, index, start in entries:
+                if kind != _LINE:
+                    items.append((index, placement))
+
+                elif (layers[index], target) in visited[node]:
+                    visited[node].remove((layers[index], target))
+                    visited[target].remove((layers[index], node))
+
+                    nodes.append(target)
+                    parents.append(placement)
+                    steps.append(index)
+                    node_placement[target] = len(nodes) - 1
+
+                    if drawn[index]:
+                        lines.append((placement, len(nodes) - 1) if start else (len(nodes) - 1, placement))
+                        line_edges.append(index)
+
+                    stack.append((len(nodes) - 1, iter(list(filter(self._numeric, self._entries(target))))))
+                    break
+            else:
+                stack.pop()
+
+        nodes, parents = np.array(nodes, dtype=int), np.array(parents, dtype=int)
+
+        return {"solver": "dfs", "nodes": nodes, "parents": parents, "steps": np.array(steps, dtype=int),
+                "directions": self._directions(nodes[parents[1:]], nodes[1:]),
+                "lines": np.array(lines, dtype=int).reshape(-1, 2), "line_edges": np.array(line_edges, dtype=int),
+                "items": np.array(items, dtype=int).reshape(-1, 2), **self._plan_open_lines(visited, node_placement)}
+
+    def _plan_lstsq(self) -> dict[str, Any]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Replays :meth:`Renderer._solve`. Every node reachable from the root becomes one placement, their
+            positions are solved from the edge lengths with the factorized system, see :class:`SparseLeastSquares`.
+        """
+
+        visited = self._visited()
+        layers, drawn = self.edge_layer.tolist(), self.edge_drawn.tolist()
+        node_placement = {self.root: 0}
+        stack = [self.root]
+        edges, lines, line_edges, items = [], [], [], []
+
+        while stack:
+            node = stack.pop()
+
+            for kind, target, index, start in filter(self._numeric, self._entries(node)):
+                if kind == _LINE and (layers[index], target) in visited[node] and target != node:
+                    visited[node].remove((layers[index], target))
+                    visited[target].remove((layers[index], node))
+                    edges.append((node, target, index, start))
+
+                    if target not in node_placement:
+                        node_placement[target] = len(node_placement)
+                        stack.append(target)
+
+        least_squares = SparseLeastSquares([node_placement[e[0]] for e in edges],
+                                           [node_placement[e[1]] for e in edges], len(node_placement))
+
+        for node, placement in node_placement.items():
+            items += [(e[2], placement) for e in filter(self._numeric, self._entries(node)) if e[0] != _LINE]
+
+        for node, target, index, start in edges:
+            if drawn[index]:
+                a, b = node_placement[node], node_placement[target]
+                lines.append((a, b) if start else (b, a))
+                line_edges.append(index)
+
+        placements = np.full(len(self.nodes), -1)
+        placements[list(node_placement)] = list(node_placement.values())
+        edges = np.array(edges, dtype=int).reshape(-1, 4)
+
+        return {"solver": "lstsq", "least_squares": least_squares, "steps": edges[:, 2].copy(),
+                "directions": self._directions(edges[:, 0], edges[:, 1]),
+                "lines": np.array(lines, dtype=int).reshape(-1, 2), "line_edges": np.array(line_edges, dtype=int),
+                "items": np.array(items, dtype=int).reshape(-1, 2), **self._plan_open_lines(visited, placements)}
+
+    def _directions(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the ``(E, 2)`` unit vectors from the start nodes to the end nodes.
+        """
+
+        directions = self.nodes[ends] - self.nodes[starts]
+
+        return directions / np.hypot(directions[:, 0], directions[:, 1])[:, None]
+
+    def _plan_open_lines(self, visited: Dict[int, list[tuple[int, int]]],
+                         node_placement: np.ndarray) -> dict[str, Any]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Replays :meth:`Renderer._construct_rest_of_dxf`, lines marked with '?' connect the final placements
+            of their nodes.
+
+            :param node_placement: The placement of every node, ``-1`` for the nodes that are not placed.
+        """
+
+        layers, polylines = self.edge_layer.tolist(), self.edge_polyline.tolist()
+        open_lines, open_edges = [], []
+
+        for node in self.graph_order.tolist():
+            for kind, target, index, start in self._entries(node):
+                if kind == _LINE and self.unknown_edges[index] and (layers[index], target) in visited[node]:
+                    a, b = node_placement[node], node_placement[target]
+
+                    if polylines[index] == -1:
+                        open_lines.append((a, b) if start else (b, a))
+                        open_edges.append(index)
+
+                    visited[target].remove((layers[index], node))
+                    visited[node].remove((layers[index], target))
+
+        return {"open_lines": np.array(open_lines, dtype=int).reshape(-1, 2),
+                "open_edges": np.array(open_edges, dtype=int), "node_placement": node_placement}
+
+    def plan(self, solver: str) -> dict[str, Any]:
+        """
+            Returns the traversal plan of the solver, the least squares plan is built on first use.
+
+            :param solver: ``"dfs"`` or ``"lstsq"``, see :class:`Renderer`.
+        """
+
+        if solver not in ("dfs", "lstsq"):
+            raise ValueError(f"Unknown solver: '{solver}'. Use 'dfs' or 'lstsq'.")
+
+        if solver not in self.plans:
+            self.plans[solver] = self._plan_lstsq()
+
+        return self.plans[solver]
+
+    def partial_plan(self, solver: str, points: Iterable[str] = (), layers: Iterable[str] = ()) -> dict[str, Any]:
+        """
+            Returns the part of the traversal plan of the solver needed for some points and layers, see
+            :meth:`evaluate_partial`. Partial plans are built on first use, the :attr:`MAX_PARTIAL_PLANS` most
+            recently used ones are kept.
+
+            With ``"dfs"`` a node is placed from the node it was reached from, so only the edges on the way from
+            the root are needed. With ``"lstsq"`` every node depends on the edges of all loops it is in, the edges
+            with no weight in the solution of the requested nodes are left out. Their weights are computed from the
+            factorized system for a few nodes at a time, so no dense pseudo-inverse of the system is built.
+
+            :param solver: ``"dfs"`` or ``"lstsq"``, see :class:`Renderer`.
+            :param points: **(Optional)** Names of the points. Defaults to none.
+            :param layers: **(Optional)** Layers of the entities. Defaults to none.
+
+            :return: A dictionary with the ``"placements"`` to compute, the ``"edges"`` to evaluate and the names of
+                the MTEXT ``"variables"`` they use, and the ``"items"``, ``"lines"``, ``"line_edges"`` and
+                ``"polylines"`` to place. All but the names and the polylines are index arrays.
+        """
+
+        points, layers = frozenset(points), frozenset(layers)
+        key = (solver, points, layers)
+
+        cached = self.partial_plans.get(key)
+
+        if cached is not None:
+            with suppress(KeyError):
+                self.partial_plans.move_to_end(key)
+
+            return cached
+
+        plan = self.plan(solver)
+        unknown = points - {item["name"] for item in self.items if item["type"] == "POINT"}
+
+        if unknown:
+            raise ValueError(f"Unknown points: {', '.join(sorted(unknown))}.")
+
+        selected = [index for index in plan["items"][:, 0].tolist() if
+                    (self.items[index]["type"] == "POINT" and self.items[index]["name"] in points) or
+                    (self.items[index]["type"] != "POINT" and self.items[index]["layer"] in layers)]
+        items = plan["items"][np.isin(plan["items"][:, 0], selected)]
+
+        line_edges = np.concatenate([plan["line_edges"], plan["open_edges"]])
+        selected = np.isin(self.strings[self.edge_layer[line_edges]], list(layers))
+        lines, line_edges = np.concatenate([plan["lines"], plan["open_lines"]])[selected], line_edges[selected]
+
+        polylines = [i for i, polyline in enumerate(self.polylines) if polyline["layer"] in layers]
+
+        wanted = set(items[:, 1].tolist()) | set(lines.ravel().tolist())
+        wanted |= {plan["node_placement"][node] for i in polylines for node in self.polylines[i]["nodes"].tolist()}
+
+        partial: dict[str, Any] = {"items": items, "lines": lines, "line_edges": line_edges, "polylines": polylines}
+
+        if solver == "lstsq":
+            rows = sorted(wanted)
+            weighted = np.zeros(len(plan["steps"]), dtype=bool)
+
+            for chunk in range(0, len(rows), self.WEIGHT_CHUNK):
+                weights = plan["least_squares"].rows(rows[chunk:chunk + self.WEIGHT_CHUNK])[:, :-1]
+                weighted |= np.abs(weights).max(axis=0, initial=0) > 1e-12
+
+            columns = np.flatnonzero(weighted)
+            partial |= {"placements": np.array(rows, dtype=int), "columns": columns, "steps": plan["steps"][columns]}
+            edges = np.unique(partial["steps"])
+        else:
+            parents = plan["parents"].tolist()
+            needed = set()
+
+            for placement in wanted:
+                while placement not in needed and placement != -1:
+                    needed.add(placement)
+                    placement = parents[placement]
+
+            partial["placements"] = np.array(sorted(needed), dtype=int)
+            edges = np.unique(plan["steps"][partial["placements"][partial["placements"] > 0] - 1])
+
+        partial["edges"] = edges
+
+        expressions = [str(expression) for expression in self.strings[self.edge_expression[edges]]]
+
+        for index, _ in items:
+            if self.items[index]["type"] != "POINT":
+                expressions += f'{self.items[index]["expression"]}@{self.items[index].get("repeat") or ""}'.split("@")
+
+        names = {name for name, _ in self.mtext_variables}
+        used = set()
+
+        for expression in filter(lambda x: x.strip() not in ("", "?"), expressions):
+            used |= set(parse(expression.strip()).variables())
+
+        partial["variables"] = names & used
+        self.partial_plans[key] = partial
+
+        with suppress(KeyError):
+            while len(self.partial_plans) > self.MAX_PARTIAL_PLANS:
+                self.partial_plans.popitem(last=False)
+
+        return partial
+
+    def split(self, parts: int) -> list[tuple[int, int]]:
+        """
+            Splits the ``"dfs"`` traversal plan into subtrees that can be traversed independently, see the
+            ``executor`` of :class:`Renderer`. Splits are built on first use.
+
+            Every placement of the plan is reached from its parent along one edge, so a subtree of placements
+            depends only on the position of the node it hangs off. When none of the nodes of the subtree is placed
+            outside of it as well, that node is an articulation point of the graph and the subtree can be traversed
+            on its own once the node is placed. The largest such subtrees holding at most ``1 / parts`` of all
+            placements are chosen, the rest of the plan stays with the root.
+
+            :param parts: Number of parts the plan is roughly split into.
+
+            :return: A list of ``(first, end)`` ranges of the placements of the subtrees, in the order of the
+                traversal. A subtree starts with the placement ``first`` and ends before the placement ``end``.
+        """
+
+        if parts in self.splits:
+            return self.splits[parts]
+
+        plan = self.plan("dfs")
+        nodes, parents = plan["nodes"].tolist(), plan["parents"].tolist()
+        size = math.ceil(len(nodes) / max(parts, 1))
+
+        ends = list(range(1, len(nodes) + 1))
+        counts: Dict[int, int] = {}
+
+        for placement in range(len(nodes) - 1, 0, -1):
+            ends[parents[placement]] = max(ends[parents[placement]], ends[placement])
+
+        for node in nodes:
+            counts[node] = counts.get(node, 0) + 1
+
+        subtrees = []
+        placement = 1
+
+        while placement < len(nodes):
+            end = ends[placement]
+
+            if end - placement <= size and sum(counts[n] for n in set(nodes[placement:end])) == end - placement:
+                subtrees.append((placement, end))
+                placement = end
+            else:
+                placement += 1
+
+        self.splits[parts] = subtrees
+
+        return subtrees
+
+    def _resolve_variables(self, variables: dict[str, Value]) -> dict[str, Value]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Adds the custom MTEXT variables. Like in :meth:`Renderer.render` they are all evaluated against the
+            given variables only and override them.
+        """
+
+        return variables | {name: evaluate(expression, variables) for name, expression in self.mtext_variables}
+
+    @staticmethod
+    def batch_size(values: dict[str, Value]) -> int:
+        """
+            Returns the number of variants described by the variables.
+
+            :param values: Variables, scalars or 1-D arrays of the same length.
+        """
+
+        sizes = {np.size(v) for v in values.values() if np.ndim(v)}
+
+        if len(sizes) > 1:
+            raise ValueError(f"Variable columns differ in length: {sorted(sizes)}.")
+
+        return sizes.pop() if sizes else 1
+
+    def _evaluate_edges(self, values: dict[str, Value], size: int,
+                        edges: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evaluates the lengths of all edges, edges marked with '?' get ``nan``.
+
+            :param edges: **(Optional)** Indices of the only edges to evaluate, the others get ``nan`` as well.
+                Defaults to ``None``, which evaluates all edges.
+
+            :return: A ``(E, B)`` array of edge lengths.
+        """
+
+        lengths = np.full((len(self.edge_constants), size), np.nan)
+
+        if edges is None:
+            lengths[self.constant_edges] = self.edge_constants[self.constant_edges, None]
+            expression_edges = self.expression_edges
+        else:
+            constant = edges[self.constant_edges[edges]]
+            lengths[constant] = self.edge_constants[constant, None]
+            expression_edges = edges[~self.constant_edges[edges] & ~self.unknown_edges[edges]]
+
+        for i in expression_edges.tolist():
+            values["c"] = float(self.edge_constants[i])
+            lengths[i] = evaluate(str(self.strings[self.edge_expression[i]]), values)
+
+        return lengths
+
+    def _place(self, plan: dict[str, Any], lengths: np.ndarray, size: int) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Computes the positions of all placements of the plan.
+
+            :return: A ``(P, B, 2)`` array of positions.
+        """
+
+        root = self.nodes[self.root]
+        steps = plan["directions"][:, None, :] * lengths[plan["steps"]][:, :, None]
+
+        if plan["solver"] == "lstsq":
+            target = np.concatenate([steps, np.broadcast_to(root, (1, size, 2))])
+            return plan["least_squares"].solve(target)
+
+        positions = np.empty((len(plan["parents"]), size, 2))
+        positions[0] = root
+
+        for placement in range(1, len(plan["parents"])):
+            positions[placement] = positions[plan["parents"][placement]] + steps[placement - 1]
+
+        return positions
+
+    def _insert_scales(self, item: dict[str, Any], values: dict[str, Value],
+                       size: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evaluates the ``w@h`` expression of an INSERT into its scale factors.
+        """
+
+        scales = []
+
+        for expression, original in zip(map(lambda x: x.strip(), item["expression"].split("@")), item["size"]):
+            values["c"] = original
+            scales.append(None if expression == "?" else np.broadcast_to(
+                np.asarray(evaluate(expression, values), dtype=float) / original, (size,)))
+
+        xscale, yscale = scales
+        return (xscale if xscale is not None else yscale), (yscale if yscale is not None else xscale)
+
+    def _place_items(self, items: np.ndarray, positions: np.ndarray, values: dict[str, Value],
+                     size: int) -> tuple[list, list, list, list, dict[str, np.ndarray], dict[str, list[str]]]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evaluates the circles, arcs, inserts and points of the plan at their placements.
+
+            :param items: ``(K, 2)`` array of the indices of the items and their placements.
+
+            :return: Lists of ``(B, 3)`` circles, ``(B, 5)`` arcs, ``(B, 4)`` inserts and ``(B, 6)`` repeats, the
+                named points and the layers of the entities by type.
+        """
+
+        circles, arcs, inserts, repeats, points = [], [], [], [], {}
+        layers: dict[str, list[str]] = {"circles": [], "arcs": [], "inserts": []}
+
+        for index, placement in items.tolist():
+            item = self.items[index]
+            position = positions[placement]
+
+            if item["type"] == "POINT":
+                points[item["name"]] = position
+                continue
+
+            values["c"] = item["c"]
+
+            if item["type"] == "INSERT":
+                xscale, yscale = self._insert_scales(item, values, size)
+                inserts.append(np.column_stack([position, xscale, yscale]))
+                repeats.append(self._insert_repeat(item, values, size))
+            else:
+                radius = np.broadcast_to(np.asarray(evaluate(item["expression"], values), dtype=float), (size,))
+
+                if item["type"] == "CIRCLE":
+                    circles.append(np.column_stack([position, radius]))
+                else:
+                    arcs.append(np.column_stack([position, radius, np.full(size, item["start_angle"]),
+                                                 np.full(size, item["end_angle"])]))
+
+            layers[item["type"].lower() + "s"].append(item["layer"])
+
+        return circles, arcs, inserts, repeats, points, layers
+
+    def _place_polylines(self, plan: dict[str, Any], polylines: Iterable[int], positions: np.ndarray,
+                         size: int) -> list[np.ndarray]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Moves the vertices of the polylines to the placements of their nodes.
+
+            :return: A list of ``(B, N, 3)`` arrays of vertices and bulges.
+        """
+
+        return [np.concatenate([positions[plan["node_placement"][self.polylines[i]["nodes"]]].swapaxes(0, 1),
+                                np.broadcast_to(self.polylines[i]["bulges"][None, :, None],
+                                                (size, len(self.polylines[i]["nodes"]), 1))], axis=2)
+                for i in polylines]
+
+    @staticmethod
+    def _insert_repeat(item: dict[str, Any], values: dict[str, Value], size: int) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Evaluates the ``repeat`` XDATA of an INSERT, see :func:`parse_repeat`. An INSERT without it is a single
+            copy.
+
+            :return: A ``(B, 6)`` array of column and row counts and column and row shifts.
+        """
+
+        if item["repeat"] is None:
+            return np.tile([1.0, 1.0, 0.0, 0.0, 0.0, 0.0], (size, 1))
+
+        return np.column_stack([np.broadcast_to(np.asarray(field, dtype=float), (size,)) for field in
+                                parse_repeat(item["repeat"], lambda x: evaluate(x, values))])
+
+    def _extents(self, plan: dict[str, Any], lines: np.ndarray, circles: list[np.ndarray], arcs: list[np.ndarray],
+                 inserts: list[np.ndarray], repeats: list[np.ndarray], polylines: list[np.ndarray],
+                 size: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Computes the bounding box of the rendered entities.
+
+            :return: Lower and upper ``(B, 2)`` corners of the bounding box.
+        """
+
+        corners = [lines.reshape(-1, size, 2)]
+
+        for circle in circles:
+            radius = np.abs(circle[:, 2:3])
+            corners += [circle[None, :, :2] - radius, circle[None, :, :2] + radius]
+
+        kinds = [(i, self.items[i]["type"]) for i in plan["items"][:, 0].tolist()]
+
+        for arc, index in zip(arcs, [i for i, kind in kinds if kind == "ARC"]):
+            item = self.items[index]
+            start = item["start_angle"] % 360
+            sweep = (item["end_angle"] - start) % 360 or 360
+            angles = [start, start + sweep] + [a for a in range(0, 720, 90) if 0 < a - start < sweep]
+            directions = np.radians(np.array(angles, dtype=float))
+            directions = np.column_stack([np.cos(directions), np.sin(directions)])
+            corners.append(arc[None, :, :2] + directions[:, None, :] * arc[None, :, 2:3])
+
+        for insert, repeat, index in zip(inserts, repeats, [i for i, kind in kinds if kind == "INSERT"]):
+            extents = self.items[index]["extents"]
+
+            if extents is not None:
+                empty = np.where((repeat[:, 0] > 0) & (repeat[:, 1] > 0), 0, np.nan)[:, None]
+
+                for column, row in ((0, 0), (1, 0), (0, 1), (1, 1)):
+                    shift = (column * np.maximum(repeat[:, 0:1] - 1, 0) * repeat[:, 2:4] +
+                             row * np.maximum(repeat[:, 1:2] - 1, 0) * repeat[:, 4:6] + empty)
+
+                    for x, y in ((0, 1), (2, 1), (0, 3), (2, 3)):
+                        corners.append((insert[:, :2] + shift + insert[:, 2:] * (extents[x], extents[y]))[None])
+
+        for polyline, data in zip(polylines, self.polylines):
+            corners.append(polyline[:, :, :2].swapaxes(0, 1))
+
+            for a, b in polyline_segments(polyline[0], data["closed"]):
+                if data["bulges"][a]:
+                    corners.append(self._bulge_extents(polyline[:, a, :2], polyline[:, b, :2], data["bulges"][a]))
+
+        corners = np.concatenate(corners)
+
+        if not len(corners):
+            raise ValueError("The drawing has no entities to render.")
+
+        return np.nanmin(corners, axis=0), np.nanmax(corners, axis=0)
+
+    @staticmethod
+    def _bulge_extents(start: np.ndarray, end: np.ndarray, bulge: float) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Returns the points of a bulged segment that touch its bounding box, ``nan`` where a candidate point
+            is not on the arc.
+
+            :param start: ``(B, 2)`` array of start points.
+            :param end: ``(B, 2)`` array of end points.
+            :param bulge: Bulge of the segment, tangent of a quarter of the signed sweep angle.
+        """
+
+        sweep = 4 * math.atan(bulge)
+        chord = end - start
+        center = (start + end) / 2 + np.column_stack([-chord[:, 1], chord[:, 0]]) / (2 * math.tan(sweep / 2))
+        radius = np.linalg.norm(start - center, axis=1)[:, None]
+
+        first = start if sweep > 0 else end
+        angle = np.arctan2(first[:, 1] - center[:, 1], first[:, 0] - center[:, 0])
+
+        candidates = []
+
+        for cardinal in np.arange(4) * math.pi / 2:
+            inside = np.mod(cardinal - angle, 2 * math.pi) < abs(sweep)
+            point = center + radius * (math.cos(cardinal), math.sin(cardinal))
+            candidates.append(np.where(inside[:, None], point, np.nan))
+
+        return np.stack(candidates)
+
+    @staticmethod
+    def _stack(entities: list[np.ndarray], size: int, width: int, lower: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Stacks per entity ``(B, width)`` arrays into one ``(B, N, width)`` array moved by the lower corner, if
+            it is given.
+        """
+
+        if not entities:
+            return np.empty((size, 0, width))
+
+        stacked = np.stack(entities, axis=1)
+
+        if lower is not None:
+            stacked[:, :, :2] -= lower[:, None, :]
+
+        return stacked
@@ -0,0 +1,309 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Optional, Iterable, Any
+
+from qsketchmetric.dxfio import write_dxf
+from qsketchmetric.pool import DocumentPool
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.renderer import Renderer
+
+STATES = ("pending", "claimed", "done", "failed")
+
+
+class WorkQueue:
+    """
+    :param directory: Directory of the queue, usually on a filesystem shared by all nodes.
+    :param timeout: **(Optional)** Number of seconds after which a claimed shard without a heartbeat is
+        considered abandoned and given to another worker. Defaults to 300.
+
+    The :class:`WorkQueue` class distributes rendering jobs over processes and machines through a directory.
+    A job is a dictionary with the ``"template"`` path, the ``"variables"`` and the ``"output"`` path of the
+    rendered DXF, optionally the output ``"fmt"`` (``"asc"`` or ``"bin"``). Jobs are grouped into shards, one JSON
+    file per shard, that move between the ``pending``, ``claimed``, ``done`` and ``failed`` subdirectories.
+
+    Every move is a single :func:`os.rename`, which is atomic, so exactly one worker wins a shard. Workers touch
+    their claimed shard regularly as a heartbeat. Shards whose heartbeat stops, because the worker or its node
+    died, are moved back to ``pending`` by the next worker looking for work. Outputs are written to a temporary
+    file first and renamed, and jobs whose output already exists are skipped, so a reclaimed shard only renders
+    what is missing.
+
+    .. warning::
+        Atomic renames and modification times must work across nodes. This holds for local filesystems and NFS,
+        but the clocks of the nodes should be synchronized and the timeout much longer than the heartbeat
+        interval.
+    """
+
+    def __init__(self, directory: Path, timeout: float = 300):
+        """
+            Instantiate a new :class:`WorkQueue` object.
+        """
+
+        self.directory = Path(directory)
+        self.timeout = timeout
+
+        for state in STATES:
+            (self.directory / state).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, jobs: Iterable[dict[str, Any]], shard_size: int = 100) -> list[str]:
+        """
+            Add jobs to the queue.
+
+            :param jobs: Jobs to render.
+            :param shard_size: **(Optional)** Number of jobs in one shard. Defaults to 100.
+
+            :return: Names of the created shards.
+        """
+
+        jobs = list(jobs)
+        names = []
+
+        for start in range(0, len(jobs), shard_size):
+            name = f"{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+            self._write(self.directory / "pending" / f"{name}.json", {"jobs": jobs[start:start + shard_size]})
+            names.append(name)
+
+        return names
+
+    def claim(self, worker: str) -> Optional[tuple[str, list[dict[str, Any]]]]:
+        """
+            Claim a pending shard. Abandoned shards are reclaimed first.
+
+            :param worker: Name of the worker, it only appears in the claimed file name.
+
+            :return: The name and the jobs of the claimed shard, ``None`` if there is no pending shard.
+        """
+
+        self.reclaim()
+
+        for path in sorted((self.directory / "pending").glob("*.json")):
+            claimed = self.directory / "claimed" / f"{path.stem}@{worker}.json"
+
+            try:
+                os.utime(path)
+                os.rename(path, claimed)
+                return path.stem, json.loads(claimed.read_text())["jobs"]
+            except FileNotFoundError:
+                continue
+
+        return None
+
+    def heartbeat(self, name: str, worker: str) -> bool:
+        """
+            Tell the queue that the worker is still working on the shard.
+
+            :return: ``False`` if the shard was taken away from the worker.
+        """
+
+        try:
+            os.utime(self._claimed(name, worker))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, name: str, worker: str, errors: Optional[dict[int, str]] = None) -> bool:
+        """
+            Move a claimed shard to ``done``, or to ``failed`` if some of its jobs failed.
+
+            :param errors: **(Optional)** Error messages of the failed jobs, keyed by their index in the shard.
+
+            :return: ``False`` if the shard was taken away from the worker in the meantime.
+        """
+
+        completed = self.directory / ("failed" if errors else "done") / f"{name}.json"
+
+        try:
+            os.rename(self._claimed(name, worker), completed)
+        except FileNotFoundError:
+            return False
+
+        shard = json.loads(completed.read_text())
+        shard["errors"] = {str(i): e for i, e in (errors or {}).items()}
+        self._write(completed, shard)
+
+        return True
+
+    def reclaim(self) -> int:
+        """
+            Move claimed shards without a recent heartbeat back to ``pending``.
+
+            :return: Number of reclaimed shards.
+        """
+
+        reclaimed = 0
+        deadline = time.time() - self.timeout
+
+        for path in (self.directory / "claimed").glob("*.json"):
+            try:
+                if path.stat().st_mtime < deadline:
+                    os.rename(path, self.directory / "pending" / f"{path.stem.split('@')[0]}.json")
+                    reclaimed += 1
+            except FileNotFoundError:
+                continue
+
+        return reclaimed
+
+    def retry_failed(self) -> int:
+        """
+            Move failed shards back to ``pending``. Only their failed jobs are rendered again.
+
+            :return: Number of shards to retry.
+        """
+
+        retried = 0
+
+        for path in (self.directory / "failed").glob("*.json"):
+            try:
+                os.rename(path, self.directory / "pending" / path.name)
+                retried += 1
+            except FileNotFoundError:
+                continue
+
+        return retried
+
+    def status(self) -> dict[str, int]:
+        """
+            Count the shards in every state.
+        """
+
+        return {state: len(list((self.directory / state).glob("*.json"))) for state in STATES}
+
+    def _claimed(self, name: str, worker: str) -> Path:
+        """
+            .. note:: This method is private and not intended for external use.
+        """
+
+        return self.directory / "claimed" / f"{name}@{worker}.json"
+
+    @staticmethod
+    def _write(path: Path, data: dict):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Writes a JSON file atomically, through a temporary file in the same directory.
+        """
+
+        temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        temporary.write_text(json.dumps(data))
+        os.replace(temporary, path)
+
+
+class QueueWorker:
+    """
+    :param queue: The queue to take the shards from.
+    :param name: **(Optional)** Name of the worker, unique across all nodes. Defaults to the host name and the
+        process id.
+    :param heartbeat_interval: **(Optional)** Number of seconds between two heartbeats. Defaults to 30.
+    :param registry: **(Optional)** A :class:`TemplateRegistry` shared by the jobs. Defaults to a new registry.
+    :param renderer_options: **(Optional)** Keyword arguments passed to every :class:`Renderer`, like
+        ``accuracy`` or ``solver``. Defaults to ``None``.
+
+    The :class:`QueueWorker` class renders the shards of a :class:`WorkQueue` until the queue is empty.
+    Start one worker per process, on as many nodes as needed. The output drawings are taken from a
+    :class:`DocumentPool`, so the jobs of one template reuse the prepared drawing.
+    """
+
+    def __init__(self, queue: WorkQueue, name: Optional[str] = None, heartbeat_interval: float = 30,
+                 registry: Optional[TemplateRegistry] = None, renderer_options: Optional[dict[str, Any]] = None):
+        """
+            Instantiate a new :class:`QueueWorker` object.
+        """
+
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.registry = registry if registry is not None else TemplateRegistry()
+        self.renderer_options = renderer_options or {}
+        self.documents = DocumentPool(self.registry)
+
+        self.rendered: int = 0
+        self.skipped: int = 0
+        self.failed: int = 0
+
+    def run(self, max_shards: Optional[int] = None) -> int:
+        """
+            Render shards until the queue has no pending shard left.
+
+            :param max_shards: **(Optional)** Stop after this number of shards. Defaults to ``None``.
+
+            :return: Number of processed shards.
+        """
+
+        processed = 0
+
+        while max_shards is None or processed < max_shards:
+            claim = self.queue.claim(self.name)
+
+            if claim is None:
+                break
+
+            self.process(*claim)
+            processed += 1
+
+        return processed
+
+    def process(self, name: str, jobs: list[dict[str, Any]]) -> bool:
+        """
+            Render the jobs of a claimed shard while sending heartbeats.
+
+            :return: ``False`` if the shard was taken away from the worker before it finished.
+        """
+
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_interval):
+                if not self.queue.heartbeat(name, self.name):
+                    lost.set()
+                    return
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        errors = {}
+
+        try:
+            for index, job in enumerate(jobs):
+                if lost.is_set():
+                    break
+
+                try:
+                    self._render(job)
+                except Exception:
+                    self.failed += 1
+                    errors[index] = traceback.format_exc()
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        return not lost.is_set() and self.queue.complete(name, self.name, errors)
+
+    def _render(self, job: dict[str, Any]):
+        """
+            .. note:: This method is private and not intended for external use.
+
+            Renders one job, unless its output already exists. The output is written under a temporary name and
+            renamed, so an interrupted job never leaves a truncated file behind.
+        """
+
+        output = Path(job["output"])
+
+        if output.exists():
+            self.skipped += 1
+            return
+
+        with self.documents.document(job["template"]) as output_dxf:
+            Renderer(job["template"], output_dxf, variables=job.get("variables"), registry=self.registry,
+                     **self.renderer_options).render()
+
+            output.parent.mkdir(parents=True, exist_ok=True)
+            temporary = output.with_name(f".{output.name}.{self.name}.tmp")
+            write_dxf(output_dxf, temporary, job.get("fmt", "asc"))
+            os.replace(temporary, output)
+
+        self.rendered += 1
@@ -0,0 +1,62 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from qsketchmetric.batch import BatchRenderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestBatchRenderer(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the test case with a small batch of variables.
+        """
+
+        self.variables = {"w": np.linspace(200, 400, 7), "l": np.linspace(300, 500, 7), "h": 50}
+
+    def test_render_in_chunks(self):
+        """
+            Test that rendering in chunks gives the same results as rendering in one pass.
+        """
+
+        whole = BatchRenderer(EXAMPLES / "wrapper.dxf", self.variables)
+        chunked = BatchRenderer(EXAMPLES / "wrapper.dxf", self.variables, chunk_size=3)
+
+        whole_points = whole.render()
+        chunked_points = chunked.render()
+
+        self.assertEqual(whole_points.keys(), chunked_points.keys())
+        np.testing.assert_allclose(whole.extents, chunked.extents)
+
+        for point in whole_points:
+            np.testing.assert_allclose(whole_points[point], chunked_points[point])
+
+        widths, heights = whole.get_bb_dimensions()
+        self.assertEqual(widths.shape, (7,))
+        self.assertTrue(np.all(np.diff(widths) > 0))
+
+    def test_memory_mapped_output(self):
+        """
+            Test that the results are written to the memory-mapped .npy file.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "sweep.npy"
+
+            renderer = BatchRenderer(EXAMPLES / "wrapper.dxf", self.variables, output_npy_path=path, chunk_size=4)
+            points = renderer.render()
+
+            stored = np.load(path, mmap_mode="r")
+
+            self.assertEqual(stored.shape, (7,))
+            np.testing.assert_allclose(stored["extents"], renderer.extents)
+            np.testing.assert_allclose(stored["points"]["package_tr"], points["package_tr"])
+            del stored, points, renderer
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import ezdxf
+
+from qsketchmetric.dxfio import read_dxf, write_dxf, dxf_to_bytes, BINARY_SENTINEL
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestDxfIO(unittest.TestCase):
+
+    def setUp(self):
+        self.doc = ezdxf.readfile(EXAMPLES / "box_side.dxf")
+        self.handles = sorted(e.dxf.handle for e in self.doc.modelspace())
+
+    def assertSameDrawing(self, doc):
+        self.assertEqual(sorted(e.dxf.handle for e in doc.modelspace()), self.handles)
+
+    def test_bytes_round_trip(self):
+        """
+            Test that ASCII and binary DXF bytes are read back into the same drawing.
+        """
+
+        ascii_data = dxf_to_bytes(self.doc)
+        binary_data = dxf_to_bytes(self.doc, fmt="bin")
+
+        self.assertFalse(ascii_data.startswith(BINARY_SENTINEL))
+        self.assertTrue(binary_data.startswith(BINARY_SENTINEL))
+        self.assertLess(len(binary_data), len(ascii_data))
+
+        self.assertSameDrawing(read_dxf(ascii_data))
+        self.assertSameDrawing(read_dxf(binary_data))
+
+    def test_streams(self):
+        """
+            Test writing to and reading from binary streams.
+        """
+
+        for fmt in ["asc", "bin"]:
+            stream = io.BytesIO()
+            write_dxf(self.doc, stream, fmt)
+            self.assertFalse(stream.closed)
+
+            stream.seek(0)
+            self.assertSameDrawing(read_dxf(stream))
+
+    def test_files(self):
+        """
+            Test that binary DXF files are written and detected when read back.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "box_side.dxf"
+            write_dxf(self.doc, path, fmt="bin")
+
+            self.assertTrue(path.read_bytes().startswith(BINARY_SENTINEL))
+            self.assertSameDrawing(read_dxf(path))
+            self.assertSameDrawing(read_dxf(str(path)))
+
+    def test_unknown_format(self):
+        """
+            Test that an unknown output format is rejected.
+        """
+
+        with self.assertRaises(ValueError):
+            dxf_to_bytes(self.doc, fmt="dwg")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import io
+import unittest
+from collections import Counter
+from pathlib import Path
+
+import ezdxf
+import numpy as np
+from ezdxf import bbox
+from ezdxf.lldxf.const import DXFInvalidLineType
+
+from qsketchmetric.emit import BulkEmitter
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestBulkEmitter(unittest.TestCase):
+
+    def test_entities(self):
+        """
+            Test that the emitted entities form a valid drawing with the given attributes.
+        """
+
+        doc = ezdxf.new()
+        doc.blocks.new(name="PART").add_circle((0, 0), 1)
+        emitter = BulkEmitter(doc.modelspace())
+
+        lines = emitter.add_lines(np.array([[[0, 0], [10, 0]], [[10, 0], [10, 5]]]), {"layer": "CUTTING"})
+        emitter.add_circles(np.array([[5, 5, 2]]), {"layer": "CUTTING"})
+        emitter.add_arcs(np.array([[0, 5, 3, 0, 90]]), {})
+        emitter.add_blockrefs("PART", np.array([[1, 1], [2, 2]]), {"xscale": 2.0})
+        BulkEmitter.translate(lines, 1, 1)
+
+        self.assertFalse(doc.audit().has_errors)
+
+        stream = io.StringIO()
+        doc.write(stream)
+        msp = ezdxf.read(io.StringIO(stream.getvalue())).modelspace()
+
+        self.assertEqual(Counter(e.dxftype() for e in msp), {"LINE": 2, "CIRCLE": 1, "ARC": 1, "INSERT": 2})
+        self.assertEqual(tuple(msp.query("LINE")[1].dxf.end), (11, 6, 0))
+        self.assertEqual(msp.query("INSERT")[0].dxf.xscale, 2)
+        self.assertEqual(msp.query("ARC")[0].dxf.end_angle, 90)
+        self.assertEqual({e.dxf.layer for e in msp.query("LINE CIRCLE")}, {"CUTTING"})
+
+    def test_invalid_linetype(self):
+        """
+            Test that an unknown linetype is rejected.
+        """
+
+        emitter = BulkEmitter(ezdxf.new().modelspace())
+
+        with self.assertRaises(DXFInvalidLineType):
+            emitter.add_lines(np.zeros((1, 2, 2)), {"linetype": "UNKNOWN"})
+
+    def test_bulk_rendering(self):
+        """
+            Test that rendering with bulk emission produces the same entities as the default.
+        """
+
+        holes = ezdxf.new()
+        holes.appids.new("QCAD")
+        holes.blocks.new("HOLE").add_circle((0, 0), 1)
+        msp = holes.modelspace()
+        msp.add_mtext("----- custom -----")
+        msp.add_line((0, 0), (20, 0)).set_xdata("QCAD", [(1000, "c:c")])
+        msp.add_blockref("HOLE", (20, 0)).set_xdata("QCAD", [(1000, "c:c@c"), (1000, "repeat:n@3@4@5")])
+        msp.add_blockref("HOLE", (0, 0)).set_xdata("QCAD", [(1000, "c:c@c"), (1000, "repeat:n@0@5")])
+
+        for path, variables in [(EXAMPLES / "box_side.dxf", {"width": 1000, "height": 500}),
+                                (EXAMPLES / "wrapper.dxf", {"w": 300, "l": 400, "h": 50}),
+                                (holes, {"n": 4})]:
+            for merge_polylines in [False, True]:
+                with self.subTest(path=str(path), merge_polylines=merge_polylines):
+                    rendered = []
+
+                    for bulk_emission in [False, True]:
+                        output_dxf = ezdxf.new()
+                        renderer = Renderer(path, output_dxf, variables=variables, offset=(10, 20),
+                                            merge_polylines=merge_polylines, bulk_emission=bulk_emission)
+                        renderer.render()
+
+                        msp = output_dxf.modelspace()
+                        extents = bbox.extents(msp)
+                        rendered.append((Counter(e.dxftype() for e in msp), extents.extmin, extents.extmax,
+                                         renderer.points))
+
+                    self.assertEqual(rendered[0], rendered[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+from py_expression_eval import Parser  # type: ignore
+
+from qsketchmetric.expression import VectorParser, evaluate, parse
+
+
+class TestExpression(unittest.TestCase):
+
+    def test_scalar_matches_parser(self):
+        """
+            Test that scalar evaluation gives the same results as the original parser.
+        """
+
+        for expression in ["2*c + 1", "sqrt(w^2 + h^2)", "max(w, h) - min(w, h)", "cos(PI) * w", "w % 7 / 2"]:
+            variables = {"c": 3.0, "w": 12.0, "h": 5.0}
+            self.assertAlmostEqual(evaluate(expression, variables), Parser().parse(expression).evaluate(variables))
+
+    def test_columns(self):
+        """
+            Test that array variables are evaluated element-wise and mixed with scalars.
+        """
+
+        w = np.array([1.0, 2.0, 3.0])
+        result = evaluate("max(w, 2) * c + sqrt(w)", {"w": w, "c": 10})
+
+        np.testing.assert_allclose(result, np.maximum(w, 2) * 10 + np.sqrt(w))
+
+    def test_conditional(self):
+        """
+            Test that the if function selects element-wise.
+        """
+
+        w = np.array([1.0, 5.0])
+        np.testing.assert_allclose(evaluate("if(w > 2, w, 0)", {"w": w}), [0, 5])
+
+    def test_parse_cache(self):
+        """
+            Test that an expression is parsed only once.
+        """
+
+        self.assertIs(parse("a + b"), parse("a + b"))
+        self.assertIsInstance(VectorParser(), Parser)
+
+        for i in range(parse.cache_info().maxsize + 1):
+            parse(f"a + {i}")
+
+        self.assertEqual(parse.cache_info().currsize, parse.cache_info().maxsize)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import ezdxf
+from ezdxf import bbox
+
+from qsketchmetric.instancing import InstanceCache
+from qsketchmetric.limits import Limits
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestInstanceCache(unittest.TestCase):
+
+    def test_identical_copies_share_a_block(self):
+        """
+            Test that placements with the same variables share one block.
+        """
+
+        output_dxf = ezdxf.new()
+        cache = InstanceCache(output_dxf)
+
+        for i in range(3):
+            cache.place(EXAMPLES / "wrapper.dxf", {"w": 100, "l": 200, "h": 50}, offset=(1000 * i, 0))
+
+        cache.place(EXAMPLES / "wrapper.dxf", {"w": 120, "l": 200, "h": 50}, offset=(0, 1000))
+
+        inserts = output_dxf.modelspace().query("INSERT")
+
+        self.assertEqual(len(output_dxf.modelspace()), 4)
+        self.assertEqual(len({insert.dxf.name for insert in inserts}), 2)
+        self.assertEqual((cache.renders, cache.hits), (2, 2))
+        self.assertEqual(cache.registry.loads, 1)
+
+    def test_copy_matches_direct_rendering(self):
+        """
+            Test that a placed copy matches rendering the template directly at the offset.
+        """
+
+        variables = {"width": 100, "height": 50}
+
+        direct_dxf = ezdxf.new()
+        direct_points = Renderer(EXAMPLES / "box_side.dxf", direct_dxf, variables=variables,
+                                 offset=(300, 200)).render()
+
+        output_dxf = ezdxf.new()
+        cache = InstanceCache(output_dxf)
+        cache.place(EXAMPLES / "box_side.dxf", variables, offset=(0, 0))
+        points = cache.place(EXAMPLES / "box_side.dxf", variables, offset=(300, 200))
+
+        self.assertEqual(points, direct_points)
+
+        direct = bbox.extents(direct_dxf.modelspace())
+        placed = bbox.extents(output_dxf.modelspace().query("INSERT")[1:])
+
+        for a, b in zip(direct.rect_vertices(), placed.rect_vertices()):
+            self.assertAlmostEqual(a.x, b.x, places=6)
+            self.assertAlmostEqual(a.y, b.y, places=6)
+
+        block = output_dxf.blocks.get(output_dxf.modelspace()[0].dxf.name)
+        self.assertEqual(len(block), len(direct_dxf.modelspace()))
+
+    def test_runtime_options_are_not_in_the_key(self):
+        """
+            Test that options only changing how the rendering runs give the same block names.
+        """
+
+        names = []
+
+        for accuracy in [3, 3, 2]:
+            cache = InstanceCache(ezdxf.new(), renderer_options={"accuracy": accuracy, "limits": Limits(timeout=60)})
+            names.append(cache.block(EXAMPLES / "box_side.dxf", {"width": 100, "height": 50})[0])
+
+        self.assertEqual(names[0], names[1])
+        self.assertNotEqual(names[0], names[2])
+
+
+class TestSubTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        shutil.copy(EXAMPLES / "box_side.dxf", self.path / "child.dxf")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_template(self, name: str, sub_templates: list[tuple[tuple[float, float], list[str]]]):
+        doc = ezdxf.readfile(EXAMPLES / "box_side.dxf")
+        doc.blocks.new(name="PLACEHOLDER").add_line((0, 0), (10, 10))
+
+        for position, xdata in sub_templates:
+            insert = doc.modelspace().add_blockref("PLACEHOLDER", position, dxfattribs={"layer": "CUTTING"})
+            insert.set_xdata("QCAD", [(1000, x) for x in xdata])
+
+        doc.saveas(self.path / name)
+
+    def test_sub_templates_are_rendered_once(self):
+        """
+            Test that identical sub-templates of a template are rendered into one block.
+        """
+
+        xdata = ["template:child.dxf", "bind:width=width/2@height=height/2"]
+        self.write_template("parent.dxf", [((0, 0), xdata), ((1400, 900), xdata)])
+
+        output_dxf = ezdxf.new()
+        renderer = Renderer(self.path / "parent.dxf", output_dxf, variables={"width": 1000, "height": 500},
+                            solver="lstsq")
+        renderer.render()
+
+        inserts = output_dxf.modelspace().query("INSERT")
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(inserts[0].dxf.name, inserts[1].dxf.name)
+        self.assertEqual((renderer._instances.renders, renderer._instances.hits), (1, 1))
+
+        child_dxf = ezdxf.new()
+        Renderer(self.path / "child.dxf", child_dxf, variables={"width": 500, "height": 250}, solver="lstsq").render()
+        block = output_dxf.blocks.get(inserts[0].dxf.name)
+
+        self.assertEqual(len(block), len(child_dxf.modelspace()))
+
+        child, sub = bbox.extents(child_dxf.modelspace()), bbox.extents(block)
+        self.assertAlmostEqual(child.size.x, sub.size.x, places=6)
+        self.assertAlmostEqual(child.size.y, sub.size.y, places=6)
+        self.assertAlmostEqual(renderer.get_bb_dimensions()[0], 1000 + child.size.x, places=6)
+
+    def test_cyclic_sub_templates(self):
+        """
+            Test that templates including themselves are rejected.
+        """
+
+        variables = {"width": 1000, "height": 500}
+        bind = "bind:width=width@height=height"
+
+        self.write_template("a.dxf", [((0, 0), ["template:b.dxf", bind])])
+        self.write_template("b.dxf", [((0, 0), ["template:a.dxf", bind])])
+
+        with self.assertRaisesRegex(ValueError, "Cyclic"):
+            Renderer(self.path / "a.dxf", ezdxf.new(), variables=variables).render()
+
+        self.write_template("c.dxf", [((0, 0), ["template:c.dxf", bind])])
+
+        with self.assertRaisesRegex(ValueError, "Cyclic"):
+            Renderer(self.path / "c.dxf", ezdxf.new(), variables=variables).render()
+
+    def test_path_with_colon(self):
+        """
+            Test that a sub-template path containing a colon is read whole.
+        """
+
+        (self.path / "C:").mkdir()
+        shutil.copy(EXAMPLES / "box_side.dxf", self.path / "C:" / "door.dxf")
+        self.write_template("parent.dxf", [((0, 0), ["template:C:/door.dxf", "bind:width=width@height=height"])])
+
+        output_dxf = ezdxf.new()
+        Renderer(self.path / "parent.dxf", output_dxf, variables={"width": 1000, "height": 500},
+                 solver="lstsq").render()
+
+        self.assertEqual([i.dxf.name.split("_")[0] for i in output_dxf.modelspace().query("INSERT")], ["door"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from pathlib import Path
+
+import ezdxf
+
+from qsketchmetric.inverse import InverseSolver, width, height, point, fits
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestInverseSolver(unittest.TestCase):
+
+    def test_solve_extent(self):
+        """
+            Test that the solved variable renders the requested width.
+        """
+
+        solver = InverseSolver(EXAMPLES / "wrapper.dxf", {"l": 400, "h": 50})
+        w = solver.solve("w", width, 612.5, 10, 2000)
+
+        renderer = Renderer(EXAMPLES / "wrapper.dxf", ezdxf.new(), variables={"w": w, "l": 400, "h": 50})
+        renderer.render()
+
+        self.assertAlmostEqual(renderer.get_bb_dimensions()[0], 612.5, places=4)
+        self.assertLess(solver.evaluations, 1000)
+
+        with self.assertRaises(ValueError):
+            solver.solve("w", width, 10000, 10, 2000)
+
+    def test_solve_point(self):
+        """
+            Test that the solved variable moves the point to the requested coordinate.
+        """
+
+        solver = InverseSolver(EXAMPLES / "wrapper.dxf", {"w": 300, "l": 400}, registry=TemplateRegistry())
+        h = solver.solve("h", point("package_h", 1), 500, 0, 1000)
+
+        points = solver.template.evaluate({"w": 300, "l": 400, "h": h})["points"]
+        self.assertAlmostEqual(points["package_h"][0, 1], 500, places=3)
+
+    def test_maximize(self):
+        """
+            Test that the maximized drawing fits and a slightly larger one does not.
+        """
+
+        for name in ["dfs", "lstsq"]:
+            with self.subTest(solver=name):
+                solver = InverseSolver(EXAMPLES / "wrapper.dxf", {"h": 50}, solver=name)
+                proportional = {"w": lambda t: t, "l": lambda t: 2 * t}
+                t = solver.maximize(proportional, fits(600, 1000), 10, 2000, tolerance=1e-4)
+
+                inside = solver.template.evaluate({"w": t, "l": 2 * t, "h": 50}, solver=name)
+                outside = solver.template.evaluate({"w": t + 1e-3, "l": 2 * t + 2e-3, "h": 50}, solver=name)
+
+                self.assertTrue(fits(600, 1000)(inside)[0])
+                self.assertFalse(fits(600, 1000)(outside)[0])
+                self.assertAlmostEqual(height(inside)[0], 1000, places=2)
+
+        with self.assertRaises(ValueError):
+            solver.maximize(proportional, fits(1, 1), 10, 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
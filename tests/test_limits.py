@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import ezdxf
+
+from qsketchmetric.limits import Limits, LimitExceeded, Cancelled, CancelToken
+from qsketchmetric.renderer import Renderer
+from qsketchmetric.semiautomatic import SemiAutomaticParameterization
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+VARIABLES = {"width": 1000, "height": 500}
+
+
+class TestLimits(unittest.TestCase):
+
+    def test_entities(self):
+        limits = Limits(max_entities=3)
+
+        with limits.running():
+            limits.add_entities(2)
+
+            with limits.running():
+                limits.add_entities()
+
+            with self.assertRaises(LimitExceeded):
+                limits.add_entities()
+
+        with limits.running():
+            self.assertEqual(limits.entities, 0)
+
+    def test_timeout(self):
+        limits = Limits(timeout=0.01)
+
+        with limits.running():
+            limits.check()
+            time.sleep(0.02)
+
+            with self.assertRaisesRegex(LimitExceeded, "timeout"):
+                limits.check()
+
+    def test_cancel_from_another_thread(self):
+        token = CancelToken()
+        limits = Limits(token=token)
+
+        with limits.running():
+            thread = threading.Thread(target=token.cancel)
+            thread.start()
+            thread.join()
+
+            with self.assertRaises(Cancelled):
+                limits.check()
+
+        self.assertTrue(token.cancelled)
+
+    def test_renderer(self):
+        output_dxf = ezdxf.new()
+        limits = Limits(max_entities=1000, max_nodes=1000, timeout=60)
+        Renderer(EXAMPLES / "box_side.dxf", output_dxf, variables=VARIABLES, limits=limits).render()
+
+        self.assertEqual(limits.entities, len(output_dxf.modelspace()))
+
+        for limits in [Limits(max_entities=5), Limits(max_nodes=3)]:
+            with self.assertRaises(LimitExceeded):
+                Renderer(EXAMPLES / "box_side.dxf", ezdxf.new(), variables=VARIABLES, limits=limits).render()
+
+        token = CancelToken()
+        token.cancel()
+
+        with self.assertRaises(Cancelled):
+            Renderer(EXAMPLES / "box_side.dxf", ezdxf.new(), variables=VARIABLES,
+                     limits=Limits(token=token)).render()
+
+    def test_nodes_of_last_entity(self):
+        template = ezdxf.new()
+        template.appids.new("QCAD")
+        template.modelspace().add_mtext("----- custom -----")
+        template.modelspace().add_line((0, 0), (10, 0)).set_xdata("QCAD", [(1000, "c:c")])
+
+        with self.assertRaises(LimitExceeded):
+            Renderer(template, ezdxf.new(), limits=Limits(max_nodes=1)).render()
+
+        Renderer(template, ezdxf.new(), limits=Limits(max_nodes=2)).render()
+
+    def test_semiautomatic(self):
+        def drawing():
+            doc = ezdxf.new()
+
+            for i in range(10):
+                doc.modelspace().add_line((i * 20, 0), (i * 20 + 10, 0))
+
+            return doc
+
+        with self.assertRaises(LimitExceeded):
+            SemiAutomaticParameterization(drawing(), limits=Limits(max_entities=3)).parametrize()
+
+        with self.assertRaises(LimitExceeded):
+            SemiAutomaticParameterization(drawing(), limits=Limits(max_nodes=5)).parametrize()
+
+        limits = Limits(max_entities=100, max_nodes=100)
+        SemiAutomaticParameterization(drawing(), limits=limits).parametrize()
+        self.assertEqual(limits.entities, 9)
+
+    def test_semiautomatic_nodes_of_last_entity(self):
+        """
+            Test that the parametrization checks the nodes added by the last entity of the drawing.
+        """
+
+        drawing = ezdxf.new()
+        drawing.modelspace().add_line((0, 0), (10, 0))
+
+        with self.assertRaises(LimitExceeded):
+            SemiAutomaticParameterization(drawing, limits=Limits(max_nodes=1)).parametrize()
+
+        drawing = ezdxf.new()
+        drawing.modelspace().add_line((0, 0), (10, 0))
+        SemiAutomaticParameterization(drawing, limits=Limits(max_nodes=2)).parametrize()
+
+
+if __name__ == "__main__":
+    unittest.main()
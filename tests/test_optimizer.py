@@ -0,0 +1,162 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import ezdxf
+from ezdxf import bbox
+
+from qsketchmetric.optimizer import TemplateOptimizer
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+VARIABLES = {"width": 1000, "height": 500}
+
+
+def virtual_line(doc, start, end, expression="c"):
+    line = doc.modelspace().add_line(start, end, dxfattribs={"layer": "VIRTUAL_LAYER"})
+    line.set_xdata("QCAD", [(1000, f"c:{expression}")])
+
+    return line
+
+
+def box_side(duplicate: bool = False, zero_length: bool = False):
+    """
+        box_side.dxf with a chain of two virtual lines above it, ending in a circle.
+    """
+
+    doc = ezdxf.readfile(EXAMPLES / "box_side.dxf")
+    doc.query("MTEXT")[0].text += r"\Pk: 2*10\Pm: -10/2"
+
+    virtual_line(doc, (700, 900), (700, 950))
+    virtual_line(doc, (700, 950), (700, 1000))
+    circle = doc.modelspace().add_circle((700, 1000), 10, dxfattribs={"layer": "CUTTING"})
+    circle.set_xdata("QCAD", [(1000, "c:k/2+m+c-5")])
+    circle = doc.modelspace().add_circle((700, 900), 10, dxfattribs={"layer": "CUTTING"})
+    circle.set_xdata("QCAD", [(1000, "c:c")])
+
+    if duplicate:
+        virtual_line(doc, (700, 950), (700, 900))
+
+    if zero_length:
+        virtual_line(doc, (700, 1000), (700, 1000), "k")
+
+    return doc
+
+
+def render(doc, solver="dfs"):
+    output_dxf = ezdxf.new()
+    points = Renderer(doc, output_dxf, variables=VARIABLES, solver=solver).render()
+
+    return points, len(output_dxf.modelspace()), bbox.extents(output_dxf.modelspace())
+
+
+class TestTemplateOptimizer(unittest.TestCase):
+
+    def assertSameRendering(self, expected, actual):
+        self.assertEqual(expected[0].keys(), actual[0].keys())
+
+        for name in expected[0]:
+            self.assertAlmostEqual(expected[0][name][0], actual[0][name][0], places=9)
+            self.assertAlmostEqual(expected[0][name][1], actual[0][name][1], places=9)
+
+        self.assertEqual(expected[1], actual[1])
+
+        for a, b in zip(expected[2].rect_vertices(), actual[2].rect_vertices()):
+            self.assertAlmostEqual(a.x, b.x, places=9)
+            self.assertAlmostEqual(a.y, b.y, places=9)
+
+    def test_examples(self):
+        for name, variables in [("box_side.dxf", VARIABLES), ("wrapper.dxf", {"w": 100, "l": 200, "h": 50})]:
+            for solver in ["dfs", "lstsq"]:
+                with self.subTest(name=name, solver=solver):
+                    expected_dxf, output_dxf = ezdxf.new(), ezdxf.new()
+                    doc = TemplateOptimizer(EXAMPLES / name, solver=solver).optimize()
+
+                    expected = Renderer(EXAMPLES / name, expected_dxf, variables=variables, solver=solver).render()
+                    points = Renderer(doc, output_dxf, variables=variables, solver=solver).render()
+
+                    self.assertEqual(points, expected)
+                    self.assertEqual(len(output_dxf.modelspace()), len(expected_dxf.modelspace()))
+
+    def test_constant_folding(self):
+        optimizer = TemplateOptimizer(box_side())
+        expected = render(box_side())
+        doc = optimizer.optimize()
+
+        circle = doc.modelspace().query("CIRCLE")[0]
+
+        self.assertEqual(circle.get_xdata("QCAD")[0][1], "c:20.0/2+(-5.0)+c-5")
+        self.assertTrue(doc.query("MTEXT")[0].text.endswith(r"div_height: height/5\Pk: 20.0\Pm: -5.0"))
+        self.assertEqual((optimizer.stats["constants"], optimizer.stats["expressions"]), (2, 1))
+        self.assertSameRendering(expected, render(doc))
+
+    def test_chains(self):
+        optimizer = TemplateOptimizer(box_side())
+        expected = render(box_side())
+        doc = optimizer.optimize()
+
+        self.assertEqual(optimizer.stats["chains"], 1)
+        self.assertEqual(len(doc.modelspace()), len(box_side().modelspace()) - 1)
+        self.assertSameRendering(expected, render(doc))
+
+        optimizer = TemplateOptimizer(box_side(), solver="lstsq")
+        optimizer.optimize()
+        self.assertEqual(optimizer.stats["chains"], 0)
+
+        doc = box_side()
+        virtual_line(doc, (700, 1000), (700, 1050))
+        virtual_line(doc, (700, 1050), (700, 1100))
+        doc.modelspace().add_circle((700, 1100), 5, dxfattribs={"layer": "CUTTING"}).set_xdata("QCAD", [(1000, "c:c")])
+        expected = render(doc)
+        optimizer = TemplateOptimizer(doc)
+
+        self.assertSameRendering(expected, render(optimizer.optimize()))
+        self.assertEqual(optimizer.stats["chains"], 2)
+
+    def test_duplicated_lines(self):
+        optimizer = TemplateOptimizer(box_side(duplicate=True))
+        optimized = render(optimizer.optimize())
+
+        self.assertEqual(optimizer.stats["duplicates"], 0)
+        self.assertSameRendering(render(box_side(duplicate=True)), optimized)
+
+        optimizer = TemplateOptimizer(box_side(duplicate=True), remove_duplicates=True)
+        optimized = render(optimizer.optimize())
+
+        self.assertEqual(optimizer.stats["duplicates"], 1)
+        self.assertEqual(render(box_side(duplicate=True))[1], optimized[1] + 1)
+        self.assertSameRendering(render(box_side()), optimized)
+
+    def test_zero_length_lines(self):
+        with self.assertRaises(ZeroDivisionError):
+            render(box_side(zero_length=True))
+
+        for solver in ["dfs", "lstsq"]:
+            with self.subTest(solver=solver):
+                optimizer = TemplateOptimizer(box_side(zero_length=True), solver=solver)
+                optimized = render(optimizer.optimize(), solver)
+
+                self.assertEqual(optimizer.stats["zero_length"], 1)
+                self.assertSameRendering(render(box_side(), solver), optimized)
+
+        doc = box_side()
+        virtual_line(doc, (700, 1000), (700, 1000), "?")
+        optimizer = TemplateOptimizer(doc)
+
+        lines = optimizer.optimize().modelspace().query("LINE[layer=='VIRTUAL_LAYER']")
+        self.assertTrue(any(line.dxf.start == line.dxf.end for line in lines))
+        self.assertEqual(optimizer.stats["zero_length"], 0)
+
+    def test_output_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "optimized.dxf"
+            TemplateOptimizer(box_side(), path, output_format="bin").optimize()
+
+            self.assertSameRendering(render(box_side()), render(ezdxf.readfile(path)))
+
+        with self.assertRaises(ValueError):
+            TemplateOptimizer(box_side(), solver="newton")
+
+
+if __name__ == "__main__":
+    unittest.main()
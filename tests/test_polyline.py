@@ -0,0 +1,99 @@
+import unittest
+from pathlib import Path
+
+import ezdxf
+from ezdxf import bbox
+from ezdxf.math import Vec3
+
+from qsketchmetric.polyline import merge_into_lwpolylines
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestMergeIntoLwpolylines(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the test case with an empty drawing.
+        """
+
+        self.dxf = ezdxf.new()
+        self.msp = self.dxf.modelspace()
+
+    def test_closed_chain(self):
+        """
+            Test that a closed loop of lines becomes one closed LWPOLYLINE.
+        """
+
+        corners = [(0, 0), (4, 0), (4, 3), (0, 3)]
+        entities = [self.msp.add_line(corners[i], corners[(i + 1) % 4]) for i in (2, 0, 3, 1)]
+
+        merged = merge_into_lwpolylines(self.msp, entities)
+
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0].dxftype(), "LWPOLYLINE")
+        self.assertTrue(merged[0].closed)
+        self.assertEqual(len(merged[0]), 4)
+        self.assertEqual(len(self.msp), 1)
+
+    def test_arc_becomes_bulge(self):
+        """
+            Test that an arc in a chain becomes a bulged segment with the same geometry.
+        """
+
+        line = self.msp.add_line((-5, 0), (0, 0))
+        arc = self.msp.add_arc((5, 0), 5, 90, 180)
+        other = self.msp.add_line((5, 5), (9, 5))
+
+        merged = merge_into_lwpolylines(self.msp, [line, arc, other])
+
+        self.assertEqual(len(merged), 1)
+        self.assertFalse(merged[0].closed)
+
+        arcs = [e for e in merged[0].virtual_entities() if e.dxftype() == "ARC"]
+        self.assertEqual(len(arcs), 1)
+        self.assertTrue(arcs[0].dxf.center.isclose(Vec3(5, 0)))
+        self.assertAlmostEqual(arcs[0].dxf.radius, 5)
+
+    def test_groups_are_kept_apart(self):
+        """
+            Test that lines on other layers, branches and lone segments are not merged together.
+        """
+
+        entities = [
+            self.msp.add_line((0, 0), (1, 0)),
+            self.msp.add_line((1, 0), (2, 0), dxfattribs={"layer": "OTHER"}),
+            self.msp.add_circle((0, 0), 1),
+        ]
+
+        merged = merge_into_lwpolylines(self.msp, entities)
+
+        self.assertEqual(sorted(e.dxftype() for e in merged), ["CIRCLE", "LINE", "LINE"])
+
+    def test_renderer_output(self):
+        """
+            Test that a rendered drawing keeps its extents when its lines are merged.
+        """
+
+        extents = []
+        counts = []
+
+        for merge in [False, True]:
+            output_dxf = ezdxf.new()
+            renderer = Renderer(EXAMPLES / "box_side.dxf", output_dxf, variables={"width": 300, "height": 200},
+                                merge_polylines=merge)
+            renderer.render()
+
+            box = bbox.extents(output_dxf.modelspace())
+            extents.append((box.extmin, box.extmax))
+            counts.append(len(output_dxf.modelspace()))
+
+            self.assertEqual(len(renderer.new_entities), len(output_dxf.modelspace()))
+
+        self.assertEqual(extents[0], extents[1])
+        self.assertLess(counts[1], counts[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
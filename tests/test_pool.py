@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import ezdxf
+from ezdxf import bbox
+
+from qsketchmetric.pool import DocumentPool
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+VARIABLES = {"width": 1000, "height": 500}
+PATTERN = 'A,0.5,-0.2,["GAS",STANDARD,S=.1,U=0.0,X=-0.1,Y=-.05],-.25'
+
+
+class TestDocumentPool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "template.dxf"
+
+        doc = ezdxf.readfile(EXAMPLES / "box_side.dxf")
+        doc.blocks.new(name="PART").add_circle((5, 5), 5)
+        insert = doc.modelspace().add_blockref("PART", (0, 0), dxfattribs={"layer": "CUTTING"})
+        insert.set_xdata("QCAD", [(1000, "c:c*2@?"), (1000, f"line:{PATTERN}")])
+        doc.saveas(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def render(self, output_dxf):
+        Renderer(self.path, output_dxf, variables=VARIABLES).render()
+
+        return output_dxf
+
+    def test_reused_document_matches_new_document(self):
+        pool = DocumentPool()
+        expected = self.render(ezdxf.new())
+
+        for _ in range(3):
+            with pool.document(self.path) as output_dxf:
+                self.render(output_dxf)
+
+                self.assertEqual(len(output_dxf.modelspace()), len(expected.modelspace()))
+                self.assertEqual(bbox.extents(output_dxf.modelspace()).size, bbox.extents(expected.modelspace()).size)
+                self.assertEqual({layer.dxf.name for layer in output_dxf.layers},
+                                 {layer.dxf.name for layer in expected.layers})
+                self.assertIn(Renderer.linetype_name(PATTERN), output_dxf.linetypes)
+                self.assertEqual(len(output_dxf.blocks), len(expected.blocks) + 1)
+
+        self.assertEqual((pool.created, pool.reused), (1, 2))
+        self.assertEqual(len(output_dxf.modelspace()), 0)
+        self.assertIn("PART", output_dxf.blocks)
+
+    def test_changed_template_gets_new_document(self):
+        registry = TemplateRegistry()
+        pool = DocumentPool(registry)
+
+        with pool.document(self.path) as first:
+            self.render(first)
+
+        shutil.copy(EXAMPLES / "box_side.dxf", self.path)
+        registry.invalidate(self.path)
+
+        with pool.document(self.path) as second:
+            self.render(second)
+
+        self.assertIsNot(first, second)
+        self.assertNotIn("PART", second.blocks)
+        self.assertEqual(pool.created, 2)
+
+    def test_failed_rendering_discards_document(self):
+        pool = DocumentPool()
+
+        with self.assertRaises(ZeroDivisionError):
+            with pool.document(self.path) as first:
+                1 / 0
+
+        with pool.document(self.path) as second:
+            pass
+
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.reused, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import tempfile
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+
+import ezdxf
+
+from qsketchmetric.profiling import MemoryProfiler, CostProfiler
+from qsketchmetric.renderer import Renderer
+from qsketchmetric.semiautomatic import SemiAutomaticParameterization
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestMemoryProfiler(unittest.TestCase):
+
+    def test_phase(self):
+        profiler = MemoryProfiler()
+
+        with profiler.phase("allocate"):
+            kept = [bytearray(1024) for _ in range(256)]
+            temporary = bytearray(1024 * 1024)
+            del temporary
+
+        with profiler.phase("release"):
+            del kept
+
+        profiler.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+
+        allocate, release = profiler.phases["allocate"], profiler.phases["release"]
+
+        self.assertGreater(allocate["peak"], 1024 * 1024)
+        self.assertGreater(allocate["net"], 256 * 1024)
+        self.assertLess(allocate["net"], allocate["peak"])
+        self.assertLess(release["net"], -256 * 1024)
+        self.assertIn(__file__, allocate["top"][0][0])
+
+        self.assertIn("allocate", profiler.report())
+
+    def test_running_tracing_is_kept(self):
+        tracemalloc.start()
+
+        try:
+            profiler = MemoryProfiler(top=0)
+
+            with profiler.phase("phase"):
+                pass
+
+            profiler.stop()
+
+            self.assertTrue(tracemalloc.is_tracing())
+            self.assertEqual(profiler.phases["phase"]["top"], [])
+        finally:
+            tracemalloc.stop()
+
+    def test_render_and_parametrize(self):
+        profiler = MemoryProfiler(top=0)
+
+        Renderer(EXAMPLES / "wrapper.dxf", ezdxf.new(), variables={"w": 100, "l": 200, "h": 50},
+                 memory_profiler=profiler).render()
+
+        self.assertEqual(list(profiler.phases), ["variables", "prepare_graph", "solve", "construct",
+                                                 "center_drawing"])
+
+        profiler = MemoryProfiler(top=0)
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_dxf = ezdxf.new()
+            input_dxf.modelspace().add_line((0, 0), (4, 0))
+            input_dxf.modelspace().add_line((4, 1), (4, 3))
+            input_dxf.saveas(Path(directory) / "input.dxf")
+
+            SemiAutomaticParameterization(Path(directory) / "input.dxf", output_dxf_path=Path(directory) / "out.dxf",
+                                          memory_profiler=profiler).parametrize()
+
+        profiler.stop()
+
+        self.assertEqual(list(profiler.phases), ["set_appid_and_graph", "find_and_union", "draw_virtual_lines",
+                                                 "center_drawing", "draw_variables", "save"])
+        self.assertTrue(all(record["peak"] >= 0 for record in profiler.phases.values()))
+
+
+class TestCostProfiler(unittest.TestCase):
+
+    def test_nested_measures(self):
+        profiler = CostProfiler()
+
+        with profiler.measure("A", "prepare"):
+            time.sleep(0.01)
+
+            with profiler.measure("A", "evaluate", "w/2"):
+                time.sleep(0.02)
+
+            with profiler.measure("B", "import"):
+                time.sleep(0.01)
+
+        a, b = profiler.entities["A"], profiler.entities["B"]
+
+        self.assertGreaterEqual(a["time"]["evaluate"], 0.02)
+        self.assertLess(a["time"]["prepare"], 0.02)
+        self.assertGreaterEqual(b["time"]["import"], 0.01)
+        self.assertEqual(profiler.expressions["w/2"]["calls"], 1)
+        self.assertEqual(profiler.hot_spots(1)[0][0], "A")
+
+        stacks = profiler.to_collapsed().splitlines()
+        self.assertTrue(any(line.startswith("render;ENTITY A;evaluate;w/2 ") for line in stacks))
+        self.assertTrue(all(int(line.rsplit(" ", 1)[1]) > 0 for line in stacks))
+
+    def test_render(self):
+        profiler = CostProfiler()
+        output_dxf = ezdxf.new()
+
+        input_dxf = ezdxf.readfile(EXAMPLES / "box_side.dxf")
+        input_dxf.blocks.new(name="PART").add_circle((0, 0), 5)
+        input_dxf.modelspace().add_blockref("PART", (0, 0), dxfattribs={"layer": "CUTTING"}).set_xdata(
+            "QCAD", [(1000, "c:c*2@?")])
+
+        Renderer(input_dxf, output_dxf, variables={"width": 1000, "height": 500}, cost_profiler=profiler).render()
+
+        self.assertEqual(sum(record["output"] for record in profiler.entities.values()),
+                         len(output_dxf.modelspace()))
+
+        inserts = [r for r in profiler.entities.values() if r["type"] == "INSERT"]
+        self.assertTrue(inserts)
+        self.assertTrue(all("import" in r["time"] and "extents" in r["time"] for r in inserts))
+        self.assertTrue(any(r["visits"] for r in profiler.entities.values() if r["type"] == "LINE"))
+        self.assertIn("MTEXT", [r["type"] for r in profiler.entities.values()])
+
+        with tempfile.TemporaryDirectory() as directory:
+            profiler.to_json(Path(directory) / "costs.json")
+            document = json.loads((Path(directory) / "costs.json").read_text())
+
+        self.assertEqual(set(document), {"entities", "expressions"})
+        self.assertIn("c", document["expressions"])
+
+
+if __name__ == '__main__':
+    unittest.main()
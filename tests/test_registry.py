@@ -0,0 +1,194 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import ezdxf
+
+from qsketchmetric.registry import TemplateRegistry
+from qsketchmetric.renderer import Renderer
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestTemplateRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "box_side.dxf"
+        shutil.copy(EXAMPLES / "box_side.dxf", self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def touch(self, path: Path):
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_hits_and_loads(self):
+        """
+            Test that a template is loaded once and then served from the cache.
+        """
+
+        registry = TemplateRegistry()
+
+        doc = registry.get(self.path)
+        self.assertIs(registry.get(self.path), doc)
+        self.assertIs(registry.get(str(self.path)), doc)
+
+        self.assertEqual((registry.loads, registry.hits), (1, 2))
+        self.assertIn(self.path, registry)
+
+    def test_touched_file_is_not_reloaded(self):
+        """
+            Test that a file with a new modification time but the same content is kept.
+        """
+
+        registry = TemplateRegistry()
+        doc = registry.get(self.path)
+
+        self.touch(self.path)
+
+        self.assertIs(registry.get(self.path), doc)
+        self.assertEqual((registry.loads, registry.invalidations), (1, 0))
+
+        registry = TemplateRegistry(check_hash=False)
+        doc = registry.get(self.path)
+
+        self.touch(self.path)
+
+        self.assertIsNot(registry.get(self.path), doc)
+        self.assertEqual((registry.loads, registry.invalidations), (2, 1))
+
+    def test_file_is_read_outside_the_lock(self):
+        """
+            Test that a changed file is read and hashed once, without holding the lock of the registry.
+        """
+
+        registry = TemplateRegistry()
+        registry.get(self.path)
+
+        doc = ezdxf.readfile(self.path)
+        doc.modelspace().add_line((0, 0), (1, 1))
+        doc.saveas(self.path)
+
+        hash_ = TemplateRegistry._hash
+
+        def checked(data: bytes) -> bytes:
+            self.assertFalse(registry._lock.locked())
+            return hash_(data)
+
+        for change in [lambda: None, lambda: self.touch(self.path)]:
+            change()
+
+            with patch.object(Path, "read_bytes", autospec=True, side_effect=Path.read_bytes) as read, \
+                    patch.object(registry, "_hash", side_effect=checked):
+                registry.get(self.path)
+
+            self.assertEqual(read.call_count, 1)
+
+        self.assertEqual((registry.loads, registry.invalidations, registry.hits), (2, 1, 1))
+
+    def test_changed_file_is_reloaded(self):
+        """
+            Test that a file with a new content is loaded again.
+        """
+
+        registry = TemplateRegistry()
+        registry.get(self.path)
+
+        doc = ezdxf.readfile(self.path)
+        doc.modelspace().add_line((0, 0), (1, 1))
+        doc.saveas(self.path)
+        self.touch(self.path)
+
+        self.assertEqual(len(registry.get(self.path).modelspace()), len(doc.modelspace()))
+        self.assertEqual((registry.loads, registry.invalidations), (2, 1))
+
+    def test_lru_eviction(self):
+        """
+            Test that the least recently used template is evicted when the budget is exceeded.
+        """
+
+        paths = []
+
+        for name in ["a", "b", "c"]:
+            paths.append(Path(self.directory.name) / f"{name}.dxf")
+            shutil.copy(self.path, paths[-1])
+
+        registry = TemplateRegistry(max_file_bytes=2 * self.path.stat().st_size)
+
+        registry.get(paths[0])
+        registry.get(paths[1])
+        registry.get(paths[0])
+        registry.get(paths[2])
+
+        self.assertEqual(registry.evictions, 1)
+        self.assertIn(paths[0], registry)
+        self.assertNotIn(paths[1], registry)
+        self.assertIn(paths[2], registry)
+        self.assertEqual(registry.size, 2 * self.path.stat().st_size)
+
+        registry.invalidate()
+        self.assertEqual((len(registry), registry.size), (0, 0))
+
+    def test_repeated_rendering(self):
+        """
+            Test that rendering from the registry leaves the template untouched, blocks included.
+        """
+
+        doc = ezdxf.readfile(self.path)
+        block = doc.blocks.new("BLOCK")
+        block.add_line((0, 0), (2, 1))
+        doc.modelspace().add_blockref("BLOCK", (0, 0)).set_xdata("QCAD", [(1000, "c:2*c@?")])
+        doc.saveas(self.path)
+
+        registry = TemplateRegistry()
+        outputs = []
+
+        for _ in range(2):
+            output = ezdxf.new()
+            renderer = Renderer(self.path, output, variables={"width": 100, "height": 50}, registry=registry)
+            renderer.render()
+            outputs.append((renderer.get_bb_dimensions(), len(output.modelspace().query("INSERT"))))
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertTrue(outputs[0][1])
+        self.assertEqual(registry.loads, 1)
+        self.assertEqual(registry.get(self.path).modelspace().query("INSERT")[0].dxf.name, "BLOCK")
+        self.assertEqual([e.dxf.linetype for e in registry.get(self.path).blocks.get("BLOCK")], ["BYLAYER"])
+
+    def test_concurrent_rendering(self):
+        """
+            Stress test rendering one shared template from many threads, every result must match the serial one.
+        """
+
+        doc = ezdxf.readfile(self.path)
+        block = doc.blocks.new("BLOCK")
+        block.add_line((0, 0), (2, 1))
+        doc.modelspace().add_blockref("BLOCK", (0, 0)).set_xdata("QCAD", [(1000, "c:2*c@?")])
+        doc.saveas(self.path)
+
+        registry = TemplateRegistry()
+        variables = [{"width": 50 + i, "height": 20 + i % 7} for i in range(48)]
+
+        def render(v):
+            output = ezdxf.new()
+            renderer = Renderer(self.path, output, variables=v, registry=registry)
+            renderer.render()
+
+            return renderer.get_bb_dimensions(), sorted(e.dxftype() for e in output.modelspace())
+
+        expected = [render(v) for v in variables]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(executor.map(render, variables)), expected)
+
+        self.assertEqual(registry.loads, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
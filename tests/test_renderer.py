@@ -1,12 +1,23 @@
+import io
 import re
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 from unittest.mock import Mock, patch, ANY, MagicMock
 
+import ezdxf
+import ezdxf.bbox
 import ezdxf.entities
 from ezdxf.math import Vec3
 
+from qsketchmetric.dxfio import BINARY_SENTINEL, dxf_to_bytes, read_dxf
+from qsketchmetric.limits import Limits, LimitExceeded
+from qsketchmetric.registry import TemplateRegistry
 from qsketchmetric.renderer import Renderer
+from qsketchmetric.semiautomatic import SemiAutomaticParameterization
 
 
 class TestRenderer(unittest.TestCase):
@@ -157,6 +168,7 @@ class TestRenderer(unittest.TestCase):
 
         self.mock_input_dxf.modelspace().entity_space.entities = self.mock_entities
         self.mock_output_dxf.blocks.__contains__ = Mock(side_effect=["mock"])
+        self.mock_output_dxf.linetypes.__contains__ = Mock(return_value=False)
         self.mock_output_dxf.blocks.new = Mock()
 
         mock_readfile.return_value = self.mock_input_dxf
@@ -280,6 +292,157 @@ class TestRenderer(unittest.TestCase):
         self.assertTrue(renderer.visited_graph[self.point2] == [('line_layer', self.point3)])
         self.assertTrue(renderer.visited_graph[self.point3] == [('line_layer', self.point2)])
 
+    @patch('ezdxf.readfile')
+    def test_solve(self, mock_readfile):
+        """
+            Test the least squares solver to ensure it places the nodes like the DFS traversal does on a graph
+            without loops and adds the same entities.
+        """
+
+        mock_readfile.return_value = self.mock_input_dxf
+
+        renderer = Renderer(
+            input_parametric_path=Path('/path/to/input.dxf'),
+            output_rendered_object=self.mock_output_dxf,
+            solver="lstsq"
+        )
+
+        renderer.graph = self.graph
+
+        renderer.visited_graph = {
+            self.point1: [("VIRTUAL_LAYER", self.point2), ("line_layer", self.point3)],
+            self.point2: [("VIRTUAL_LAYER", self.point1), ("line_layer", self.point3)],
+            self.point3: [("line_layer", self.point1), ("line_layer", self.point2)],
+        }
+
+        renderer.new_points = {
+            self.point1: self.new_point1,
+        }
+
+        renderer.offset_x = self.offset_x
+        renderer.offset_y = self.offset_y
+
+        renderer._solve(self.point1)
+
+        self.mock_output_dxf.modelspace().add_line.assert_called_once_with(
+            ANY, ANY, dxfattribs={'layer': 'line_layer', 'linetype': 'line_linetype'})
+        start, end = self.mock_output_dxf.modelspace().add_line.call_args[0]
+        self.assertTrue(self.new_point1_off.isclose(Vec3(start)))
+        self.assertTrue(self.new_point3_off.isclose(Vec3(end)))
+
+        self.mock_output_dxf.modelspace().add_circle.assert_called_with(
+            ANY, self.circle_radius, dxfattribs={'layer': 'circle_layer', 'linetype': 'circle_linetype'})
+        self.assertTrue(self.new_point2_off.isclose(
+            Vec3(self.mock_output_dxf.modelspace().add_circle.call_args[0][0])))
+
+        self.assertEqual(len(renderer.new_entities), 4)
+
+        for node, position in self.new_points.items():
+            self.assertTrue(position.isclose(Vec3(renderer.new_points[node])))
+
+        self.assertTrue(Vec3(renderer.points["mock"]).isclose(self.new_point3))
+        self.assertTrue(all(r < 1e-9 for r in renderer.closure_residuals.values()))
+        self.assertEqual(len(renderer.closure_residuals), 2)
+
+        self.assertTrue(renderer.visited_graph[self.point1] == [])
+        self.assertTrue(renderer.visited_graph[self.point2] == [('line_layer', self.point3)])
+        self.assertTrue(renderer.visited_graph[self.point3] == [('line_layer', self.point2)])
+
+    @patch('ezdxf.readfile')
+    def test_solve_over_constrained_loop(self, mock_readfile):
+        """
+            Test the least squares solver on a closed loop whose lengths cannot all be met. The result must not
+            depend on the order of the entities and the closure residuals must expose the conflict.
+        """
+
+        corners = [(0, 0), (10, 0), (10, 10), (0, 10)]
+        lengths = ["20", "20", "20", "10"]
+        results = []
+
+        for order in (range(4), reversed(range(4))):
+            input_dxf = ezdxf.new()
+            input_dxf.appids.new("QCAD")
+            input_msp = input_dxf.modelspace()
+            input_msp.add_mtext("----- custom -----")
+
+            for i in order:
+                line = input_msp.add_line(corners[i], corners[(i + 1) % 4])
+                line.set_xdata("QCAD", [(1000, f"c:{lengths[i]}")])
+
+            mock_readfile.return_value = input_dxf
+
+            renderer = Renderer(
+                input_parametric_path=Path('/path/to/input.dxf'),
+                output_rendered_object=ezdxf.new(),
+                solver="lstsq"
+            )
+            renderer.render()
+
+            self.assertEqual(len(renderer.closure_residuals), 4)
+            self.assertTrue(max(renderer.closure_residuals.values()) > 1)
+            results.append(sorted((round(e.dxf.start.x, 6), round(e.dxf.start.y, 6), round(e.dxf.end.x, 6),
+                                   round(e.dxf.end.y, 6)) for e in renderer.new_entities))
+
+        self.assertEqual(results[0], results[1])
+
+    @patch('ezdxf.readfile')
+    def test_polylines(self, mock_readfile):
+        """
+            Test that a polyline of the template is rendered as one LWPOLYLINE with every segment scaled by its own
+            expression and the bulges kept.
+        """
+
+        input_dxf = ezdxf.new()
+        input_dxf.appids.new("QCAD")
+        input_msp = input_dxf.modelspace()
+        input_msp.add_mtext("----- custom -----")
+
+        polyline = input_msp.add_lwpolyline([(0, 0, 0), (4, 0, 0.5), (4, 3, 0), (0, 3, 0)], format="xyb",
+                                            close=True)
+        polyline.set_xdata("QCAD", [(1000, "c:c"), (1000, "c0:2*c"), (1000, "c3:?")])
+
+        line = input_msp.add_line((0, 3), (0, 5))
+        line.set_xdata("QCAD", [(1000, "c:c")])
+
+        mock_readfile.return_value = input_dxf
+
+        for solver in ["dfs", "lstsq"]:
+            output_dxf = ezdxf.new()
+            renderer = Renderer(
+                input_parametric_path=Path('/path/to/input.dxf'),
+                output_rendered_object=output_dxf,
+                solver=solver
+            )
+            renderer.render()
+
+            polylines = output_dxf.modelspace().query("LWPOLYLINE")
+            lines = output_dxf.modelspace().query("LINE")
+
+            self.assertEqual(len(polylines), 1)
+            self.assertEqual(len(lines), 1)
+            self.assertTrue(polylines[0].closed)
+
+            expected = [(0, 0, 0), (8, 0, 0.5), (8, 3, 0), (4, 3, 0)]
+
+            for vertex, point in zip(polylines[0].get_points("xyb"), expected):
+                self.assertTrue(Vec3(vertex).isclose(Vec3(point)))
+
+            self.assertTrue(lines[0].dxf.start.isclose(Vec3(4, 3)))
+            self.assertTrue(lines[0].dxf.end.isclose(Vec3(4, 5)))
+
+    @patch('ezdxf.readfile')
+    def test_unknown_solver(self, mock_readfile):
+        """
+            Test that an unknown solver is rejected.
+        """
+
+        with self.assertRaises(ValueError):
+            Renderer(
+                input_parametric_path=Path('/path/to/input.dxf'),
+                output_rendered_object=self.mock_output_dxf,
+                solver="newton"
+            )
+
     @patch('ezdxf.readfile')
     def test_construct_rest_of_dxf(self, mock_readfile):
         """
@@ -484,6 +647,209 @@ class TestRenderer(unittest.TestCase):
         renderer.output_dxf.layers.new.assert_called_with(name="CUSTOM_LAYER", dxfattribs={'color': 3})
         renderer.output_dxf.layers.new.assert_called_once()
 
+    def test_binary_dxf(self):
+        """
+            Test rendering a binary DXF template and saving the output as binary DXF.
+        """
+
+        examples = Path(__file__).parent.parent / "examples"
+
+        with tempfile.TemporaryDirectory() as directory:
+            binary_path = Path(directory) / "box_side.dxf"
+            ezdxf.readfile(examples / "box_side.dxf").saveas(binary_path, fmt="bin")
+
+            dimensions = []
+
+            for path in [examples / "box_side.dxf", binary_path]:
+                renderer = Renderer(path, ezdxf.new(), variables={"width": 100, "height": 50})
+                renderer.render()
+                dimensions.append(renderer.get_bb_dimensions())
+
+            self.assertEqual(dimensions[0], dimensions[1])
+
+            output = io.BytesIO()
+            renderer.save(output, fmt="bin")
+            self.assertTrue(output.getvalue().startswith(BINARY_SENTINEL))
+
+    def test_in_memory(self):
+        """
+            Test rendering from bytes, streams and drawings straight into bytes.
+        """
+
+        path = Path(__file__).parent.parent / "examples" / "wrapper.dxf"
+        variables = {"w": 100, "l": 200, "h": 50}
+
+        renderer = Renderer(path, ezdxf.new(), variables=variables)
+        points = renderer.render()
+        dimensions = renderer.get_bb_dimensions()
+
+        template = ezdxf.readfile(path)
+        data = dxf_to_bytes(template, fmt="bin")
+
+        for source in [data, io.BytesIO(data), template]:
+            renderer = Renderer(source, ezdxf.new(), variables=variables)
+            output = read_dxf(renderer.render_to_bytes())
+
+            self.assertIsNone(renderer.input_parametric_path)
+            self.assertEqual(renderer.points, points)
+            self.assertEqual(renderer.get_bb_dimensions(output.modelspace()), dimensions)
+
+        self.assertEqual(len(template.modelspace()), len(ezdxf.readfile(path).modelspace()))
+
+        with self.assertRaises(ValueError):
+            Renderer(data, ezdxf.new(), registry=TemplateRegistry())
+
+    def test_parametrize_and_render_in_memory(self):
+        """
+            Test that a template parametrized in memory renders without any file.
+        """
+
+        drawing = ezdxf.new()
+        drawing.modelspace().add_line((0, 0), (4, 0))
+        drawing.modelspace().add_line((4, 1), (4, 3))
+
+        template = SemiAutomaticParameterization(drawing).parametrize()
+        renderer = Renderer(template, ezdxf.new())
+        renderer.render()
+
+        width, height = renderer.get_bb_dimensions()
+        self.assertAlmostEqual(width, 4)
+        self.assertAlmostEqual(height, 3)
+
+    def test_compute_geometry(self):
+        """
+            Test that the geometry-only mode matches the rendered drawing, without an output drawing.
+        """
+
+        examples = Path(__file__).parent.parent / "examples"
+        cases = [("box_side.dxf", {"width": 100, "height": 50}), ("wrapper.dxf", {"w": 100, "l": 200, "h": 50})]
+
+        for name, variables in cases:
+            renderer = Renderer(examples / name, ezdxf.new(), variables=variables)
+            points = renderer.render()
+            width, height = renderer.get_bb_dimensions()
+
+            geometry = Renderer(examples / name, variables=variables).compute_geometry()
+
+            self.assertEqual(geometry["points"].keys(), points.keys())
+
+            for key, position in points.items():
+                self.assertAlmostEqual(geometry["points"][key][0], position[0], places=2)
+                self.assertAlmostEqual(geometry["points"][key][1], position[1], places=2)
+
+            self.assertAlmostEqual(geometry["extents"][0], width, places=2)
+            self.assertAlmostEqual(geometry["extents"][1], height, places=2)
+
+        renderer = Renderer(examples / "box_side.dxf", variables={"width": 100, "height": 50})
+        geometry = renderer.compute_geometry({"width": 200}, segments=True)
+
+        wide = Renderer(examples / "box_side.dxf", ezdxf.new(), variables={"width": 200, "height": 50})
+        wide.render()
+
+        self.assertAlmostEqual(geometry["extents"][0], wide.get_bb_dimensions()[0], places=2)
+        self.assertEqual(geometry["lines"].shape[1:], (2, 2))
+        self.assertEqual(len(geometry["layers"]["lines"]), len(geometry["lines"]))
+
+        with self.assertRaises(ValueError):
+            renderer.render()
+
+    def test_compute_geometry_with_registry(self):
+        """
+            Test that renderers of one registry compute the same geometry from one shared compiled template.
+        """
+
+        registry = TemplateRegistry()
+        path = Path(__file__).parent.parent / "examples" / "box_side.dxf"
+
+        first = Renderer(path, variables={"width": 100, "height": 50}, registry=registry)
+        second = Renderer(path, variables={"width": 100, "height": 50}, registry=registry)
+
+        self.assertEqual(first.compute_geometry(), second.compute_geometry())
+        self.assertIs(first._template, second._template)
+        self.assertIs(registry.get_compiled(path), first._template)
+        self.assertIsNot(registry.get_compiled(path, accuracy=2), first._template)
+
+    def test_compute_partial(self):
+        """
+            Test that the partial geometry holds the requested points and the lines of the requested layers.
+        """
+
+        path = Path(__file__).parent.parent / "examples" / "wrapper.dxf"
+        variables = {"w": 100, "l": 200, "h": 50}
+
+        points = Renderer(path, ezdxf.new(), variables=variables).render()
+        partial = Renderer(path, variables=variables).compute_partial(["package_bl", "package_h"])
+
+        self.assertEqual(partial.keys(), {"points"})
+
+        for axis in range(2):
+            self.assertAlmostEqual(points["package_h"][axis] - partial["points"]["package_h"][axis],
+                                   points["package_bl"][axis] - partial["points"]["package_bl"][axis], places=2)
+
+        partial = Renderer(path, variables=variables).compute_partial(layers=["PERFORATION"])
+        self.assertEqual(partial["lines"].shape, (4, 2, 2))
+        self.assertEqual(partial["points"], {})
+
+    def test_executor(self):
+        """
+            Test that traversing subtrees with thread and process pools renders the same drawing as one thread.
+        """
+
+        path = Path(__file__).parent.parent / "examples" / "wrapper.dxf"
+        variables = {"w": 300, "l": 400, "h": 50}
+
+        def render(**kwargs):
+            output_dxf = ezdxf.new()
+            points = Renderer(path, output_dxf, variables=variables, offset=(10, 20), **kwargs).render()
+            extents = ezdxf.bbox.extents(output_dxf.modelspace())
+
+            return sorted(e.dxftype() for e in output_dxf.modelspace()), extents.extmin, extents.extmax, points
+
+        expected = render()
+
+        with ThreadPoolExecutor(2) as threads, ProcessPoolExecutor(2) as processes:
+            for executor in [threads, processes]:
+                with self.subTest(executor=type(executor).__name__), \
+                        patch.object(executor, "submit", wraps=executor.submit) as submit:
+                    rendered = render(executor=executor, parts=4)
+
+                    self.assertGreater(submit.call_count, 1)
+                    self.assertEqual(rendered[0], expected[0])
+                    self.assertTrue(rendered[1].isclose(expected[1]) and rendered[2].isclose(expected[2]))
+                    self.assertEqual(rendered[3], expected[3])
+
+            with self.assertRaises(ValueError):
+                Renderer(path, ezdxf.new(), variables=variables, solver="lstsq", executor=threads)
+
+    def test_executor_limits(self):
+        """
+            Test that the timeout stops a rendering waiting for the executor and the workers of the executor.
+        """
+
+        path = Path(__file__).parent.parent / "examples" / "wrapper.dxf"
+        release = threading.Event()
+
+        def blocked(*args):
+            release.wait(10)
+            return Renderer._traverse(*args)
+
+        with ThreadPoolExecutor(2) as threads:
+            submit = threads.submit
+
+            with patch.object(threads, "submit", side_effect=lambda _, *args: submit(blocked, *args)):
+                start = time.monotonic()
+
+                with self.assertRaises(LimitExceeded):
+                    Renderer(path, ezdxf.new(), variables={"w": 300, "l": 400, "h": 50}, executor=threads,
+                             parts=4, limits=Limits(timeout=0.5)).render()
+
+                self.assertLess(time.monotonic() - start, 5)
+
+            release.set()
+
+        with self.assertRaises(LimitExceeded):
+            Renderer._traverse({}, {}, [], (0, 0), -1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+import ezdxf
+import numpy as np
+
+from qsketchmetric.expression import evaluate
+from qsketchmetric.renderer import Renderer
+from qsketchmetric.repeat import parse_repeat
+from qsketchmetric.template import CompiledTemplate
+
+
+class TestRepeat(unittest.TestCase):
+
+    def setUp(self):
+        self.template = ezdxf.new()
+        self.template.appids.new("QCAD")
+        msp = self.template.modelspace()
+        msp.add_mtext("----- custom -----")
+
+        self.template.blocks.new("HOLE").add_circle((0, 0), 1)
+
+        msp.add_line((0, 0), (20, 0)).set_xdata("QCAD", [(1000, "c:c")])
+        msp.add_line((20, 0), (20, 5)).set_xdata("QCAD", [(1000, "c:c")])
+        self.insert = msp.add_blockref("HOLE", (20, 5))
+
+    def render(self, directive: str, variables: dict) -> ezdxf.document.Drawing:
+        self.insert.set_xdata("QCAD", [(1000, "c:c@c"), (1000, f"repeat:{directive}")])
+
+        output = ezdxf.new()
+        renderer = Renderer(self.template, output, variables=variables)
+        renderer.render()
+
+        geometry = CompiledTemplate(self.template).evaluate(variables)
+        np.testing.assert_allclose(geometry["extents"][0], renderer.get_bb_dimensions(), atol=1e-2)
+
+        return output
+
+    def test_parse_repeat(self):
+        variables = {"n": np.array([2.4, -1, 5])}
+
+        columns, rows, column_x, column_y, row_x, row_y = parse_repeat("n@3@0", lambda x: evaluate(x, variables))
+        np.testing.assert_array_equal(columns, [2, 0, 5])
+        np.testing.assert_array_equal(rows, [1, 1, 1])
+        self.assertEqual((column_x, column_y, row_x, row_y), (3, 0, 0, 0))
+
+        self.assertEqual(parse_repeat("2@3@4@5", lambda x: evaluate(x, {})), (2, 3, 4, 0, 0, 5))
+
+        with self.assertRaises(ValueError):
+            parse_repeat("2@3", lambda x: evaluate(x, {}))
+
+    def test_linear_array_is_one_minsert(self):
+        for n in [1, 4, 40]:
+            inserts = self.render("n@0@2*d", {"n": n, "d": 5}).modelspace().query("INSERT")
+
+            self.assertEqual(len(inserts), 1)
+            self.assertEqual((inserts[0].dxf.column_count, inserts[0].dxf.row_count), (1, n))
+            self.assertEqual(inserts[0].dxf.row_spacing, 10)
+
+    def test_rectangular_array(self):
+        inserts = self.render("3@2@4@5", {}).modelspace().query("INSERT")
+
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual((inserts[0].dxf.column_count, inserts[0].dxf.row_count), (3, 2))
+        self.assertEqual((inserts[0].dxf.column_spacing, inserts[0].dxf.row_spacing), (4, 5))
+
+    def test_diagonal_array(self):
+        output = self.render("3@4@5", {})
+        inserts = output.modelspace().query("INSERT")
+
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(len({e.dxf.name for e in inserts}), 1)
+        self.assertEqual(inserts[2].dxf.insert - inserts[0].dxf.insert, (8, 10, 0))
+
+    def test_empty_array(self):
+        self.assertEqual(len(self.render("n@0@5", {"n": 0}).modelspace().query("INSERT")), 0)
+
+    def test_batch_extents(self):
+        self.insert.set_xdata("QCAD", [(1000, "c:c@c"), (1000, "repeat:n@0@5")])
+
+        extents = CompiledTemplate(self.template).evaluate({"n": np.array([0, 1, 10])})["extents"]
+
+        np.testing.assert_allclose(extents, [[20, 5], [21, 6], [21, 51]], atol=1e-2)
+
+
+if __name__ == '__main__':
+    unittest.main()
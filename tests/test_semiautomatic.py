@@ -1,3 +1,5 @@
+import io
+import tempfile
 import unittest
 from pathlib import Path
 from typing import Any
@@ -6,6 +8,7 @@ from unittest.mock import Mock, patch, ANY, MagicMock
 import ezdxf.entities
 from ezdxf.math import Vec3
 
+from qsketchmetric.dxfio import BINARY_SENTINEL, dxf_to_bytes, read_dxf
 from qsketchmetric.semiautomatic import SemiAutomaticParameterization
 
 
@@ -95,7 +98,7 @@ class TestSemiAutomaticParameterize(unittest.TestCase):
         obj._center_drawing.assert_called_once()
         obj._draw_variables.assert_called_once()
 
-        obj.input_dxf.saveas.assert_called_once_with(obj.output_dxf_path)
+        obj.input_dxf.saveas.assert_called_once_with(obj.output_dxf_path, fmt="asc")
 
     @patch("pathlib.Path.is_file", return_value=True)
     @patch("ezdxf.readfile")
@@ -202,6 +205,34 @@ class TestSemiAutomaticParameterize(unittest.TestCase):
             else:
                 e.destroy.assert_called_once()
 
+    @patch.object(SemiAutomaticParameterization, "_handle_output_path")
+    @patch("ezdxf.readfile")
+    def test_set_appid_and_graph_polylines(self, mock_readfile, mock_handle_output_path):
+        input_dxf = ezdxf.new('R2010')
+        input_msp = input_dxf.modelspace()
+
+        lwpolyline = input_msp.add_lwpolyline([self.rpoint1, self.rpoint2, self.rpoint3], close=True)
+        polyline = input_msp.add_polyline2d([self.rpoint3, self.rpoint4])
+
+        obj = SemiAutomaticParameterization(self.mock_input_dxf_path)
+        obj.input_dxf = input_dxf
+        obj.input_msp = input_msp
+        obj.graph_lines = {}
+
+        obj._set_appid_and_graph()
+
+        self.assertEqual(obj.graph_lines, {self.point1: [self.point2, self.point3],
+                                           self.point2: [self.point1, self.point3],
+                                           self.point3: [self.point2, self.point1, self.point4],
+                                           self.point4: [self.point3]})
+
+        self.assertEqual([Vec3(p) for p in lwpolyline.vertices()], [self.point1, self.point2, self.point3])
+        self.assertEqual([v.dxf.location for v in polyline.vertices], [self.point3, self.point4])
+
+        for e in [lwpolyline, polyline]:
+            self.assertTrue(e.is_alive)
+            self.assertEqual(e.get_xdata(obj.APPID), [(1000, "c:c")])
+
     @patch.object(SemiAutomaticParameterization, "_handle_output_path")
     @patch("ezdxf.readfile")
     def test_center_drawing(self, mock_readfile, mock_handle_output_path):
@@ -270,6 +301,80 @@ class TestSemiAutomaticParameterize(unittest.TestCase):
         self.assertEqual(variable_text.dxf.char_height, 10)
         variable_text.set_location.assert_called_once()
 
+    def test_binary_output(self):
+        """
+            Test that the parameterized drawing is saved as binary DXF on request.
+        """
+
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = Path(directory) / "input.dxf"
+            output_path = Path(directory) / "parametric.dxf"
+
+            input_dxf = ezdxf.new()
+            input_dxf.modelspace().add_line((0, 0), (4, 0))
+            input_dxf.modelspace().add_circle((8, 0), 1)
+            input_dxf.saveas(input_path)
+
+            obj = SemiAutomaticParameterization(input_path, output_dxf_path=output_path, output_format="bin")
+            obj.parametrize()
+
+            self.assertTrue(output_path.read_bytes().startswith(BINARY_SENTINEL))
+            self.assertEqual(len(ezdxf.readfile(output_path).query("MTEXT")), 1)
+
+    def test_unknown_output_format(self):
+        """
+            Test that an unknown output format is rejected.
+        """
+
+        with self.assertRaises(ValueError):
+            SemiAutomaticParameterization(self.mock_input_dxf_path, output_format="dwg")
+
+    @patch("shutil.move")
+    @patch("os.mkdir")
+    def test_in_memory(self, mock_mkdir, mock_move):
+        """
+            Test parameterizing drawings, bytes and streams without touching the filesystem.
+        """
+
+        input_dxf = ezdxf.new()
+        input_dxf.modelspace().add_line((0, 0), (4, 0))
+        input_dxf.modelspace().add_circle((8, 0), 1)
+        data = dxf_to_bytes(input_dxf)
+
+        obj = SemiAutomaticParameterization(input_dxf)
+        self.assertIs(obj.parametrize(), input_dxf)
+        self.assertIsNone(obj.output_dxf_path)
+        self.assertEqual(len(input_dxf.query("MTEXT")), 1)
+
+        for source in [data, io.BytesIO(data)]:
+            output = SemiAutomaticParameterization(source, output_format="bin").parametrize_to_bytes()
+            self.assertTrue(output.startswith(BINARY_SENTINEL))
+            self.assertEqual(len(read_dxf(output).query("MTEXT")), 1)
+
+        mock_mkdir.assert_not_called()
+        mock_move.assert_not_called()
+
+    @patch.object(SemiAutomaticParameterization, "_handle_output_path")
+    @patch("ezdxf.readfile")
+    def test_parametrize_without_saving(self, mock_readfile, mock_handle_output_path):
+        """
+            Test that parametrize returns the drawing without saving it when saving is turned off.
+        """
+
+        obj = SemiAutomaticParameterization(self.mock_input_dxf_path, save=False)
+
+        obj._set_appid_and_graph = Mock()
+        obj._find_and_union = Mock()
+        obj._draw_virtual_lines = Mock()
+        obj._center_drawing = Mock()
+        obj._draw_variables = Mock()
+        obj.input_dxf = Mock()
+
+        self.assertIs(obj.parametrize(), obj.input_dxf)
+
+        mock_handle_output_path.assert_not_called()
+        obj.input_dxf.saveas.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
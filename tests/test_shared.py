@@ -0,0 +1,118 @@
+import gc
+import multiprocessing
+import pickle
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import ezdxf
+import numpy as np
+
+from qsketchmetric.shared import SharedTemplate, preload_templates, preloaded_template
+from qsketchmetric.template import CompiledTemplate
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+VARIABLES = {"w": np.array([100.0, 150.0]), "l": 200, "h": 50}
+
+
+def evaluate_shared(shared: SharedTemplate, solver: str) -> np.ndarray:
+    return shared.attach().evaluate(VARIABLES, solver)["extents"]
+
+
+def evaluate_preloaded(path: Path) -> np.ndarray:
+    return preloaded_template(path).evaluate(VARIABLES)["extents"]
+
+
+class TestSharedTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.template = CompiledTemplate(ezdxf.readfile(EXAMPLES / "wrapper.dxf"))
+
+    def test_attach(self):
+        """
+            Test that a template is attached once per process, its arrays are views of the block and it evaluates
+            like the original.
+        """
+
+        with SharedTemplate(self.template, solvers=("dfs", "lstsq")) as shared:
+            copy = pickle.loads(pickle.dumps(shared))
+            attached = copy.attach()
+
+            self.assertLess(len(pickle.dumps(copy)), 1024)
+            self.assertIs(shared.attach(), attached)
+            self.assertFalse(attached.plans["dfs"]["directions"].flags.writeable)
+            self.assertFalse(attached.graph_entries.flags.writeable)
+
+            for solver in ["dfs", "lstsq"]:
+                np.testing.assert_allclose(attached.evaluate(VARIABLES, solver)["extents"],
+                                           self.template.evaluate(VARIABLES, solver)["extents"])
+
+            del attached
+
+    def test_unlink(self):
+        """
+            Test that unlinking fails while the attached template is used and removes the block anyway.
+        """
+
+        shared = SharedTemplate(self.template)
+        attached = shared.attach()
+
+        with self.assertRaises(BufferError):
+            shared.unlink()
+
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=shared.name)
+
+        del attached
+        shared._memory.close()
+
+    def test_in_band_size(self):
+        """
+            Test that the tables and plans of the template are stored out of band and only a small Python part
+            in band.
+        """
+
+        with SharedTemplate(self.template, solvers=("dfs", "lstsq")) as shared:
+            data = pickle.dumps(self.template, protocol=5, buffer_callback=lambda _: None)
+            arrays = sum(length for _, length in shared.layout)
+
+            self.assertEqual(shared.size, len(data))
+            self.assertGreaterEqual(arrays, self.template.graph_entries.nbytes + self.template.nodes.nbytes)
+            self.assertLess(shared.size, arrays / 4)
+
+    def test_process_pool(self):
+        """
+            Test that workers started without a copy of the parent's memory attach to the shared template.
+        """
+
+        expected = self.template.evaluate(VARIABLES)["extents"]
+
+        with SharedTemplate(self.template) as shared:
+            with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as executor:
+                for extents in executor.map(evaluate_shared, [shared] * 4, ["dfs", "lstsq"] * 2):
+                    np.testing.assert_allclose(extents, expected)
+
+    def test_preload(self):
+        """
+            Test that forked workers find the preloaded templates.
+        """
+
+        path = EXAMPLES / "wrapper.dxf"
+
+        try:
+            templates = preload_templates([path])
+            self.assertIs(templates[path.resolve()], preloaded_template(path))
+
+            with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("fork")) as executor:
+                for extents in executor.map(evaluate_preloaded, [path] * 2):
+                    np.testing.assert_allclose(extents, self.template.evaluate(VARIABLES)["extents"])
+        finally:
+            gc.unfreeze()
+
+        with self.assertRaises(KeyError):
+            preloaded_template(EXAMPLES / "chalice.dxf")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from qsketchmetric.sparse import SparseLeastSquares
+
+
+class TestSparseLeastSquares(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up a chain of nodes closed into loops by a few random edges.
+        """
+
+        rng = np.random.default_rng(0)
+        edges = [(i, i + 1) for i in range(59)] + [tuple(rng.choice(60, 2, replace=False)) for _ in range(20)]
+
+        self.starts, self.ends = zip(*edges)
+        self.target = rng.random((len(edges) + 1, 3, 2))
+
+    def test_matches_pseudo_inverse(self):
+        """
+            Test that the solution and the rows of the pseudo-inverse match the dense pseudo-inverse.
+        """
+
+        solver = SparseLeastSquares(self.starts, self.ends, 60)
+        pinv = np.linalg.pinv(solver.system.toarray())
+
+        np.testing.assert_allclose(solver.solve(self.target), np.tensordot(pinv, self.target, axes=1), atol=1e-9)
+        np.testing.assert_allclose(solver.rows([5, 0, 42]), pinv[[5, 0, 42]], atol=1e-9)
+        np.testing.assert_allclose(pickle.loads(pickle.dumps(solver)).solve(self.target), solver.solve(self.target))
+
+    def test_large_ladder(self):
+        """
+            Test that a ladder of many loops is solved without a dense matrix of nodes by edges.
+        """
+
+        nodes = 20000
+        rungs = np.arange(0, nodes, 2)
+        starts = np.concatenate([rungs, rungs[:-1], rungs[:-1] + 1])
+        ends = np.concatenate([rungs + 1, rungs[1:], rungs[1:] + 1])
+
+        solver = SparseLeastSquares(starts, ends, nodes)
+        positions = solver.solve(np.concatenate([np.ones((len(starts), 2)), [[0, 0]]]))
+
+        self.assertLess(solver.lower.nnz + solver.upper.nnz, 100 * nodes)
+        self.assertEqual(positions.shape, (nodes, 2))
+        np.testing.assert_allclose(positions[0], 0, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import unittest
+from pathlib import Path
+
+import ezdxf
+import numpy as np
+
+from qsketchmetric.renderer import Renderer
+from qsketchmetric.template import CompiledTemplate
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestCompiledTemplate(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Set up the test case with the example templates and their variables.
+        """
+
+        self.examples = [
+            ("box_side.dxf", {"width": 300, "height": 200}),
+            ("wrapper.dxf", {"w": 300, "l": 400, "h": 50}),
+            ("chalice.dxf", {}),
+        ]
+
+    def test_matches_renderer(self):
+        """
+            Test that the compiled geometry matches the rendered drawing for both solvers.
+        """
+
+        for name, variables in self.examples:
+            for solver in ["dfs", "lstsq"]:
+                output_dxf = ezdxf.new()
+                renderer = Renderer(EXAMPLES / name, output_dxf, variables=variables, solver=solver)
+                points = renderer.render()
+
+                template = CompiledTemplate(ezdxf.readfile(EXAMPLES / name))
+                geometry = template.evaluate(variables, solver=solver, segments=True)
+
+                np.testing.assert_allclose(geometry["extents"][0], renderer.get_bb_dimensions(), atol=1e-2)
+                self.assertEqual(points.keys(), geometry["points"].keys())
+
+                for point, position in points.items():
+                    np.testing.assert_allclose(geometry["points"][point][0], position, atol=1e-2)
+
+                lines = [e for e in output_dxf.modelspace() if e.dxftype() == "LINE"]
+                self.assertEqual(len(lines), geometry["lines"].shape[1])
+                self.assertEqual(len(geometry["layers"]["lines"]), geometry["lines"].shape[1])
+
+    def test_polylines(self):
+        """
+            Test that polylines are compiled into their vertices, including the extents of bulged segments.
+        """
+
+        input_dxf = ezdxf.new()
+        input_dxf.appids.new("QCAD")
+        input_msp = input_dxf.modelspace()
+        input_msp.add_mtext("----- custom -----")
+
+        polyline = input_msp.add_lwpolyline([(0, 0, 0), (4, 0, 1), (4, 2, 0), (0, 2, 0)], format="xyb", close=True)
+        polyline.set_xdata("QCAD", [(1000, "c:c"), (1000, "c0:w"), (1000, "c3:?")])
+
+        template = CompiledTemplate(input_dxf)
+        geometry = template.evaluate({"w": np.array([4.0, 10.0])}, segments=True)
+
+        np.testing.assert_allclose(geometry["extents"], [[5, 2], [11, 2]])
+        np.testing.assert_allclose(geometry["polylines"][0][1], [[0, 0, 0], [10, 0, 1], [10, 2, 0], [6, 2, 0]])
+        self.assertEqual(geometry["lines"].shape, (2, 0, 2, 2))
+
+    def test_batch(self):
+        """
+            Test that a batch of variants gives the same results as evaluating every variant on its own.
+        """
+
+        template = CompiledTemplate(ezdxf.readfile(EXAMPLES / "wrapper.dxf"))
+        w = np.array([200.0, 300.0, 400.0])
+
+        batch = template.evaluate({"w": w, "l": 400, "h": 50})
+
+        for i, value in enumerate(w):
+            single = template.evaluate({"w": value, "l": 400, "h": 50})
+            np.testing.assert_allclose(batch["extents"][i], single["extents"][0])
+
+            for point, position in single["points"].items():
+                np.testing.assert_allclose(batch["points"][point][i], position[0])
+
+    def test_template_is_not_modified(self):
+        """
+            Test that compiling a template does not modify the drawing.
+        """
+
+        input_dxf = ezdxf.readfile(EXAMPLES / "wrapper.dxf")
+        handles = [e.dxf.handle for e in input_dxf.modelspace()]
+
+        CompiledTemplate(input_dxf).evaluate({"w": 300, "l": 400, "h": 50})
+
+        self.assertEqual(handles, [e.dxf.handle for e in input_dxf.modelspace()])
+
+    def test_mismatched_columns(self):
+        """
+            Test that variable columns of different lengths are rejected.
+        """
+
+        template = CompiledTemplate(ezdxf.readfile(EXAMPLES / "wrapper.dxf"))
+
+        with self.assertRaises(ValueError):
+            template.evaluate({"w": np.ones(2), "l": np.ones(3), "h": 50})
+
+        with self.assertRaises(ValueError):
+            template.evaluate({"w": 300, "l": 400, "h": 50}, solver="newton")
+
+    def test_partial(self):
+        """
+            Test that partial evaluation computes the requested points and layers from a part of the graph, shifted
+            from the full geometry by one vector.
+        """
+
+        template = CompiledTemplate(ezdxf.readfile(EXAMPLES / "wrapper.dxf"))
+        variables = {"w": np.array([300.0, 350.0]), "l": 400, "h": 50}
+
+        for solver in ["dfs", "lstsq"]:
+            full = template.evaluate(variables, solver=solver, segments=True)
+            partial = template.evaluate_partial(variables, solver, ["package_bl", "package_tr"], ["CREASING"])
+            shift = full["points"]["package_bl"] - partial["points"]["package_bl"]
+
+            np.testing.assert_allclose(full["points"]["package_tr"] - partial["points"]["package_tr"], shift)
+            self.assertEqual(partial["points"].keys(), {"package_bl", "package_tr"})
+
+            creasing = [i for i, layer in enumerate(full["layers"]["lines"]) if layer == "CREASING"]
+            np.testing.assert_allclose(full["lines"][:, creasing] - partial["lines"], np.broadcast_to(
+                shift[:, None, None, :], partial["lines"].shape), atol=1e-9)
+            self.assertEqual(partial["layers"]["lines"], ["CREASING"] * len(creasing))
+            self.assertEqual(partial["circles"].shape, (2, 0, 3))
+
+            plan = template.partial_plan(solver, ["package_bl"])
+            self.assertLess(len(plan["edges"]), len(template.edge_constants) / 10)
+            self.assertEqual(plan["variables"], {"old_h"})
+
+        with self.assertRaises(ValueError):
+            template.evaluate_partial(variables, points=["package_xx"])
+
+    def test_partial_plans_are_bounded(self):
+        """
+            Test that only the most recently used partial plans are kept.
+        """
+
+        template = CompiledTemplate(ezdxf.readfile(EXAMPLES / "wrapper.dxf"))
+        first = template.partial_plan("dfs", ["package_bl"])
+
+        for i in range(template.MAX_PARTIAL_PLANS):
+            if i == template.MAX_PARTIAL_PLANS // 2:
+                self.assertIs(template.partial_plan("dfs", ["package_bl"]), first)
+
+            template.partial_plan("dfs", layers=[f"LAYER_{i}"])
+
+        self.assertEqual(len(template.partial_plans), template.MAX_PARTIAL_PLANS)
+        self.assertIs(template.partial_plan("dfs", ["package_bl"]), first)
+        self.assertNotIn(("dfs", frozenset(), frozenset(["LAYER_0"])), template.partial_plans)
+
+    def test_split(self):
+        """
+            Test that the subtrees of a split plan hang off a single placement and share no nodes with the rest of
+            the plan.
+        """
+
+        template = CompiledTemplate(ezdxf.readfile(EXAMPLES / "wrapper.dxf"))
+        plan = template.plan("dfs")
+        subtrees = template.split(4)
+
+        self.assertTrue(subtrees)
+        self.assertIs(template.split(4), subtrees)
+
+        for first, end in subtrees:
+            self.assertLessEqual(end - first, len(plan["nodes"]) / 4 + 1)
+            self.assertTrue(all(first <= plan["parents"][p] < end for p in range(first + 1, end)))
+
+            outside = np.concatenate([plan["nodes"][:first], plan["nodes"][end:]])
+            self.assertFalse(np.isin(plan["nodes"][first:end], outside).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import ezdxf
+
+from qsketchmetric.workqueue import WorkQueue, QueueWorker
+
+EXAMPLES = Path(__file__).parent.parent / "examples"
+
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.queue = WorkQueue(self.root / "queue", timeout=60)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def jobs(self, count: int, template: Path = EXAMPLES / "box_side.dxf") -> list[dict]:
+        return [{"template": str(template), "variables": {"width": 100 + i, "height": 50},
+                 "output": str(self.root / "out" / f"{i}.dxf")} for i in range(count)]
+
+    def test_render_all_shards(self):
+        self.queue.submit(self.jobs(5), shard_size=2)
+        self.assertEqual(self.queue.status(), {"pending": 3, "claimed": 0, "done": 0, "failed": 0})
+
+        worker = QueueWorker(self.queue, name="worker")
+
+        self.assertEqual(worker.run(), 3)
+        self.assertEqual(self.queue.status(), {"pending": 0, "claimed": 0, "done": 3, "failed": 0})
+        self.assertEqual(worker.rendered, 5)
+
+        for i in range(5):
+            self.assertTrue(ezdxf.readfile(self.root / "out" / f"{i}.dxf").modelspace().query("LINE"))
+
+        self.assertEqual(list((self.root / "out").glob(".*")), [])
+
+    def test_failed_jobs_are_retried_alone(self):
+        jobs = self.jobs(3)
+        jobs[1]["template"] = str(self.root / "missing.dxf")
+        self.queue.submit(jobs)
+
+        worker = QueueWorker(self.queue, name="worker")
+        worker.run()
+
+        self.assertEqual(self.queue.status()["failed"], 1)
+        self.assertEqual((worker.rendered, worker.failed), (2, 1))
+
+        shard = json.loads(next((self.queue.directory / "failed").glob("*.json")).read_text())
+        self.assertEqual(list(shard["errors"]), ["1"])
+
+        self.assertEqual(self.queue.retry_failed(), 1)
+        worker.run()
+
+        self.assertEqual((worker.rendered, worker.skipped, worker.failed), (2, 2, 2))
+
+    def test_claim_and_complete_races(self):
+        """
+            Test that a claimed shard gets a fresh heartbeat before it leaves ``pending``, and that completing a
+            shard reclaimed in the meantime leaves no stray file behind.
+        """
+
+        self.queue.submit(self.jobs(2))
+        pending = next((self.queue.directory / "pending").glob("*.json"))
+        os.utime(pending, (0, 0))
+
+        name, _ = self.queue.claim("worker")
+        self.assertEqual(self.queue.reclaim(), 0)
+
+        os.utime(self.queue.directory / "claimed" / f"{name}@worker.json", (0, 0))
+        self.assertEqual(self.queue.reclaim(), 1)
+
+        self.assertFalse(self.queue.complete(name, "worker", {0: "error"}))
+        self.assertEqual(self.queue.status(), {"pending": 1, "claimed": 0, "done": 0, "failed": 0})
+
+    def test_abandoned_shard_is_reclaimed(self):
+        """
+            Test that the shard of a worker without heartbeat goes to another worker, and the first worker
+            notices it lost the shard.
+        """
+
+        self.queue.submit(self.jobs(2))
+
+        name, jobs = self.queue.claim("crashed")
+        self.assertIsNone(self.queue.claim("other"))
+
+        claimed = self.queue.directory / "claimed" / f"{name}@crashed.json"
+        os.utime(claimed, (0, 0))
+
+        self.assertEqual(self.queue.claim("other")[0], name)
+        self.assertFalse(self.queue.heartbeat(name, "crashed"))
+        self.assertFalse(self.queue.complete(name, "crashed"))
+
+        self.assertTrue(self.queue.heartbeat(name, "other"))
+        self.assertTrue(self.queue.complete(name, "other"))
+        self.assertEqual(self.queue.status()["done"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()